@@ -1,10 +1,12 @@
-import requests
+from urllib.parse import quote
+
 from fastapi import APIRouter, HTTPException, Request
 from fastapi import Query
 from fastapi.responses import RedirectResponse
 from pydantic import BaseModel
 from app.db.users import create_user_with_token, create_session_for_username, delete_session
 from app.core.config import settings
+from app.services.github_client import GITHUB_API_URL, get_async_client, github_headers
 
 router = APIRouter()
 DEFAULT_SCOPE = "repo read:user"
@@ -42,7 +44,7 @@ async def get_github_login_url(
     if state:
         params["state"] = state
 
-    query = "&".join([f"{key}={requests.utils.quote(str(value))}" for key, value in params.items()])
+    query = "&".join([f"{key}={quote(str(value))}" for key, value in params.items()])
     return {"url": f"https://github.com/login/oauth/authorize?{query}"}
 
 
@@ -81,11 +83,11 @@ async def exchange_github_code(payload: GitHubCodeExchangeRequest):
     if settings.GITHUB_REDIRECT_URI:
         token_payload["redirect_uri"] = settings.GITHUB_REDIRECT_URI
 
-    token_res = requests.post(
+    client = get_async_client()
+    token_res = await client.post(
         "https://github.com/login/oauth/access_token",
         headers={"Accept": "application/json"},
         data=token_payload,
-        timeout=15,
     )
 
     data = token_res.json()
@@ -93,13 +95,9 @@ async def exchange_github_code(payload: GitHubCodeExchangeRequest):
         raise HTTPException(status_code=400, detail=data)
 
     access_token = data["access_token"]
-    user_res = requests.get(
-        "https://api.github.com/user",
-        headers={
-            "Authorization": f"Bearer {access_token}",
-            "Accept": "application/vnd.github+json",
-        },
-        timeout=15,
+    user_res = await client.get(
+        f"{GITHUB_API_URL}/user",
+        headers=github_headers(access_token),
     )
     user_data = user_res.json()
     username = user_data.get("login") if user_res.status_code == 200 else None
@@ -1,12 +1,28 @@
-import requests
+import logging
+import threading
+import zlib
+from dataclasses import dataclass
+from urllib.parse import quote
+
 from fastapi import APIRouter
+from fastapi import BackgroundTasks
 from fastapi import HTTPException
+from fastapi import Query
 from fastapi import Request
-from app.db.repos import get_repo_graph, save_repo_graph
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import Response, StreamingResponse
+from app.core.config import settings
+from app.db.explanations import get_explanation, get_latest_explanations, save_explanation
+from app.db.graph_snapshots import encode_graph, get_graph_snapshot, rebase_snapshot, refresh_graph_snapshot
+from app.db.repos import get_graph_ref, get_repo_graph, get_subtree, graph_subtree, save_repo_graph, touch_graph_ref
 from app.db.users import get_decrypted_token_for_session
+from app.schemas.node import GraphPayload
 from app.services.build_tree import build_tree
+from app.services.github_client import GITHUB_API_URL, cached_get
+from app.textGeneration.llm_service import astream_file_explanation, explanation_model
 import base64
 router = APIRouter()
+logger = logging.getLogger(__name__)
 
 
 def github_auth_headers(request: Request) -> dict[str, str]:
@@ -29,81 +45,346 @@ def github_auth_headers(request: Request) -> dict[str, str]:
 
 @router.get("/")
 async def get_repos(request: Request):
-    res = requests.get(
-        "https://api.github.com/user/repos",
+    res = await cached_get(
+        f"{GITHUB_API_URL}/user/repos",
         headers=github_auth_headers(request),
-        timeout=15,
     )
     if res.status_code != 200:
         raise HTTPException(status_code=res.status_code, detail=res.json())
     return res.json()
 
 
-@router.get("/{owner}/{repo}/tree")
-async def get_repo_tree(owner: str, repo: str, request: Request):
-    headers = github_auth_headers(request)
-
-    repo_res = requests.get(
-        f"https://api.github.com/repos/{owner}/{repo}",
+async def get_repo_metadata(owner: str, repo: str, headers: dict[str, str]) -> dict:
+    """Look the repository up with the caller's credentials; raises unless they can see it."""
+    repo_res = await cached_get(
+        f"{GITHUB_API_URL}/repos/{owner}/{repo}",
         headers=headers,
-        timeout=15,
     )
 
     if repo_res.status_code != 200:
         raise HTTPException(status_code=repo_res.status_code, detail=repo_res.json())
+    return repo_res.json()
+
+
+GRAPH_STREAM_CHUNK_BYTES = 64 * 1024
+
+
+def graph_snapshot_response(request: Request, snapshot: bytes) -> Response:
+    """Send a stored `/tree` snapshot; clients that do not accept gzip get it decompressed on the fly."""
+    if "gzip" in request.headers.get("accept-encoding", "").lower():
+        return Response(
+            content=snapshot,
+            media_type="application/json",
+            headers={"Content-Encoding": "gzip", "Vary": "Accept-Encoding"},
+        )
+
+    def body():
+        decompressor = zlib.decompressobj(wbits=31)
+        for start in range(0, len(snapshot), GRAPH_STREAM_CHUNK_BYTES):
+            yield decompressor.decompress(snapshot[start : start + GRAPH_STREAM_CHUNK_BYTES])
+        yield decompressor.flush()
+
+    return StreamingResponse(body(), media_type="application/json", headers={"Vary": "Accept-Encoding"})
+
+
+def stored_graph_response(
+    request: Request,
+    repo_id: int,
+    ref: str,
+    commit_sha: str,
+    tree_sha: str,
+    graph_id: int,
+):
+    """
+    Return the `/tree` response for a stored graph, or None when the graph rows are gone.
+
+    Snapshots written here are conditional on the graph still being `tree_sha`
+    (see `refresh_graph_snapshot`), as another request may have replaced it.
+    """
+    if settings.GRAPH_SNAPSHOTS_ENABLED:
+        stored = get_graph_snapshot(graph_id, tree_sha)
+        if stored is not None:
+            snapshot_commit_sha, snapshot = stored
+            if snapshot_commit_sha != commit_sha:
+                # Same tree at a newer commit; only the response head changes.
+                snapshot = rebase_snapshot(snapshot, repo_id, ref, snapshot_commit_sha, commit_sha)
+                if snapshot is not None:
+                    refresh_graph_snapshot(graph_id, commit_sha, tree_sha, snapshot)
+            if snapshot is not None:
+                return graph_snapshot_response(request, snapshot)
+
+    cached_graph = get_repo_graph(graph_id=graph_id)
+    if cached_graph is None:
+        return None
+    if settings.GRAPH_SNAPSHOTS_ENABLED:
+        # Stored before snapshots existed; the next read skips the relational rebuild.
+        snapshot = encode_graph(cached_graph, repo_id, ref, commit_sha)
+        refresh_graph_snapshot(graph_id, commit_sha, tree_sha, snapshot)
+        return graph_snapshot_response(request, snapshot)
+    return {
+        "repo_id": repo_id,
+        "ref": ref,
+        "commit_sha": commit_sha,
+        "nodes": cached_graph.nodes,
+        "edges": cached_graph.edges,
+    }
+
+
+@dataclass
+class ResolvedGraph:
+    """
+    The graph that is current for a ref.
+
+    `graph` is set when this request built it; `graph_id` is None until it
+    has been stored, and `snapshot` is set once it was stored with one.
+    """
 
-    repo_data = repo_res.json()
+    repo_id: int
+    ref: str
+    commit_sha: str
+    tree_sha: str
+    graph_id: int | None
+    graph: GraphPayload | None = None
+    snapshot: bytes | None = None
+    owner: str = ""
+    repo: str = ""
+
+
+# Graphs being stored right now, by (repo_id, ref, commit_sha); concurrent requests skip storing them again.
+_graphs_in_flight: set[tuple[int, str, str]] = set()
+_graphs_in_flight_lock = threading.Lock()
+
+
+def _claim_graph_save(resolved: ResolvedGraph) -> bool:
+    key = (resolved.repo_id, resolved.ref, resolved.commit_sha)
+    with _graphs_in_flight_lock:
+        if key in _graphs_in_flight:
+            return False
+        _graphs_in_flight.add(key)
+        return True
+
+
+def store_resolved_graph(resolved: ResolvedGraph) -> None:
+    """Store a graph claimed with `_claim_graph_save`, with its snapshot when enabled."""
+    try:
+        if settings.GRAPH_SNAPSHOTS_ENABLED:
+            resolved.snapshot = encode_graph(resolved.graph, resolved.repo_id, resolved.ref, resolved.commit_sha)
+        resolved.graph_id = save_repo_graph(
+            repo_id=resolved.repo_id,
+            owner=resolved.owner,
+            repo_name=resolved.repo,
+            ref=resolved.ref,
+            commit_sha=resolved.commit_sha,
+            tree_sha=resolved.tree_sha,
+            graph=resolved.graph,
+            snapshot=resolved.snapshot,
+        )
+    finally:
+        with _graphs_in_flight_lock:
+            _graphs_in_flight.discard((resolved.repo_id, resolved.ref, resolved.commit_sha))
+
+
+def _store_resolved_graph_in_background(resolved: ResolvedGraph) -> None:
+    try:
+        store_resolved_graph(resolved)
+    except Exception:
+        # The next request for this commit builds and stores the graph again.
+        logger.exception("Failed to store graph for %s/%s at %s", resolved.owner, resolved.repo, resolved.commit_sha)
+
+
+async def resolve_repo_graph(
+    owner: str,
+    repo: str,
+    headers: dict[str, str],
+    ref: str | None,
+    rebuild: bool = False,
+    store: bool = True,
+) -> ResolvedGraph:
+    """
+    Make sure the stored graph matches the ref's head commit, building it if needed.
+
+    With `store` unset, a newly built graph is returned unsaved (`graph_id`
+    None) so the caller can answer from memory and store it later with
+    `store_resolved_graph`. A graph another request is already storing is
+    never stored twice. Database work and tree building run in the
+    threadpool, off the event loop.
+    """
+    repo_data = await get_repo_metadata(owner, repo, headers)
     repo_id = repo_data.get("id")
-    cached_graph = get_repo_graph(repo_id=repo_id)
-    if cached_graph is not None:
-        return {
-            "repo_id": repo_id,
-            "nodes": cached_graph.nodes,
-            "edges": cached_graph.edges,
-        }
-
-    default_branch = repo_data["default_branch"]
-
-    # 2. get full recursive tree
-    tree_res = requests.get(
-        f"https://api.github.com/repos/{owner}/{repo}/git/trees/{default_branch}?recursive=1",
+    ref = ref or repo_data["default_branch"]
+
+    # 1. Resolve the ref's head commit; the sha media type keeps this response tiny.
+    head_res = await cached_get(
+        f"{GITHUB_API_URL}/repos/{owner}/{repo}/commits/{quote(ref, safe='')}",
+        headers={**headers, "Accept": "application/vnd.github.sha"},
+    )
+    if head_res.status_code != 200:
+        raise HTTPException(status_code=head_res.status_code, detail=head_res.text)
+    commit_sha = head_res.text.strip()
+
+    # 2. Use the stored graph while the ref still points at the commit it was built from.
+    graph_ref = None if rebuild else await run_in_threadpool(get_graph_ref, repo_id=repo_id, ref=ref)
+    if graph_ref is not None and graph_ref["commit_sha"] == commit_sha:
+        return ResolvedGraph(
+            repo_id=repo_id,
+            ref=ref,
+            commit_sha=commit_sha,
+            tree_sha=graph_ref["tree_sha"],
+            graph_id=graph_ref["id"],
+        )
+
+    # 3. get full recursive tree for that commit
+    tree_res = await cached_get(
+        f"{GITHUB_API_URL}/repos/{owner}/{repo}/git/trees/{commit_sha}",
+        params={"recursive": "1"},
         headers=headers,
-        timeout=15,
     )
 
     if tree_res.status_code != 200:
         raise HTTPException(status_code=tree_res.status_code, detail=tree_res.json())
 
-    tree_data = tree_res.json()["tree"]
+    tree_payload = tree_res.json()
+    tree_sha = tree_payload["sha"]
+
+    # A new commit with an identical tree (e.g. an empty merge) keeps the stored graph.
+    if graph_ref is not None and graph_ref["tree_sha"] == tree_sha:
+        await run_in_threadpool(touch_graph_ref, graph_id=graph_ref["id"], commit_sha=commit_sha)
+        return ResolvedGraph(
+            repo_id=repo_id,
+            ref=ref,
+            commit_sha=commit_sha,
+            tree_sha=tree_sha,
+            graph_id=graph_ref["id"],
+        )
 
     # 1. Filter by type tree, then set up directories as a list of nodes
     # 2. Insert files as nodes, 
     # 3. Return new graph
 
-    graph = build_tree(tree_data)
-    save_repo_graph(
+    resolved = ResolvedGraph(
         repo_id=repo_id,
+        ref=ref,
+        commit_sha=commit_sha,
+        tree_sha=tree_sha,
+        graph_id=None,
+        graph=await run_in_threadpool(build_tree, tree_payload["tree"]),
         owner=owner,
-        repo_name=repo,
-        graph=graph,
+        repo=repo,
     )
+    if store and _claim_graph_save(resolved):
+        await run_in_threadpool(store_resolved_graph, resolved)
+    return resolved
+
+
+@router.get("/{owner}/{repo}/tree")
+async def get_repo_tree(
+    owner: str,
+    repo: str,
+    request: Request,
+    ref: str | None = Query(default=None),
+):
+    headers = github_auth_headers(request)
+    resolved = await resolve_repo_graph(owner, repo, headers, ref)
+    if resolved.graph is None:
+        response = await run_in_threadpool(
+            stored_graph_response,
+            request,
+            resolved.repo_id,
+            resolved.ref,
+            resolved.commit_sha,
+            resolved.tree_sha,
+            resolved.graph_id,
+        )
+        if response is not None:
+            return response
+        resolved = await resolve_repo_graph(owner, repo, headers, ref, rebuild=True)
+
+    if resolved.snapshot is not None:
+        return graph_snapshot_response(request, resolved.snapshot)
     return {
-        "repo_id": repo_id,
-        "nodes": graph.nodes,
-        "edges": graph.edges,
+        "repo_id": resolved.repo_id,
+        "ref": resolved.ref,
+        "commit_sha": resolved.commit_sha,
+        "nodes": resolved.graph.nodes,
+        "edges": resolved.graph.edges,
     }
 
 
+SUBTREE_DEFAULT_LIMIT = 200
+SUBTREE_MAX_LIMIT = 1000
+SUBTREE_MAX_DEPTH = 5
+
+
+def _encode_cursor(path: str) -> str:
+    return base64.urlsafe_b64encode(path.encode()).decode()
 
-#file?path=....
-@router.get("/{owner}/{repo}/file")
-async def get_file(owner: str, repo: str, path: str, request: Request):
-    url = f"https://api.github.com/repos/{owner}/{repo}/contents/{path}"
 
-    res = requests.get(
+def _decode_cursor(cursor: str) -> str:
+    try:
+        return base64.urlsafe_b64decode(cursor.encode()).decode()
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor.")
+
+
+@router.get("/{owner}/{repo}/subtree")
+async def get_repo_subtree(
+    owner: str,
+    repo: str,
+    request: Request,
+    background_tasks: BackgroundTasks,
+    path: str = Query(default=""),
+    depth: int = Query(default=1, ge=1, le=SUBTREE_MAX_DEPTH),
+    limit: int = Query(default=SUBTREE_DEFAULT_LIMIT, ge=1, le=SUBTREE_MAX_LIMIT),
+    cursor: str | None = Query(default=None),
+    ref: str | None = Query(default=None),
+):
+    """
+    Return the nodes below `path` (repository root by default) down to `depth` levels.
+
+    Every node carries `child_count`, so folders at the depth limit can be
+    shown collapsed and expanded with another call. When `next_cursor` is
+    set, pass it back as `cursor` for the next page.
+
+    The first request for a new commit answers from the freshly built graph
+    and stores it after responding, so it does not wait for the full graph
+    to be written.
+    """
+    resolved = await resolve_repo_graph(owner, repo, github_auth_headers(request), ref, store=False)
+    path = path.strip("/")
+    after = _decode_cursor(cursor) if cursor else None
+
+    if resolved.graph_id is None:
+        subtree = await run_in_threadpool(
+            graph_subtree, resolved.graph, path=path, depth=depth, limit=limit, after=after
+        )
+        if _claim_graph_save(resolved):
+            background_tasks.add_task(_store_resolved_graph_in_background, resolved)
+    else:
+        subtree = await run_in_threadpool(
+            get_subtree, resolved.graph_id, path=path, depth=depth, limit=limit, after=after
+        )
+    if subtree is None:
+        raise HTTPException(status_code=404, detail=f"Path not found: {path}")
+
+    next_after = subtree.pop("next_after")
+    return {
+        "repo_id": resolved.repo_id,
+        "ref": resolved.ref,
+        "commit_sha": resolved.commit_sha,
+        "path": path,
+        "depth": depth,
+        **subtree,
+        "next_cursor": _encode_cursor(next_after) if next_after is not None else None,
+    }
+
+
+async def fetch_file(owner: str, repo: str, path: str, request: Request) -> tuple[str, str]:
+    """Return a file's decoded text and blob sha."""
+    url = f"{GITHUB_API_URL}/repos/{owner}/{repo}/contents/{path}"
+
+    res = await cached_get(
         url,
         headers=github_auth_headers(request),
-        timeout=15,
     )
 
     if res.status_code != 200:
@@ -113,8 +394,76 @@ async def get_file(owner: str, repo: str, path: str, request: Request):
 
     # decode base64 → text
     content = base64.b64decode(data["content"]).decode("utf-8")
+    return content, data["sha"]
+
+
+#file?path=....
+@router.get("/{owner}/{repo}/file")
+async def get_file(owner: str, repo: str, path: str, request: Request):
+    content, _ = await fetch_file(owner, repo, path, request)
 
     return {
         "path": path,
         "content": content,
     }
+
+
+#explain?path=....
+@router.get("/{owner}/{repo}/explain")
+async def explain_file(
+    owner: str,
+    repo: str,
+    path: str,
+    request: Request,
+    sha: str | None = Query(default=None),
+):
+    """
+    Stream an explanation of one file.
+
+    Pass the file's blob `sha` from the graph when known: a stored summary for
+    it is returned without downloading the file.
+    """
+    repo_key = f"{owner}/{repo}"
+
+    # Summaries are keyed by blob sha, so an unchanged file never hits the LLM twice.
+    if sha:
+        await get_repo_metadata(owner, repo, github_auth_headers(request))
+        summary = await run_in_threadpool(get_explanation, repo_key, path, sha)
+        if summary is not None:
+            return StreamingResponse(iter([summary]), media_type="text/plain; charset=utf-8")
+
+    content, blob_sha = await fetch_file(owner, repo, path, request)
+    if blob_sha != sha:
+        summary = await run_in_threadpool(get_explanation, repo_key, path, blob_sha)
+        if summary is not None:
+            return StreamingResponse(iter([summary]), media_type="text/plain; charset=utf-8")
+
+    async def token_generator():
+        parts: list[str] = []
+        tokens = astream_file_explanation(path=path, content=content)
+        try:
+            async for token in tokens:
+                if await request.is_disconnected():
+                    return
+                parts.append(token)
+                yield token
+        finally:
+            await tokens.aclose()
+        # Only reached when the stream completes; a disconnect never stores a partial summary.
+        await run_in_threadpool(
+            save_explanation,
+            repo_key=repo_key,
+            path=path,
+            blob_sha=blob_sha,
+            summary="".join(parts),
+            model=explanation_model(),
+        )
+
+    return StreamingResponse(token_generator(), media_type="text/plain; charset=utf-8")
+
+
+@router.get("/{owner}/{repo}/explanations")
+async def get_explanations(owner: str, repo: str, request: Request):
+    await get_repo_metadata(owner, repo, github_auth_headers(request))
+    explanations = await run_in_threadpool(get_latest_explanations, f"{owner}/{repo}")
+    return {"explanations": explanations}
@@ -1,17 +1,35 @@
 """
 Data ingestion API endpoints for the selected repo.
 """
+import asyncio
+import hashlib
 import logging
+from collections.abc import Callable
+
 from fastapi import APIRouter, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 
+from app.api.endpoints.github import ResolvedGraph, resolve_repo_graph
 from app.codeIngestion.code_ingestion import RepositoryIngestionOrchestrator
+from app.db.jobs import get_job
+from app.db.repos import get_repo_graph
 from app.db.users import get_decrypted_token_for_session
-from app.schemas.ingestion import IngestionRequest, IngestionResponse
+from app.schemas.ingestion import IngestionJob, IngestionRequest, IngestionResponse
 from app.services.fernet import encrypt_token
+from app.services.jobs import JobProgress, job_manager
+from app.textGeneration.answer_cache import answer_cache
+from app.textGeneration.repo_summarizer import RepositorySummarizer
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
+INGESTION_JOB_KIND = "ingestion"
+SUMMARY_JOB_KIND = "summarize"
+JOB_KINDS = {INGESTION_JOB_KIND, SUMMARY_JOB_KIND}
+TERMINAL_JOB_STATUSES = {"succeeded", "failed", "cancelled"}
+JOB_EVENTS_POLL_SECONDS = 1.0
+
 def _resolve_github_token(request: Request) -> str:
     """Resolve GitHub token from Bearer auth header or session id."""
     auth_header = request.headers.get("authorization", "")
@@ -27,48 +45,197 @@ def _resolve_github_token(request: Request) -> str:
     return token
 
 
-@router.post("/repo", response_model=IngestionResponse)
+def _submitter_key(github_token: str) -> str:
+    """Identify a job's submitter without storing their token."""
+    return hashlib.sha256(github_token.encode()).hexdigest()
+
+
+def _get_job_or_404(job_id: str, submitted_by: str) -> dict:
+    """Return a job submitted with the same GitHub credentials; other users' jobs are not found."""
+    job = get_job(job_id)
+    if job is None or job["kind"] not in JOB_KINDS or job["submitted_by"] != submitted_by:
+        raise HTTPException(status_code=404, detail="Ingestion job not found.")
+    return job
+
+
+def _load_stored_tree(resolved: ResolvedGraph) -> dict:
+    graph = resolved.graph if resolved.graph is not None else get_repo_graph(graph_id=resolved.graph_id)
+    if graph is None:
+        raise RuntimeError("The stored graph was replaced before the job started; submit it again.")
+    return graph.model_dump()
+
+
+async def _tree_source(payload: IngestionRequest, github_token: str) -> tuple[Callable[[], dict], str | None]:
+    """
+    Return a loader for the graph to process and the ref to read files at.
+
+    Without a posted graph, the graph stored for `payload.ref` is loaded inside
+    the job and files are read at its commit. A `commit_sha` other than the
+    ref's current head means the client's view is stale: 409.
+    """
+    if payload.graph is not None:
+        graph_payload = (
+            payload.graph.model_dump()
+            if hasattr(payload.graph, "model_dump")
+            else payload.graph.dict()
+        )
+        return lambda: graph_payload, payload.ref
+
+    resolved = await resolve_repo_graph(
+        payload.owner,
+        payload.repo,
+        {"Authorization": f"Bearer {github_token}"},
+        payload.ref,
+    )
+    if payload.commit_sha and payload.commit_sha != resolved.commit_sha:
+        raise HTTPException(
+            status_code=409,
+            detail="The repository changed since its graph was loaded; reload it.",
+        )
+    return lambda: _load_stored_tree(resolved), resolved.commit_sha
+
+
+def _visible_job_id(job: dict, submitted_by: str) -> str | None:
+    # A duplicate submission gets the active job's state, but only its submitter can follow it.
+    return job["id"] if job["submitted_by"] == submitted_by else None
+
+
+@router.post("/repo", response_model=IngestionResponse, status_code=202)
 async def ingest_repo(request: Request, payload: IngestionRequest):
     """
-    Ingest one repository graph into PGVector.
-    Trigger this after frontend graph loading completes.
+    Queue ingestion of one repository graph into PGVector.
+    Trigger this after frontend graph loading completes, then poll
+    `/ingestion/jobs/{job_id}` for progress.
     """
+    thread_id = f"{payload.owner}/{payload.repo}"
     try:
         github_token = _resolve_github_token(request)
         encrypted_session = encrypt_token(github_token)
-        orchestrator = RepositoryIngestionOrchestrator(session=encrypted_session)
+        submitted_by = _submitter_key(github_token)
+        load_tree, ref = await _tree_source(payload, github_token)
 
-        existing_embeddings = orchestrator.get_existing_embedding_count(
-            owner=payload.owner,
-            repo=payload.repo,
-        )
-        if existing_embeddings > 0:
-            return IngestionResponse(
-                message="Repository embeddings already exist. Reusing stored collection.",
-                status="success",
-                thread_id=f"{payload.owner}/{payload.repo}",
-                chunks_processed=existing_embeddings,
+        def run_ingestion(progress: JobProgress) -> str:
+            orchestrator = RepositoryIngestionOrchestrator(
+                session=encrypted_session,
+                embedding_dimensions=payload.embedding_dimensions,
             )
+            try:
+                chunks_processed = orchestrator.ingest_repo_tree(
+                    owner=payload.owner,
+                    repo=payload.repo,
+                    tree_payload=load_tree(),
+                    ref=ref,
+                    incremental=payload.incremental,
+                    progress=progress,
+                )
+            finally:
+                # Cached chat answers were grounded in the previous embeddings.
+                answer_cache.invalidate(thread_id)
+            return f"Embedded {chunks_processed} chunks."
 
-        graph_payload = (
-            payload.graph.model_dump()
-            if hasattr(payload.graph, "model_dump")
-            else payload.graph.dict()
-        )
-        chunks_processed = orchestrator.ingest_repo_tree(
-            owner=payload.owner,
-            repo=payload.repo,
-            tree_payload=graph_payload,
+        job, created = await run_in_threadpool(
+            job_manager.submit,
+            INGESTION_JOB_KIND,
+            thread_id,
+            run_ingestion,
+            submitted_by,
         )
 
         return IngestionResponse(
-            message="Repository ingestion completed.",
-            status="success",
-            thread_id=f"{payload.owner}/{payload.repo}",
-            chunks_processed=chunks_processed,
+            message="Repository ingestion queued." if created else "Repository ingestion already in progress.",
+            status=job["status"],
+            thread_id=thread_id,
+            chunks_processed=job["chunks_embedded"],
+            job_id=_visible_job_id(job, submitted_by),
         )
     except HTTPException:
         raise
     except Exception as exc:
         logger.exception("Repository ingestion failed for %s/%s", payload.owner, payload.repo)
         raise HTTPException(status_code=500, detail=f"Ingestion failed: {exc}") from exc
+
+
+@router.post("/summaries", response_model=IngestionResponse, status_code=202)
+async def summarize_repo(request: Request, payload: IngestionRequest):
+    """
+    Queue bottom-up summarization of one repository graph.
+    Files are summarized first, then every directory from its children's
+    summaries; poll `/ingestion/jobs/{job_id}` for progress.
+    """
+    thread_id = f"{payload.owner}/{payload.repo}"
+    try:
+        github_token = _resolve_github_token(request)
+        encrypted_session = encrypt_token(github_token)
+        submitted_by = _submitter_key(github_token)
+        load_tree, ref = await _tree_source(payload, github_token)
+
+        def run_summaries(progress: JobProgress) -> str:
+            summarizer = RepositorySummarizer(session=encrypted_session)
+            created = summarizer.summarize_repo_tree(
+                owner=payload.owner,
+                repo=payload.repo,
+                tree_payload=load_tree(),
+                ref=ref,
+                progress=progress,
+            )
+            return f"Created {created} summaries."
+
+        job, created = await run_in_threadpool(
+            job_manager.submit,
+            SUMMARY_JOB_KIND,
+            thread_id,
+            run_summaries,
+            submitted_by,
+        )
+
+        return IngestionResponse(
+            message="Repository summarization queued." if created else "Repository summarization already in progress.",
+            status=job["status"],
+            thread_id=thread_id,
+            chunks_processed=0,
+            job_id=_visible_job_id(job, submitted_by),
+        )
+    except HTTPException:
+        raise
+    except Exception as exc:
+        logger.exception("Repository summarization failed for %s/%s", payload.owner, payload.repo)
+        raise HTTPException(status_code=500, detail=f"Summarization failed: {exc}") from exc
+
+
+@router.get("/jobs/{job_id}", response_model=IngestionJob)
+async def get_ingestion_job(job_id: str, request: Request):
+    """Return the current state of an ingestion job."""
+    submitted_by = _submitter_key(_resolve_github_token(request))
+    job = await run_in_threadpool(_get_job_or_404, job_id, submitted_by)
+    return IngestionJob.from_row(job)
+
+
+@router.get("/jobs/{job_id}/events")
+async def stream_ingestion_job(job_id: str, request: Request):
+    """Stream job state as server-sent events until the job finishes."""
+    submitted_by = _submitter_key(_resolve_github_token(request))
+    job = await run_in_threadpool(_get_job_or_404, job_id, submitted_by)
+
+    async def event_generator():
+        current = job
+        last_payload = None
+        while True:
+            payload = IngestionJob.from_row(current).model_dump_json()
+            if payload != last_payload:
+                yield f"data: {payload}\n\n"
+                last_payload = payload
+            if current["status"] in TERMINAL_JOB_STATUSES or await request.is_disconnected():
+                return
+            await asyncio.sleep(JOB_EVENTS_POLL_SECONDS)
+            current = await run_in_threadpool(get_job, job_id) or current
+
+    return StreamingResponse(event_generator(), media_type="text/event-stream")
+
+
+@router.post("/jobs/{job_id}/cancel", response_model=IngestionJob)
+async def cancel_ingestion_job(job_id: str, request: Request):
+    """Cancel a queued or running ingestion job."""
+    submitted_by = _submitter_key(_resolve_github_token(request))
+    await run_in_threadpool(_get_job_or_404, job_id, submitted_by)
+    job = await run_in_threadpool(job_manager.cancel, job_id)
+    return IngestionJob.from_row(job)
@@ -1,15 +1,29 @@
 from fastapi import APIRouter, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 
 from app.schemas.gemini_requests import GeminiAnalysisRequest, GeminiSummaryRequest
-from app.textGeneration.llm_service import get_llm_response, stream_llm_response
+from app.textGeneration.llm_service import (
+    aget_llm_response,
+    astream_llm_response,
+    explain_file,
+    get_chat_metrics,
+)
 
 router = APIRouter()
 
 @router.post("/code_analysis", response_model=GeminiSummaryRequest)
 async def code_analysis(request: GeminiAnalysisRequest):
-    pass
+    if not request.code.strip():
+        raise HTTPException(status_code=400, detail="Code must not be empty.")
+
+    try:
+        summary = await run_in_threadpool(explain_file, path=request.path, content=request.code)
+    except Exception as exc:
+        raise HTTPException(status_code=500, detail=f"Code analysis failed: {exc}") from exc
+
+    return GeminiSummaryRequest(file_name=request.file_name, summary=summary, path=request.path)
 
 
 class ChatRequest(BaseModel):
@@ -29,7 +43,7 @@ async def chat_with_repo(payload: ChatRequest, request: Request):
 
     session_id = request.headers.get("x-session-id", "").strip()
     try:
-        answer = get_llm_response(
+        answer = await aget_llm_response(
             query=payload.query.strip(),
             repo_id=f"{payload.owner}/{payload.repo}",
             session_id=session_id,
@@ -47,12 +61,25 @@ async def chat_with_repo_stream(payload: ChatRequest, request: Request):
 
     session_id = request.headers.get("x-session-id", "").strip()
 
-    def token_generator():
-        for token in stream_llm_response(
+    async def token_generator():
+        tokens = astream_llm_response(
             query=payload.query.strip(),
             repo_id=f"{payload.owner}/{payload.repo}",
             session_id=session_id,
-        ):
-            yield token
+        )
+        try:
+            async for token in tokens:
+                if await request.is_disconnected():
+                    break
+                yield token
+        finally:
+            # Closing the stream cancels the in-flight retrieval or completion call.
+            await tokens.aclose()
 
     return StreamingResponse(token_generator(), media_type="text/plain; charset=utf-8")
+
+
+@router.get("/metrics")
+async def chat_metrics():
+    """Recent chat and guardrail latencies in milliseconds."""
+    return get_chat_metrics()
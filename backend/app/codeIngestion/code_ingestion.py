@@ -2,17 +2,31 @@
 Main orchestrator for repo ingestion.
 """
 import os
+from concurrent.futures import Future
 from typing import Any
 
 from app.core.config import settings
 from langchain_core.documents import Document
-from langchain_openai import OpenAIEmbeddings
-from langchain_postgres import PGVector
-from sqlalchemy import create_engine, text
+from sqlalchemy import text
 from sqlalchemy.engine import Engine
 import logging
 
-from .helpers import NodeProcessor
+from app.db.collections import (
+    delete_collection_embeddings,
+    delete_empty_blobs,
+    get_empty_blob_shas,
+    save_collection_metadata,
+    save_empty_blobs,
+)
+from app.db.embedding_cache import evict_embedding_cache
+from app.db.engine import engine
+from app.db.vector_index import drop_ann_indexes, get_collection_id
+from app.db.vector_stores import vector_stores
+from app.services.build_tree import should_include_path
+from app.services.jobs import JobCancelled, JobProgress
+
+from .helpers import BoundedExecutor, CachedEmbeddings, CollectionMetadata, EmbeddingBatcher, NodeChunk, NodeProcessor
+from .helpers.embedding_cache import embedding_model_key
 
 logger = logging.getLogger(__name__)
 
@@ -28,28 +42,61 @@ class RepositoryIngestionOrchestrator:
     """
 
 
-    def __init__(self, session):
+    def __init__(self, session, max_workers: int | None = None, embedding_dimensions: int | None = None):
         """
         Initialize Orchestrator
 
-        Args: session
+        Args: session, max_workers (defaults to settings.INGESTION_WORKERS),
+        embedding_dimensions (defaults to the dimensions the collection was
+        embedded with, or settings.EMBEDDING_DIMENSIONS for a new collection)
         """
         self.session = session
+        self.max_workers = max_workers or settings.INGESTION_WORKERS
         self.processor = NodeProcessor(session)
 
-        #Initialize Embeddings
+        self.embedding_model = settings.EMBEDDING_MODEL
+        self.requested_dimensions = embedding_dimensions
+        self.embedding_dimensions = embedding_dimensions or settings.EMBEDDING_DIMENSIONS
+
+        self.engine: Engine = engine
 
-        openai_api_key = settings.OPENAI_API_KEY
-        if not openai_api_key:
-            raise ValueError("OPENAI_API_KEY must be set")
-        self.embeddings = OpenAIEmbeddings(model="text-embedding-3-large")
+    def _resolve_embedding_dimensions(self, stored_config: tuple[str, int | None] | None) -> int | None:
+        """Keep the collection's dimensions unless new ones were asked for or the model changed."""
+        if self.requested_dimensions is not None:
+            return self.requested_dimensions
+        if stored_config is not None and stored_config[0] == self.embedding_model:
+            return stored_config[1]
+        return settings.EMBEDDING_DIMENSIONS
 
-        self.db_connection = settings.DATABASE_URL
-        self.engine: Engine = create_engine(self.db_connection, pool_pre_ping=True)
+    @property
+    def embeddings(self) -> CachedEmbeddings:
+        # Identical chunk text is served from the embedding cache before calling OpenAI.
+        return CachedEmbeddings(
+            vector_stores.embeddings_for(self.embedding_model, self.embedding_dimensions),
+            model_name=embedding_model_key(self.embedding_model, self.embedding_dimensions),
+        )
 
 
 
     
+    def _record_collection(self, collection_name: str) -> None:
+        """
+        Record this run's embedding settings on the collection and bump its content version.
+
+        `last_updated` doubles as the version that keys cached chat answers,
+        so it is written before chunks change and again once they are done.
+        """
+        save_collection_metadata(
+            collection_name,
+            CollectionMetadata.create(
+                repo_id=collection_name,
+                embedding_model=self.embedding_model,
+                embedding_dimensions=self.embedding_dimensions,
+            ).to_dict(),
+        )
+        # Queries pick up the recorded embedding settings on their next lookup.
+        vector_stores.evict(collection_name)
+
     def _build_embedding_text(self, chunk_text: str, path: str) -> str:
         """Prefix each chunk with stable source path context for retrieval."""
         filename = os.path.basename(path) or path
@@ -61,10 +108,7 @@ class RepositoryIngestionOrchestrator:
             f"{chunk_text}"
         )
 
-    def ingest_node(self, owner: str, repo: str, path: str) -> list[Document]:
-
-        chunks = self.processor.process_node(owner, repo, path)
-
+    def _build_documents(self, chunks: list[NodeChunk], path: str) -> list[Document]:
         documents: list[Document] = []
 
         for chunk in chunks:
@@ -80,6 +124,30 @@ class RepositoryIngestionOrchestrator:
 
         return documents
 
+    def ingest_node(
+        self,
+        owner: str,
+        repo: str,
+        path: str,
+        blob_sha: str | None = None,
+        ref: str | None = None,
+    ) -> list[Document]:
+        """Fetch a single file at `ref` through the contents API and build its documents."""
+        chunks = self.processor.process_node(owner, repo, path, blob_sha=blob_sha, ref=ref)
+        return self._build_documents(chunks, path)
+
+    def ingest_node_content(
+        self,
+        owner: str,
+        repo: str,
+        path: str,
+        content: str,
+        blob_sha: str | None = None,
+    ) -> list[Document]:
+        """Build documents for a file whose content was already fetched."""
+        chunks = self.processor.build_chunks(owner, repo, path, content, blob_sha=blob_sha)
+        return self._build_documents(chunks, path)
+
     def get_existing_embedding_count(self, owner: str, repo: str) -> int:
         """Return the number of stored embeddings for a repo collection."""
         collection_name = f"{owner}/{repo}"
@@ -104,37 +172,412 @@ class RepositoryIngestionOrchestrator:
         """Check whether the repo already has stored embeddings."""
         return self.get_existing_embedding_count(owner, repo) > 0
 
-    def ingest_repo_tree(self, owner: str, repo: str, tree_payload: dict[str, Any]) -> int:
-        """Ingest all file nodes from the /tree payload into one repo collection."""
-        if self.repo_embeddings_exist(owner, repo):
-            logger.info("Skipping ingestion for %s/%s; embeddings already exist.", owner, repo)
-            return 0
+    def get_stored_blob_shas(self, owner: str, repo: str) -> dict[str, str | None]:
+        """
+        Return the blob sha each stored file was embedded from, keyed by path.
 
-        vector_store = PGVector(
-            collection_name=f"{owner}/{repo}",
-            connection=self.db_connection,
-            embeddings=self.embeddings,
-            use_jsonb=True,
+        A file whose chunks come from more than one blob (an interrupted
+        replacement) maps to None, so the next incremental run re-ingests it.
+        """
+        query = text(
+            """
+            SELECT DISTINCT
+                e.cmetadata->>'node_path' AS node_path,
+                e.cmetadata->>'blob_sha' AS blob_sha
+            FROM langchain_pg_collection AS c
+            JOIN langchain_pg_embedding AS e
+              ON e.collection_id = c.uuid
+            WHERE c.name = :collection_name
+            """
+        )
+        with self.engine.begin() as connection:
+            rows = connection.execute(
+                query,
+                {"collection_name": f"{owner}/{repo}"},
+            ).fetchall()
+        shas: dict[str, str | None] = {}
+        for path, blob_sha in rows:
+            if not path:
+                continue
+            shas[path] = blob_sha if path not in shas or shas[path] == blob_sha else None
+        return shas
+
+    def get_stored_chunk_ids(self, owner: str, repo: str, paths: list[str]) -> dict[str, list[str]]:
+        """Return the ids of the stored chunks for the given file paths, keyed by path."""
+        if not paths:
+            return {}
+
+        query = text(
+            """
+            SELECT e.cmetadata->>'node_path' AS node_path, e.id
+            FROM langchain_pg_collection AS c
+            JOIN langchain_pg_embedding AS e
+              ON e.collection_id = c.uuid
+            WHERE c.name = :collection_name
+              AND e.cmetadata->>'node_path' = ANY(:paths)
+            """
         )
+        with self.engine.begin() as connection:
+            rows = connection.execute(
+                query,
+                {"collection_name": f"{owner}/{repo}", "paths": paths},
+            ).fetchall()
+        chunk_ids: dict[str, list[str]] = {}
+        for path, chunk_id in rows:
+            chunk_ids.setdefault(path, []).append(str(chunk_id))
+        return chunk_ids
 
-        nodes = tree_payload.get("nodes", [])
-        total_documents = 0
+    def delete_embeddings(self, ids: list[str]) -> int:
+        """Delete stored chunks by id."""
+        if not ids:
+            return 0
+
+        with self.engine.begin() as connection:
+            result = connection.execute(
+                text("DELETE FROM langchain_pg_embedding WHERE id = ANY(:ids)"),
+                {"ids": ids},
+            )
+        return result.rowcount or 0
+
+    def delete_node_embeddings(self, owner: str, repo: str, paths: list[str]) -> int:
+        """Delete every stored chunk for the given file paths."""
+        if not paths:
+            return 0
+
+        query = text(
+            """
+            DELETE FROM langchain_pg_embedding AS e
+            USING langchain_pg_collection AS c
+            WHERE e.collection_id = c.uuid
+              AND c.name = :collection_name
+              AND e.cmetadata->>'node_path' = ANY(:paths)
+            """
+        )
+        with self.engine.begin() as connection:
+            result = connection.execute(
+                query,
+                {"collection_name": f"{owner}/{repo}", "paths": paths},
+            )
+        return result.rowcount or 0
 
-        for node in nodes:
+    @staticmethod
+    def _blob_shas(tree_payload: dict[str, Any]) -> dict[str, str | None]:
+        blobs: dict[str, str | None] = {}
+        for node in tree_payload.get("nodes", []):
             node_path = node.get("path") if isinstance(node, dict) else getattr(node, "path", None)
             node_type = node.get("file_type") if isinstance(node, dict) else getattr(node, "file_type", None)
+            node_sha = node.get("sha") if isinstance(node, dict) else getattr(node, "sha", None)
 
             if node_type != "blob" or not node_path:
                 continue
+            blobs[node_path] = node_sha
+        return blobs
 
-            try:
-                documents = self.ingest_node(owner, repo, node_path)
-                if documents:
-                    vector_store.add_documents(documents)
-                    total_documents += len(documents)
-            except Exception as exc:
-                # Do not fail the full repo ingestion because one file is unreadable.
-                logger.warning("Skipping file during ingestion: %s (%s)", node_path, exc)
-                continue
+    @staticmethod
+    def _diff_blobs(
+        stored: dict[str, str | None],
+        current: dict[str, str | None],
+    ) -> tuple[dict[str, str | None], list[str]]:
+        """
+        Compare stored blob shas with the current tree.
+
+        Returns the files to (re)ingest and the stored paths to delete. Files
+        without a sha in the current tree cannot be compared and are only
+        ingested when nothing is stored for them yet.
+        """
+        changed: dict[str, str | None] = {}
+        for path, sha in current.items():
+            if path not in stored:
+                changed[path] = sha
+            elif sha is not None and stored[path] != sha:
+                changed[path] = sha
+
+        removed = [path for path in stored if path not in current]
+        return changed, removed
+
+    def _ingest_file(
+        self,
+        owner: str,
+        repo: str,
+        path: str,
+        batcher: EmbeddingBatcher,
+        blob_sha: str | None = None,
+        content: str | None = None,
+        progress: JobProgress | None = None,
+        ref: str | None = None,
+        empty: dict[str, str | None] | None = None,
+    ) -> int:
+        """
+        Fetch (when no content is given) and chunk one file, then queue it for embedding.
+
+        A file that produces no chunks (empty or binary) is added to `empty`
+        with its blob sha.
+        """
+        if progress is not None and progress.cancelled:
+            return 0
+        if batcher.error is not None:
+            # Embedding has stopped; the run fails once the batcher is closed.
+            return 0
+
+        try:
+            if content is None:
+                documents = self.ingest_node(owner, repo, path, blob_sha=blob_sha, ref=ref)
+            else:
+                documents = self.ingest_node_content(owner, repo, path, content, blob_sha=blob_sha)
+            if documents:
+                batcher.add(documents)
+            else:
+                if empty is not None:
+                    empty[path] = blob_sha
+                if batcher.on_file_stored is not None:
+                    # Nothing to embed; the file's old chunks are still out of date.
+                    batcher.on_file_stored(path)
+        except Exception as exc:
+            # Do not fail the full repo ingestion because one file is unreadable.
+            logger.warning("Skipping file during ingestion: %s (%s)", path, exc)
+            if progress is not None:
+                progress.file_done(error=True)
+            return 0
+
+        if progress is not None:
+            progress.file_done()
+        return len(documents)
+
+    def _ingest_from_archive(
+        self,
+        owner: str,
+        repo: str,
+        blobs: dict[str, str | None],
+        batcher: EmbeddingBatcher,
+        executor: BoundedExecutor,
+        futures: list[Future],
+        ingested: set[str],
+        ref: str | None = None,
+        progress: JobProgress | None = None,
+        empty: dict[str, str | None] | None = None,
+    ) -> None:
+        """Download the repository archive once and hand every wanted file to the workers."""
+
+        def include(path: str) -> bool:
+            return path in blobs and should_include_path(path)
+
+        def submit(path: str, content: str) -> None:
+            ingested.add(path)
+            futures.append(
+                executor.submit(
+                    self._ingest_file, owner, repo, path, batcher, blobs[path], content, progress, empty=empty
+                )
+            )
+
+        def on_binary(path: str) -> None:
+            # Ingested as an empty file, so its sha is recorded and its old chunks are dropped.
+            submit(path, "")
+
+        for path, content in self.processor.fetch_archive(
+            owner, repo, ref=ref, include=include, on_binary=on_binary
+        ):
+            if progress is not None:
+                progress.raise_if_cancelled()
+            submit(path, content)
+
+    def _ingest_per_file(
+        self,
+        owner: str,
+        repo: str,
+        blobs: dict[str, str | None],
+        batcher: EmbeddingBatcher,
+        executor: BoundedExecutor,
+        futures: list[Future],
+        ref: str | None = None,
+        progress: JobProgress | None = None,
+        empty: dict[str, str | None] | None = None,
+    ) -> None:
+        """Fetch each file at `ref` through the contents API."""
+        for path, blob_sha in blobs.items():
+            if progress is not None:
+                progress.raise_if_cancelled()
+            futures.append(
+                executor.submit(
+                    self._ingest_file, owner, repo, path, batcher, blob_sha, None, progress, ref, empty=empty
+                )
+            )
+
+    def _schedule_files(
+        self,
+        owner: str,
+        repo: str,
+        blobs: dict[str, str | None],
+        batcher: EmbeddingBatcher,
+        futures: list[Future],
+        empty: dict[str, str | None],
+        use_archive: bool,
+        ref: str | None = None,
+        progress: JobProgress | None = None,
+    ) -> None:
+        """Hand every file in `blobs` to the worker pool, from the archive or one by one."""
+        ingested: set[str] = set()
+        try:
+            with BoundedExecutor(
+                max_workers=self.max_workers,
+                max_pending=settings.INGESTION_MAX_PENDING,
+            ) as executor:
+                if not use_archive:
+                    self._ingest_per_file(owner, repo, blobs, batcher, executor, futures, ref, progress, empty)
+                else:
+                    try:
+                        self._ingest_from_archive(
+                            owner,
+                            repo,
+                            blobs,
+                            batcher,
+                            executor,
+                            futures,
+                            ingested,
+                            ref=ref,
+                            progress=progress,
+                            empty=empty,
+                        )
+                    except JobCancelled:
+                        raise
+                    except Exception as exc:
+                        logger.warning(
+                            "Archive ingestion failed for %s/%s after %d files; falling back to per-file fetch (%s)",
+                            owner,
+                            repo,
+                            len(ingested),
+                            exc,
+                        )
+                        remaining = {path: sha for path, sha in blobs.items() if path not in ingested}
+                        self._ingest_per_file(
+                            owner, repo, remaining, batcher, executor, futures, ref, progress, empty
+                        )
+        except JobCancelled:
+            logger.info("Ingestion for %s/%s cancelled after %d files.", owner, repo, len(futures))
+
+    def ingest_repo_tree(
+        self,
+        owner: str,
+        repo: str,
+        tree_payload: dict[str, Any],
+        ref: str | None = None,
+        incremental: bool = True,
+        progress: JobProgress | None = None,
+    ) -> int:
+        """
+        Ingest file nodes from the /tree payload into one repo collection.
+
+        When the collection already has embeddings and `incremental` is set,
+        only blobs whose sha differs from the stored one are re-embedded and
+        chunks for removed paths are deleted. Files that produced no chunks
+        (empty or binary) are recorded with their sha, so they count as
+        stored too. A changed file's old chunks are
+        deleted only once all of its new chunks are stored, so it never
+        disappears from search mid-run; otherwise an existing collection
+        is left untouched. Returns the number of chunks embedded by this run.
+        A collection keeps the dimensions it was embedded with unless others
+        are requested explicitly; a collection embedded with a different model
+        or dimensionality than this run's is re-embedded from scratch, and the
+        new settings are recorded in its `CollectionMetadata`.
+
+        File contents come from a single streamed archive of `ref` (the default
+        branch when omitted). Small incremental updates, and whatever is left
+        when the archive cannot be downloaded or is cut off, are fetched one by
+        one through the contents API. Chunking runs on a bounded worker pool,
+        so the archive stream pauses whenever the workers fall behind, and
+        chunks from all files are packed into shared token-budgeted embedding
+        batches.
+
+        When `progress` is given, file and chunk counters are reported to it and
+        a cancellation stops new files from being scheduled; chunks already
+        embedded are kept, so the next incremental run resumes from there.
+        """
+        collection_name = f"{owner}/{repo}"
+        current = self._blob_shas(tree_payload)
+        stored = self.get_stored_blob_shas(owner, repo)
+
+        # Vectors from different models or sizes cannot share a collection.
+        stored_config = vector_stores.embedding_config(collection_name, refresh=True) if stored else None
+        self.embedding_dimensions = self._resolve_embedding_dimensions(stored_config)
+        embedding_config = (self.embedding_model, self.embedding_dimensions)
+        if stored and stored_config != embedding_config:
+            # The ANN index no longer matches the new vectors and would only slow the bulk insert down.
+            collection_id = get_collection_id(collection_name)
+            if collection_id is not None:
+                drop_ann_indexes(collection_id)
+            deleted = delete_collection_embeddings(collection_name)
+            logger.info(
+                "Embedding settings for %s changed to %s; dropped %d chunks and re-embedding everything.",
+                collection_name,
+                embedding_config,
+                deleted,
+            )
+            stored = {}
+        # Stored chunks win over a stale record of the file being empty.
+        empty_shas = get_empty_blob_shas(collection_name)
+        stored = {**empty_shas, **stored}
+
+        if stored and not incremental:
+            logger.info("Skipping ingestion for %s/%s; embeddings already exist.", owner, repo)
+            return 0
+
+        blobs, removed = self._diff_blobs(stored, current)
+        if removed:
+            delete_empty_blobs(collection_name, [path for path in removed if path in empty_shas])
+            deleted = self.delete_node_embeddings(owner, repo, removed)
+            logger.info("Deleted %d chunks of %d removed files for %s/%s", deleted, len(removed), owner, repo)
+        # Changed files keep serving their old chunks until the new ones are stored.
+        replaced_chunk_ids = self.get_stored_chunk_ids(owner, repo, [path for path in blobs if path in stored])
+
+        def replace_file(path: str) -> None:
+            old_ids = replaced_chunk_ids.pop(path, None)
+            if old_ids:
+                self.delete_embeddings(old_ids)
+
+        if not blobs:
+            if removed:
+                self._record_collection(collection_name)
+            logger.info("No changed files to ingest for %s/%s.", owner, repo)
+            return 0
+        if progress is not None:
+            progress.set_total(len(blobs))
+
+        # The batcher embeds through the cache itself and only hands vectors to the store.
+        vector_store = vector_stores.get(collection_name)
+        self._record_collection(collection_name)
+
+        batcher = EmbeddingBatcher(
+            embeddings=self.embeddings,
+            vector_store=vector_store,
+            max_tokens=settings.EMBEDDING_BATCH_MAX_TOKENS,
+            max_documents=settings.EMBEDDING_BATCH_MAX_DOCUMENTS,
+            max_wait_seconds=settings.EMBEDDING_BATCH_MAX_WAIT_SECONDS,
+            on_stored=progress.chunks_stored if progress is not None else None,
+            on_file_stored=replace_file,
+        )
+
+        empty: dict[str, str | None] = {}
+        futures: list[Future] = []
+        # A handful of changed files is cheaper to fetch individually than via the archive.
+        use_archive = not stored or len(blobs) > settings.INCREMENTAL_PER_FILE_THRESHOLD
+
+        try:
+            self._schedule_files(owner, repo, blobs, batcher, futures, empty, use_archive, ref, progress)
+            for future in futures:
+                future.result()
+            stored_chunks = batcher.close()
+        finally:
+            # Answers cached from the previous chunks, in any worker, are keyed by the old version.
+            self._record_collection(collection_name)
+
+        # Files that now have chunks drop their empty record; a sha is needed to compare later runs.
+        delete_empty_blobs(collection_name, [path for path in blobs if path in empty_shas and path not in empty])
+        save_empty_blobs(collection_name, {path: sha for path, sha in empty.items() if sha})
+        if batcher.failed:
+            logger.warning("%d chunks for %s/%s could not be embedded.", batcher.failed, owner, repo)
+
+        try:
+            evict_embedding_cache(settings.EMBEDDING_CACHE_MAX_ENTRIES)
+        except Exception as exc:
+            logger.warning("Embedding cache eviction failed: %s", exc)
 
-        return total_documents
+        return stored_chunks
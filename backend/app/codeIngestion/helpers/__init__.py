@@ -1,9 +1,16 @@
 """ Helpers for code ingestion """
 
+from .concurrency import BoundedExecutor, HostLimiter
+from .embedding_batcher import EmbeddingBatcher
+from .embedding_cache import CachedEmbeddings
 from .metadata import CollectionMetadata, NodeMetadata
 from .node_processor import NodeChunk, NodeProcessor
 
 __all__ = [
+    "BoundedExecutor",
+    "HostLimiter",
+    "EmbeddingBatcher",
+    "CachedEmbeddings",
     "CollectionMetadata",
     "NodeMetadata",
     "NodeChunk",
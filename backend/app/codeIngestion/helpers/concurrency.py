@@ -0,0 +1,65 @@
+import threading
+from collections.abc import Callable, Iterator
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any
+from urllib.parse import urlsplit
+
+
+class BoundedExecutor:
+    """
+    Thread pool that applies backpressure to the submitting thread.
+
+    At most `max_pending` tasks may be queued or running at once; `submit`
+    blocks until a slot frees up, so a fast producer (e.g. an archive stream)
+    cannot buffer the whole repository in memory ahead of the workers.
+    """
+
+    def __init__(self, max_workers: int, max_pending: int, thread_name_prefix: str = "ingestion"):
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix=thread_name_prefix,
+        )
+        self._slots = threading.BoundedSemaphore(max(max_pending, max_workers))
+
+    def submit(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Future:
+        self._slots.acquire()
+        try:
+            future = self._executor.submit(fn, *args, **kwargs)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._executor.shutdown(wait=wait)
+
+    def __enter__(self) -> "BoundedExecutor":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.shutdown(wait=True)
+
+
+class HostLimiter:
+    """Caps the number of concurrent requests sent to any single host."""
+
+    def __init__(self, per_host: int):
+        self.per_host = per_host
+        self._semaphores: dict[str, threading.BoundedSemaphore] = {}
+        self._lock = threading.Lock()
+
+    def _semaphore(self, host: str) -> threading.BoundedSemaphore:
+        with self._lock:
+            semaphore = self._semaphores.get(host)
+            if semaphore is None:
+                semaphore = threading.BoundedSemaphore(self.per_host)
+                self._semaphores[host] = semaphore
+            return semaphore
+
+    @contextmanager
+    def limit(self, url: str) -> Iterator[None]:
+        semaphore = self._semaphore(urlsplit(url).netloc)
+        with semaphore:
+            yield
@@ -0,0 +1,241 @@
+import logging
+import threading
+import time
+from collections.abc import Callable
+from functools import lru_cache
+
+import tiktoken
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_postgres import PGVector
+
+logger = logging.getLogger(__name__)
+
+# Rejections caused by the batch's own inputs (too many tokens, an unembeddable text);
+# splitting the batch isolates the bad input. Anything else will not improve by splitting.
+INPUT_ERROR_STATUS_CODES = {400, 413, 422}
+
+
+@lru_cache(maxsize=1)
+def _encoding() -> tiktoken.Encoding:
+    # text-embedding-3-* models use the cl100k_base tokenizer.
+    return tiktoken.get_encoding("cl100k_base")
+
+
+def count_tokens(text: str) -> int:
+    return len(_encoding().encode_ordinary(text))
+
+
+def _node_path(document: Document) -> str:
+    return (document.metadata or {}).get("node_path", "")
+
+
+def _is_input_error(exc: Exception) -> bool:
+    return getattr(exc, "status_code", None) in INPUT_ERROR_STATUS_CODES
+
+
+class EmbeddingBatcher:
+    """
+    Packs documents from many files into token-budgeted embedding requests.
+
+    Workers call `add` concurrently; a batch is flushed once it reaches
+    `max_tokens` or `max_documents`, or once its oldest document has waited
+    `max_wait_seconds`. Each flush makes one embeddings request and one
+    PGVector insert. A batch the embeddings API rejects for its inputs is
+    split in half, so one bad input only drops itself. Other failures
+    (connection errors, 5xx, database errors) are retried with backoff; if
+    they persist the batcher stops embedding and `close` raises the error.
+
+    `on_file_stored` is called with a file's `node_path` once every chunk
+    queued for it has been stored; files that lost a chunk are not reported.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        vector_store: PGVector,
+        max_tokens: int,
+        max_documents: int,
+        max_wait_seconds: float,
+        max_retries: int = 3,
+        on_stored: Callable[[int], None] | None = None,
+        on_file_stored: Callable[[str], None] | None = None,
+    ):
+        self.embeddings = embeddings
+        self.vector_store = vector_store
+        self.max_tokens = max_tokens
+        self.max_documents = max_documents
+        self.max_wait_seconds = max_wait_seconds
+        self.max_retries = max_retries
+        self.on_stored = on_stored
+        self.on_file_stored = on_file_stored
+
+        self._lock = threading.Lock()
+        self._pending: list[Document] = []
+        self._pending_tokens = 0
+        self._oldest_pending_at: float | None = None
+        self._stored = 0
+        self._failed = 0
+        self._error: Exception | None = None
+        # Chunks still in flight per file, and files that dropped a chunk.
+        self._outstanding: dict[str, int] = {}
+        self._incomplete_files: set[str] = set()
+
+        self._closed = threading.Event()
+        self._timer = threading.Thread(target=self._flush_on_timeout, name="embedding-batcher", daemon=True)
+        self._timer.start()
+
+    @property
+    def stored(self) -> int:
+        with self._lock:
+            return self._stored
+
+    @property
+    def failed(self) -> int:
+        with self._lock:
+            return self._failed
+
+    @property
+    def error(self) -> Exception | None:
+        """The persistent failure that stopped the batcher, if any."""
+        with self._lock:
+            return self._error
+
+    def add(self, documents: list[Document]) -> None:
+        """Queue documents, flushing full batches on the calling thread."""
+        with self._lock:
+            if self._error is not None:
+                return
+            # Count the whole file first so a flush mid-way cannot report it as complete.
+            for document in documents:
+                path = _node_path(document)
+                self._outstanding[path] = self._outstanding.get(path, 0) + 1
+        for document in documents:
+            tokens = count_tokens(document.page_content)
+            batch = None
+            with self._lock:
+                if self._pending and (
+                    self._pending_tokens + tokens > self.max_tokens
+                    or len(self._pending) >= self.max_documents
+                ):
+                    batch = self._take_pending()
+                if not self._pending:
+                    self._oldest_pending_at = time.monotonic()
+                self._pending.append(document)
+                self._pending_tokens += tokens
+            if batch:
+                self._process(batch)
+
+    def flush(self) -> None:
+        with self._lock:
+            batch = self._take_pending()
+        if batch:
+            self._process(batch)
+
+    def close(self) -> int:
+        """Flush anything still pending, stop the timer and return the stored count."""
+        self._closed.set()
+        self._timer.join()
+        self.flush()
+        error = self.error
+        if error is not None:
+            raise error
+        return self.stored
+
+    def _take_pending(self) -> list[Document]:
+        batch = self._pending
+        self._pending = []
+        self._pending_tokens = 0
+        self._oldest_pending_at = None
+        return batch
+
+    def _flush_on_timeout(self) -> None:
+        interval = max(self.max_wait_seconds / 2, 0.05)
+        while not self._closed.wait(interval):
+            with self._lock:
+                expired = (
+                    self._oldest_pending_at is not None
+                    and time.monotonic() - self._oldest_pending_at >= self.max_wait_seconds
+                )
+                batch = self._take_pending() if expired else None
+            if batch:
+                self._process(batch)
+
+    def _process(self, batch: list[Document]) -> None:
+        if self.error is not None:
+            self._drop(batch)
+            return
+
+        for attempt in range(self.max_retries):
+            try:
+                self._embed_and_store(batch)
+                with self._lock:
+                    self._stored += len(batch)
+                    completed = self._settle(batch, stored=True)
+                if self.on_stored is not None:
+                    self.on_stored(len(batch))
+                if self.on_file_stored is not None:
+                    for path in completed:
+                        self.on_file_stored(path)
+                return
+            except Exception as exc:
+                if _is_input_error(exc):
+                    logger.warning("Embedding batch of %d documents was rejected: %s", len(batch), exc)
+                    break
+                logger.warning(
+                    "Embedding batch of %d documents failed (attempt %d/%d): %s",
+                    len(batch),
+                    attempt + 1,
+                    self.max_retries,
+                    exc,
+                )
+                if attempt + 1 == self.max_retries:
+                    logger.error("Stopping embedding after repeated failures: %s", exc)
+                    with self._lock:
+                        if self._error is None:
+                            self._error = exc
+                    self._drop(batch)
+                    return
+                time.sleep(2**attempt)
+
+        if len(batch) > 1:
+            middle = len(batch) // 2
+            self._process(batch[:middle])
+            self._process(batch[middle:])
+            return
+
+        metadata = batch[0].metadata or {}
+        logger.error("Dropping chunk %s rejected by the embeddings API.", metadata.get("chunk_id"))
+        self._drop(batch)
+
+    def _drop(self, batch: list[Document]) -> None:
+        with self._lock:
+            self._failed += len(batch)
+            self._settle(batch, stored=False)
+
+    def _settle(self, batch: list[Document], stored: bool) -> list[str]:
+        """Account for a finished batch; returns the files it completed. Call with the lock held."""
+        completed: list[str] = []
+        for document in batch:
+            path = _node_path(document)
+            if not stored:
+                self._incomplete_files.add(path)
+            remaining = self._outstanding.get(path, 1) - 1
+            if remaining > 0:
+                self._outstanding[path] = remaining
+                continue
+            self._outstanding.pop(path, None)
+            if path in self._incomplete_files:
+                self._incomplete_files.discard(path)
+            else:
+                completed.append(path)
+        return completed
+
+    def _embed_and_store(self, batch: list[Document]) -> None:
+        texts = [document.page_content for document in batch]
+        vectors = self.embeddings.embed_documents(texts)
+        self.vector_store.add_embeddings(
+            texts=texts,
+            embeddings=vectors,
+            metadatas=[document.metadata for document in batch],
+        )
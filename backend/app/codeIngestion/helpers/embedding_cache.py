@@ -0,0 +1,62 @@
+import hashlib
+import logging
+
+from langchain_core.embeddings import Embeddings
+
+from app.db.embedding_cache import (
+    get_cached_embeddings,
+    save_embeddings,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def embedding_model_key(model: str, dimensions: int | None = None) -> str:
+    """Cache key for a model; shortened vectors are cached apart from full-size ones."""
+    return model if dimensions is None else f"{model}@{dimensions}"
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that reuses stored vectors for identical document text.
+
+    Entries are keyed by model key (see `embedding_model_key`) plus a SHA-256
+    of the embedding text, so forks, branches and re-ingests of unchanged files
+    never hit the API. Cache failures are logged and treated as misses.
+    """
+
+    def __init__(self, embeddings: Embeddings, model_name: str):
+        self.embeddings = embeddings
+        self.model_name = model_name
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        hashes = [content_hash(text) for text in texts]
+
+        try:
+            cached = get_cached_embeddings(self.model_name, list(set(hashes)))
+        except Exception as exc:
+            logger.warning("Embedding cache lookup failed: %s", exc)
+            cached = {}
+
+        missing: dict[str, str] = {}
+        for text, text_hash in zip(texts, hashes):
+            if text_hash not in cached:
+                missing.setdefault(text_hash, text)
+
+        if missing:
+            vectors = self.embeddings.embed_documents(list(missing.values()))
+            computed = dict(zip(missing.keys(), vectors))
+            try:
+                save_embeddings(self.model_name, computed)
+            except Exception as exc:
+                logger.warning("Embedding cache write failed: %s", exc)
+            cached.update(computed)
+
+        return [cached[text_hash] for text_hash in hashes]
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.embeddings.embed_query(text)
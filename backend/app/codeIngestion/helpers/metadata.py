@@ -9,13 +9,36 @@ class CollectionMetadata:
     repo_id: str
     last_updated: str
     ingestion_version: str = "v1"
+    embedding_model: str | None = None
+    # None means the model's native dimensionality.
+    embedding_dimensions: int | None = None
 
     @classmethod
-    def create(cls, repo_id: str, ingestion_version: str = "v1") -> "CollectionMetadata":
+    def create(
+        cls,
+        repo_id: str,
+        embedding_model: str | None = None,
+        embedding_dimensions: int | None = None,
+        ingestion_version: str = "v1",
+    ) -> "CollectionMetadata":
         return cls(
             repo_id=repo_id,
             last_updated=datetime.now(timezone.utc).isoformat(),
             ingestion_version=ingestion_version,
+            embedding_model=embedding_model,
+            embedding_dimensions=embedding_dimensions,
+        )
+
+    @classmethod
+    def from_dict(cls, data: dict | None) -> "CollectionMetadata | None":
+        if not data or "repo_id" not in data:
+            return None
+        return cls(
+            repo_id=data["repo_id"],
+            last_updated=data.get("last_updated", ""),
+            ingestion_version=data.get("ingestion_version", "v1"),
+            embedding_model=data.get("embedding_model"),
+            embedding_dimensions=data.get("embedding_dimensions"),
         )
 
     def to_dict(self) -> dict:
@@ -30,6 +53,7 @@ class NodeMetadata:
     node_uuid: str
     node_path: str
     file_type: str | None = None
+    blob_sha: str | None = None
 
     def to_dict(self) -> dict:
         return asdict(self)
@@ -1,12 +1,50 @@
 import base64
+import io
+import logging
 import os
+import tarfile
+from collections.abc import Callable, Iterable, Iterator
 from urllib.parse import quote
 from dataclasses import dataclass
+from .concurrency import HostLimiter
 from .metadata import NodeMetadata
 
-import requests
+import httpx
 from langchain_text_splitters import RecursiveCharacterTextSplitter
+from app.core.config import settings
 from app.services.fernet import decrypt_token
+from app.services.github_client import GITHUB_API_URL, get_sync_client, github_headers
+
+logger = logging.getLogger(__name__)
+
+# Shared across processors so concurrent ingestions respect one per-host cap.
+_github_host_limiter = HostLimiter(per_host=settings.GITHUB_MAX_CONCURRENCY_PER_HOST)
+
+class _ByteStream(io.RawIOBase):
+    """Expose an iterator of byte chunks as a readable file object."""
+
+    def __init__(self, chunks: Iterable[bytes]):
+        self._chunks = iter(chunks)
+        self._buffer = b""
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        while not self._buffer:
+            try:
+                self._buffer = next(self._chunks)
+            except StopIteration:
+                return 0
+        size = min(len(buffer), len(self._buffer))
+        buffer[:size] = self._buffer[:size]
+        self._buffer = self._buffer[size:]
+        return size
+
+
+class BinaryContentError(RuntimeError):
+    """A file's content is not valid UTF-8."""
+
 
 @dataclass(frozen=True)
 class NodeChunk:
@@ -23,7 +61,7 @@ class NodeProcessor:
     Handles file content fetching from GitHub and recursive chunking.
     """
 
-    def __init__(self, session: str):
+    def __init__(self, session: str, host_limiter: HostLimiter | None = None):
         chunk_separators = [
             "\nclass ",
             "\ndef ",
@@ -36,6 +74,7 @@ class NodeProcessor:
             "",
         ]
         self.session = session
+        self.host_limiter = host_limiter or _github_host_limiter
         self.splitter = RecursiveCharacterTextSplitter(
             chunk_size=2200,
             chunk_overlap=320,
@@ -44,73 +83,159 @@ class NodeProcessor:
             is_separator_regex=False,
         )
 
-    def fetch_contents(self, owner: str, repo: str, path: str) -> str:
-        """
-        Fetch and decode a single repository file from GitHub API.
-
-        Expects `self.session` to be an encrypted GitHub token.
-        """
+    def _auth_headers(self) -> dict[str, str]:
         try:
             access_token = decrypt_token(self.session)
         except Exception as exc:
             raise RuntimeError("Failed to decrypt session token.") from exc
 
+        return github_headers(access_token)
+
+    def fetch_contents(self, owner: str, repo: str, path: str, ref: str | None = None) -> str:
+        """
+        Fetch and decode a single repository file from GitHub API.
+
+        Reads the file at `ref` (branch, tag or commit; the default branch when
+        omitted). Expects `self.session` to be an encrypted GitHub token.
+        """
         encoded_path = quote(path, safe="/")
-        url = f"https://api.github.com/repos/{owner}/{repo}/contents/{encoded_path}"
-        res = requests.get(
-            url,
-            headers={
-                "Authorization": f"Bearer {access_token}",
-                "Accept": "application/vnd.github+json",
-            },
-            timeout=15,
-        )
+        url = f"{GITHUB_API_URL}/repos/{owner}/{repo}/contents/{encoded_path}"
+        with self.host_limiter.limit(url):
+            res = get_sync_client().get(
+                url,
+                params={"ref": ref} if ref else None,
+                headers=self._auth_headers(),
+            )
         if res.status_code != 200:
             raise RuntimeError(f"Failed to fetch file {path}: {res.status_code} {res.text}")
 
         data = res.json()
         encoded_content = data.get("content", "")
-        if not isinstance(encoded_content, str) or not encoded_content:
+        # Files over the API's size limit come back with no content but a non-zero size.
+        if not isinstance(encoded_content, str) or (not encoded_content and data.get("size")):
             raise RuntimeError(f"Missing file content for {path}")
 
         try:
-            return base64.b64decode(encoded_content, validate=False).decode("utf-8")
+            decoded = base64.b64decode(encoded_content, validate=False)
         except Exception as exc:
             raise RuntimeError(f"Failed to decode file content for {path}") from exc
+        try:
+            return decoded.decode("utf-8")
+        except UnicodeDecodeError as exc:
+            raise BinaryContentError(f"File {path} is not valid UTF-8") from exc
+
+    def fetch_archive(
+        self,
+        owner: str,
+        repo: str,
+        ref: str | None = None,
+        include: Callable[[str], bool] | None = None,
+        on_binary: Callable[[str], None] | None = None,
+    ) -> Iterator[tuple[str, str]]:
+        """
+        Stream the repository tarball once and yield `(path, content)` for each file.
+
+        The archive is read as a stream, so members are decoded one at a time and
+        only the paths accepted by `include` are read into memory. Binary files
+        that are not valid UTF-8 are skipped and passed to `on_binary`.
+        """
+        url = f"{GITHUB_API_URL}/repos/{owner}/{repo}/tarball"
+        if ref:
+            url = f"{url}/{quote(ref, safe='')}"
+
+        with self.host_limiter.limit(url), get_sync_client().stream(
+            "GET",
+            url,
+            headers=self._auth_headers(),
+            timeout=httpx.Timeout(
+                settings.GITHUB_ARCHIVE_TIMEOUT_SECONDS,
+                connect=settings.GITHUB_CONNECT_TIMEOUT_SECONDS,
+            ),
+            # The API redirects to codeload; httpx drops the token on the cross-origin hop.
+            follow_redirects=True,
+        ) as res:
+            if res.status_code != 200:
+                res.read()
+                raise RuntimeError(f"Failed to fetch archive for {owner}/{repo}: {res.status_code} {res.text}")
+
+            stream = io.BufferedReader(_ByteStream(res.iter_bytes()), buffer_size=1024 * 1024)
+            with tarfile.open(fileobj=stream, mode="r|gz") as archive:
+                for member in archive:
+                    if not member.isfile():
+                        continue
+
+                    # Archive members are prefixed with "<owner>-<repo>-<sha>/".
+                    _, _, path = member.name.partition("/")
+                    if not path or (include is not None and not include(path)):
+                        continue
+
+                    extracted = archive.extractfile(member)
+                    if extracted is None:
+                        continue
+
+                    try:
+                        content = extracted.read().decode("utf-8")
+                    except UnicodeDecodeError:
+                        logger.debug("Skipping non UTF-8 archive member: %s", path)
+                        if on_binary is not None:
+                            on_binary(path)
+                        continue
+
+                    yield path, content
 
     def create_chunks(self, content: str) -> list[str]:
         return self.splitter.split_text(content)
 
+    def build_chunks(
+        self,
+        owner: str,
+        repo: str,
+        path: str,
+        content: str,
+        blob_sha: str | None = None,
+    ) -> list[NodeChunk]:
+        """Split already-fetched file content into metadata-rich chunk objects."""
+        chunks = self.create_chunks(content)
+
+        repo_id = f"{owner}/{repo}"
+        node_uuid = path
+        ext = os.path.splitext(path)[1]
+        file_type = ext.lstrip(".") if ext else None
+        metadata = NodeMetadata(
+            repo_id=repo_id,
+            node_uuid=node_uuid,
+            node_path=path,
+            file_type=file_type,
+            blob_sha=blob_sha,
+        )
 
-    def process_node(self, owner: str, repo: str, path: str) -> list[NodeChunk]:
-        """Fetch a node's content and return metadata-rich chunk objects."""
-        try:
-            content = self.fetch_contents(owner, repo, path)
-            chunks = self.create_chunks(content)
-
-            repo_id = f"{owner}/{repo}"
-            node_uuid = path
-            ext = os.path.splitext(path)[1]
-            file_type = ext.lstrip(".") if ext else None
-            metadata = NodeMetadata(
-                repo_id=repo_id,
-                node_uuid=node_uuid,
-                node_path=path,
-                file_type=file_type,
-            )
-
-            node_chunks: list[NodeChunk] = []
-            for chunk_index, text in enumerate(chunks):
-                node_chunks.append(
-                    NodeChunk(
-                        chunk_id=f"{node_uuid}:{chunk_index}",
-                        chunk_index=chunk_index,
-                        text=text,
-                        metadata=metadata,
-                    )
+        node_chunks: list[NodeChunk] = []
+        for chunk_index, text in enumerate(chunks):
+            node_chunks.append(
+                NodeChunk(
+                    chunk_id=f"{node_uuid}:{chunk_index}",
+                    chunk_index=chunk_index,
+                    text=text,
+                    metadata=metadata,
                 )
+            )
 
-            return node_chunks
+        return node_chunks
+
+    def process_node(
+        self,
+        owner: str,
+        repo: str,
+        path: str,
+        blob_sha: str | None = None,
+        ref: str | None = None,
+    ) -> list[NodeChunk]:
+        """Fetch a node's content at `ref` and return metadata-rich chunk objects; binary files have none."""
+        try:
+            content = self.fetch_contents(owner, repo, path, ref=ref)
+            return self.build_chunks(owner, repo, path, content, blob_sha=blob_sha)
+        except BinaryContentError:
+            logger.debug("Skipping non UTF-8 file: %s", path)
+            return []
         except Exception as e:
             raise RuntimeError(f"Missing file content for {path}") from e
-        
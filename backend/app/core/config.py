@@ -17,11 +17,98 @@ class Settings:
     GITHUB_REDIRECT_URI: str = os.getenv("GITHUB_REDIRECT_URI")
     FRONTEND_BASE_URL: str = os.getenv("FRONTEND_BASE_URL")
 
+    # GitHub HTTP client
+    GITHUB_TIMEOUT_SECONDS: float = float(os.getenv("GITHUB_TIMEOUT_SECONDS", "15"))
+    GITHUB_CONNECT_TIMEOUT_SECONDS: float = float(os.getenv("GITHUB_CONNECT_TIMEOUT_SECONDS", "5"))
+    GITHUB_ARCHIVE_TIMEOUT_SECONDS: float = float(os.getenv("GITHUB_ARCHIVE_TIMEOUT_SECONDS", "60"))
+    GITHUB_MAX_CONNECTIONS: int = int(os.getenv("GITHUB_MAX_CONNECTIONS", "100"))
+    GITHUB_MAX_KEEPALIVE_CONNECTIONS: int = int(os.getenv("GITHUB_MAX_KEEPALIVE_CONNECTIONS", "20"))
+    GITHUB_KEEPALIVE_EXPIRY_SECONDS: float = float(os.getenv("GITHUB_KEEPALIVE_EXPIRY_SECONDS", "30"))
+
+    # GitHub response cache
+    GITHUB_CACHE_MAX_ENTRIES: int = int(os.getenv("GITHUB_CACHE_MAX_ENTRIES", "2048"))
+    GITHUB_CACHE_MAX_BODY_BYTES: int = int(os.getenv("GITHUB_CACHE_MAX_BODY_BYTES", str(5 * 1024 * 1024)))
+    # Total body bytes the in-memory tier holds per worker; least recently used entries go first.
+    GITHUB_CACHE_MAX_MEMORY_BYTES: int = int(os.getenv("GITHUB_CACHE_MAX_MEMORY_BYTES", str(256 * 1024 * 1024)))
+    GITHUB_CACHE_PERSIST: bool = os.getenv("GITHUB_CACHE_PERSIST", "false").lower() in {"1", "true", "yes"}
+    GITHUB_CACHE_MAX_AGE_SECONDS: int = int(os.getenv("GITHUB_CACHE_MAX_AGE_SECONDS", str(60 * 60 * 24 * 7)))
+
     # Server config
     HOST = os.getenv("HOST", "0.0.0.0")
     PORT = int(os.getenv("PORT"))
     RELOAD: bool = True
     DATABASE_URL: str = os.getenv("DATABASE_URL")
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", "10"))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+    DB_POOL_RECYCLE_SECONDS: int = int(os.getenv("DB_POOL_RECYCLE_SECONDS", "1800"))
+    DB_MIGRATE_ON_STARTUP: bool = os.getenv("DB_MIGRATE_ON_STARTUP", "true").lower() in {"1", "true", "yes"}
+    VECTOR_STORE_CACHE_MAX_ENTRIES: int = int(os.getenv("VECTOR_STORE_CACHE_MAX_ENTRIES", "64"))
+    VECTOR_STORE_CONFIG_TTL_SECONDS: float = float(os.getenv("VECTOR_STORE_CONFIG_TTL_SECONDS", "60"))
+
+    # Embeddings
+    EMBEDDING_MODEL: str = os.getenv("EMBEDDING_MODEL", "text-embedding-3-large")
+    EMBEDDING_CACHE_MAX_ENTRIES: int = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "500000"))
+    # text-embedding-3 models can return shortened vectors; unset keeps the native size.
+    EMBEDDING_DIMENSIONS: int | None = int(os.getenv("EMBEDDING_DIMENSIONS")) if os.getenv("EMBEDDING_DIMENSIONS") else None
+    QUERY_EMBEDDING_CACHE_MAX_ENTRIES: int = int(os.getenv("QUERY_EMBEDDING_CACHE_MAX_ENTRIES", "4096"))
+
+    # Vector indexes (built by `python -m app.db.vector_index`)
+    VECTOR_INDEX_METHOD: str = os.getenv("VECTOR_INDEX_METHOD", "hnsw")
+    VECTOR_HNSW_M: int = int(os.getenv("VECTOR_HNSW_M", "16"))
+    VECTOR_HNSW_EF_CONSTRUCTION: int = int(os.getenv("VECTOR_HNSW_EF_CONSTRUCTION", "64"))
+    VECTOR_HNSW_EF_SEARCH: int = int(os.getenv("VECTOR_HNSW_EF_SEARCH", "40"))
+    # 0 picks rows / 1000 per collection.
+    VECTOR_IVFFLAT_LISTS: int = int(os.getenv("VECTOR_IVFFLAT_LISTS", "0"))
+    VECTOR_IVFFLAT_PROBES: int = int(os.getenv("VECTOR_IVFFLAT_PROBES", "10"))
+
+    # Chat retrieval
+    HYBRID_RETRIEVAL_ENABLED: bool = os.getenv("HYBRID_RETRIEVAL_ENABLED", "true").lower() in {"1", "true", "yes"}
+    RETRIEVAL_TOP_K: int = int(os.getenv("RETRIEVAL_TOP_K", "6"))
+    RETRIEVAL_CANDIDATES: int = int(os.getenv("RETRIEVAL_CANDIDATES", "20"))
+    RETRIEVAL_RRF_K: int = int(os.getenv("RETRIEVAL_RRF_K", "60"))
+    RETRIEVAL_GRAPH_BOOST: float = float(os.getenv("RETRIEVAL_GRAPH_BOOST", "0.5"))
+    CHAT_CONTEXT_MAX_TOKENS: int = int(os.getenv("CHAT_CONTEXT_MAX_TOKENS", "4000"))
+
+    # File explanations
+    EXPLANATION_MAX_CHARS: int = int(os.getenv("EXPLANATION_MAX_CHARS", "24000"))
+    SUMMARY_WORKERS: int = int(os.getenv("SUMMARY_WORKERS", "8"))
+    SUMMARY_CHILD_MAX_CHARS: int = int(os.getenv("SUMMARY_CHILD_MAX_CHARS", "600"))
+
+    # Chat guardrail
+    GUARDRAIL_RULES_ENABLED: bool = os.getenv("GUARDRAIL_RULES_ENABLED", "true").lower() in {"1", "true", "yes"}
+    GUARDRAIL_CONCURRENT: bool = os.getenv("GUARDRAIL_CONCURRENT", "true").lower() in {"1", "true", "yes"}
+    GUARDRAIL_CACHE_MAX_ENTRIES: int = int(os.getenv("GUARDRAIL_CACHE_MAX_ENTRIES", "2048"))
+
+    # Chat answer cache
+    ANSWER_CACHE_ENABLED: bool = os.getenv("ANSWER_CACHE_ENABLED", "true").lower() in {"1", "true", "yes"}
+    ANSWER_CACHE_SIMILARITY_THRESHOLD: float = float(os.getenv("ANSWER_CACHE_SIMILARITY_THRESHOLD", "0.95"))
+    ANSWER_CACHE_TTL_SECONDS: int = int(os.getenv("ANSWER_CACHE_TTL_SECONDS", "3600"))
+    ANSWER_CACHE_MAX_ENTRIES_PER_REPO: int = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES_PER_REPO", "256"))
+    ANSWER_CACHE_MAX_REPOS: int = int(os.getenv("ANSWER_CACHE_MAX_REPOS", "256"))
+
+    # Ingestion
+    INGESTION_WORKERS: int = int(os.getenv("INGESTION_WORKERS", "8"))
+    INGESTION_MAX_PENDING: int = int(os.getenv("INGESTION_MAX_PENDING", "32"))
+    GITHUB_MAX_CONCURRENCY_PER_HOST: int = int(os.getenv("GITHUB_MAX_CONCURRENCY_PER_HOST", "6"))
+
+    INCREMENTAL_PER_FILE_THRESHOLD: int = int(os.getenv("INCREMENTAL_PER_FILE_THRESHOLD", "25"))
+    EMBEDDING_BATCH_MAX_TOKENS: int = int(os.getenv("EMBEDDING_BATCH_MAX_TOKENS", "100000"))
+    EMBEDDING_BATCH_MAX_DOCUMENTS: int = int(os.getenv("EMBEDDING_BATCH_MAX_DOCUMENTS", "512"))
+    EMBEDDING_BATCH_MAX_WAIT_SECONDS: float = float(os.getenv("EMBEDDING_BATCH_MAX_WAIT_SECONDS", "2.0"))
+
+    # Background jobs
+    JOB_WORKERS: int = int(os.getenv("JOB_WORKERS", "2"))
+    JOB_HEARTBEAT_SECONDS: float = float(os.getenv("JOB_HEARTBEAT_SECONDS", "2.0"))
+    JOB_STALE_SECONDS: int = int(os.getenv("JOB_STALE_SECONDS", "120"))
+
+    # Sessions
+    # Other workers keep accepting a logged-out session for up to this long; raise it only with a single worker.
+    SESSION_CACHE_TTL_SECONDS: int = int(os.getenv("SESSION_CACHE_TTL_SECONDS", "15"))
+    SESSION_CACHE_MAX_ENTRIES: int = int(os.getenv("SESSION_CACHE_MAX_ENTRIES", "10000"))
+
+    # Repository graphs
+    GRAPH_SNAPSHOTS_ENABLED: bool = os.getenv("GRAPH_SNAPSHOTS_ENABLED", "true").lower() in {"1", "true", "yes"}
+    GRAPH_SNAPSHOT_COMPRESSION_LEVEL: int = int(os.getenv("GRAPH_SNAPSHOT_COMPRESSION_LEVEL", "6"))
 
     # Encryption
     FERNET_KEY: str = os.getenv("FERNET_KEY")
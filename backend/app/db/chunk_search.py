@@ -0,0 +1,72 @@
+"""
+Lexical search over embedded chunks: full-text on chunk text, trigram on paths.
+
+Both queries are scoped to one collection and backed by the shared GIN
+indexes that `app.db.vector_index.ensure_collection_indexes` creates.
+"""
+from langchain_core.documents import Document
+from sqlalchemy import text
+
+from app.db.engine import async_engine
+from app.db.vector_index import aget_collection_id, rows_to_documents
+
+
+def _text_search_statement(collection_id: str, tokens: list[str], k: int):
+    """Rank chunks by how many query tokens they contain (OR query, cover density)."""
+    statement = text(
+        f"""
+        SELECT id, document, cmetadata
+        FROM langchain_pg_embedding, to_tsquery('simple', :tsquery) AS query
+        WHERE collection_id = '{collection_id}'
+          AND to_tsvector('simple', document) @@ query
+        ORDER BY ts_rank_cd(to_tsvector('simple', document), query) DESC
+        LIMIT :k
+        """
+    )
+    return statement, {"tsquery": " | ".join(tokens), "k": k}
+
+
+def _path_search_statement(collection_id: str, terms: list[str], k: int):
+    """Rank files by the best trigram word similarity of any term to their path; one chunk per file."""
+    params: dict = {"k": k}
+    matches = []
+    scores = []
+    for idx, term in enumerate(terms):
+        params[f"term_{idx}"] = term
+        matches.append(f":term_{idx} <% (cmetadata->>'node_path')")
+        scores.append(f"word_similarity(:term_{idx}, cmetadata->>'node_path')")
+
+    statement = text(
+        f"""
+        SELECT id, document, cmetadata
+        FROM (
+            SELECT DISTINCT ON (cmetadata->>'node_path')
+                id, document, cmetadata, GREATEST({", ".join(scores)}) AS score
+            FROM langchain_pg_embedding
+            WHERE collection_id = '{collection_id}'
+              AND ({" OR ".join(matches)})
+            ORDER BY cmetadata->>'node_path', CAST(cmetadata->>'chunk_index' AS INTEGER)
+        ) AS files
+        ORDER BY score DESC
+        LIMIT :k
+        """
+    )
+    return statement, params
+
+
+async def atext_search_collection(collection_name: str, tokens: list[str], k: int) -> list[Document]:
+    collection_id = await aget_collection_id(collection_name)
+    if collection_id is None or not tokens:
+        return []
+    statement, params = _text_search_statement(collection_id, tokens, k)
+    async with async_engine.begin() as connection:
+        return rows_to_documents((await connection.execute(statement, params)).fetchall())
+
+
+async def apath_search_collection(collection_name: str, terms: list[str], k: int) -> list[Document]:
+    collection_id = await aget_collection_id(collection_name)
+    if collection_id is None or not terms:
+        return []
+    statement, params = _path_search_statement(collection_id, terms, k)
+    async with async_engine.begin() as connection:
+        return rows_to_documents((await connection.execute(statement, params)).fetchall())
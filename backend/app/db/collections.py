@@ -0,0 +1,98 @@
+import json
+
+from sqlalchemy import text
+
+from app.db.engine import async_engine, engine
+
+COLLECTION_METADATA_QUERY = text(
+    """
+    SELECT cmetadata
+    FROM langchain_pg_collection
+    WHERE name = :collection_name
+    """
+)
+
+
+def get_collection_metadata(collection_name: str) -> dict | None:
+    """Return the metadata stored on a PGVector collection, or None if it does not exist."""
+    with engine.begin() as connection:
+        return connection.execute(
+            COLLECTION_METADATA_QUERY,
+            {"collection_name": collection_name},
+        ).scalar_one_or_none()
+
+
+async def aget_collection_metadata(collection_name: str) -> dict | None:
+    async with async_engine.begin() as connection:
+        result = await connection.execute(
+            COLLECTION_METADATA_QUERY,
+            {"collection_name": collection_name},
+        )
+        return result.scalar_one_or_none()
+
+
+def save_collection_metadata(collection_name: str, metadata: dict) -> None:
+    with engine.begin() as connection:
+        connection.execute(
+            text(
+                """
+                UPDATE langchain_pg_collection
+                SET cmetadata = CAST(:metadata AS JSON)
+                WHERE name = :collection_name
+                """
+            ),
+            {"collection_name": collection_name, "metadata": json.dumps(metadata)},
+        )
+
+
+def delete_collection_embeddings(collection_name: str) -> int:
+    """Delete every embedding in a collection but keep the collection row."""
+    with engine.begin() as connection:
+        result = connection.execute(
+            text(
+                """
+                DELETE FROM langchain_pg_embedding AS e
+                USING langchain_pg_collection AS c
+                WHERE e.collection_id = c.uuid
+                  AND c.name = :collection_name
+                """
+            ),
+            {"collection_name": collection_name},
+        )
+    return result.rowcount or 0
+
+
+def get_empty_blob_shas(collection_name: str) -> dict[str, str]:
+    """Return the blob sha of every file ingested without chunks (empty or binary), keyed by path."""
+    with engine.begin() as connection:
+        rows = connection.execute(
+            text("SELECT path, blob_sha FROM collection_empty_blobs WHERE collection_name = :collection_name"),
+            {"collection_name": collection_name},
+        ).fetchall()
+    return {path: blob_sha for path, blob_sha in rows}
+
+
+def save_empty_blobs(collection_name: str, blobs: dict[str, str]) -> None:
+    if not blobs:
+        return
+    with engine.begin() as connection:
+        connection.execute(
+            text(
+                """
+                INSERT INTO collection_empty_blobs (collection_name, path, blob_sha)
+                VALUES (:collection_name, :path, :blob_sha)
+                ON CONFLICT (collection_name, path) DO UPDATE SET blob_sha = EXCLUDED.blob_sha
+                """
+            ),
+            [{"collection_name": collection_name, "path": path, "blob_sha": sha} for path, sha in blobs.items()],
+        )
+
+
+def delete_empty_blobs(collection_name: str, paths: list[str]) -> None:
+    if not paths:
+        return
+    with engine.begin() as connection:
+        connection.execute(
+            text("DELETE FROM collection_empty_blobs WHERE collection_name = :collection_name AND path = ANY(:paths)"),
+            {"collection_name": collection_name, "paths": paths},
+        )
@@ -0,0 +1,127 @@
+import logging
+
+from sqlalchemy import text
+
+from app.db.engine import engine
+
+logger = logging.getLogger(__name__)
+
+# `last_used_at` only orders eviction, so a hit refreshes it at most this often.
+TOUCH_INTERVAL_SECONDS = 60 * 60
+
+
+def get_cached_embeddings(model: str, content_hashes: list[str]) -> dict[str, list[float]]:
+    """
+    Return cached vectors by content hash and mark stale hits as recently used.
+
+    The lookup is a plain read; refreshing `last_used_at` runs afterwards in its
+    own transaction (see `_touch_embeddings`), so concurrent batches never wait
+    on each other's hits.
+    """
+    if not content_hashes:
+        return {}
+
+    with engine.begin() as connection:
+        rows = connection.execute(
+            text(
+                """
+                SELECT
+                    content_hash,
+                    embedding,
+                    last_used_at < NOW() - make_interval(secs => :touch_interval) AS stale
+                FROM embedding_cache
+                WHERE model = :model AND content_hash = ANY(:content_hashes)
+                """
+            ),
+            {"model": model, "content_hashes": content_hashes, "touch_interval": TOUCH_INTERVAL_SECONDS},
+        ).fetchall()
+
+    stale = [row[0] for row in rows if row[2]]
+    if stale:
+        try:
+            _touch_embeddings(model, stale)
+        except Exception as exc:
+            logger.warning("Embedding cache touch failed: %s", exc)
+    return {row[0]: list(row[1]) for row in rows}
+
+
+def _touch_embeddings(model: str, content_hashes: list[str]) -> None:
+    """Refresh `last_used_at`; rows are locked in key order and rows locked elsewhere are skipped."""
+    with engine.begin() as connection:
+        connection.execute(
+            text(
+                """
+                UPDATE embedding_cache AS cache
+                SET last_used_at = NOW()
+                FROM (
+                    SELECT model, content_hash
+                    FROM embedding_cache
+                    WHERE model = :model AND content_hash = ANY(:content_hashes)
+                    ORDER BY content_hash
+                    FOR UPDATE SKIP LOCKED
+                ) AS locked
+                WHERE cache.model = locked.model AND cache.content_hash = locked.content_hash
+                """
+            ),
+            {"model": model, "content_hashes": content_hashes},
+        )
+
+
+def save_embeddings(model: str, embeddings: dict[str, list[float]]) -> None:
+    """Store freshly computed vectors keyed by content hash."""
+    if not embeddings:
+        return
+
+    with engine.begin() as connection:
+        connection.execute(
+            text(
+                """
+                INSERT INTO embedding_cache (model, content_hash, embedding)
+                VALUES (:model, :content_hash, :embedding)
+                ON CONFLICT (model, content_hash) DO UPDATE SET
+                    last_used_at = NOW()
+                """
+            ),
+            # Key order, so concurrent writers of overlapping batches cannot deadlock.
+            [
+                {"model": model, "content_hash": content_hash, "embedding": embeddings[content_hash]}
+                for content_hash in sorted(embeddings)
+            ],
+        )
+
+
+def evict_embedding_cache(max_entries: int) -> int:
+    """
+    Delete the least recently used entries beyond `max_entries`.
+
+    The planner's row estimate gates the exact count, so runs that stay under
+    the limit cost one catalog lookup. Eviction walks the `last_used_at`
+    index from the oldest entry instead of sorting the table.
+    """
+    with engine.begin() as connection:
+        estimate = connection.execute(
+            text("SELECT reltuples FROM pg_class WHERE oid = 'embedding_cache'::regclass")
+        ).scalar_one_or_none()
+        if estimate is None or estimate <= max_entries:
+            return 0
+
+        excess = connection.execute(text("SELECT COUNT(*) FROM embedding_cache")).scalar_one() - max_entries
+        if excess <= 0:
+            return 0
+
+        result = connection.execute(
+            text(
+                """
+                DELETE FROM embedding_cache
+                WHERE ctid IN (
+                    SELECT ctid
+                    FROM embedding_cache
+                    ORDER BY last_used_at
+                    LIMIT :excess
+                    FOR UPDATE SKIP LOCKED
+                )
+                """
+            ),
+            {"excess": excess},
+        )
+    return result.rowcount or 0
@@ -0,0 +1,77 @@
+from sqlalchemy import text
+
+from app.db.engine import engine
+
+
+def get_explanation(repo_key: str, path: str, blob_sha: str) -> str | None:
+    """Return the stored summary for one version of a file."""
+    with engine.begin() as connection:
+        return connection.execute(
+            text(
+                """
+                SELECT summary
+                FROM file_explanations
+                WHERE repo_key = :repo_key AND path = :path AND blob_sha = :blob_sha
+                """
+            ),
+            {"repo_key": repo_key, "path": path, "blob_sha": blob_sha},
+        ).scalar_one_or_none()
+
+
+def get_explanations_by_sha(repo_key: str, blob_shas: list[str]) -> dict[str, str]:
+    """Return stored summaries for many blob shas in one read, keyed by sha."""
+    if not blob_shas:
+        return {}
+
+    with engine.begin() as connection:
+        rows = connection.execute(
+            text(
+                """
+                SELECT blob_sha, summary
+                FROM file_explanations
+                WHERE repo_key = :repo_key AND blob_sha = ANY(:blob_shas)
+                """
+            ),
+            {"repo_key": repo_key, "blob_shas": blob_shas},
+        ).fetchall()
+    return {row[0]: row[1] for row in rows}
+
+
+def get_latest_explanations(repo_key: str) -> list[dict]:
+    """Return the most recent summary per path for a repository."""
+    with engine.begin() as connection:
+        rows = connection.execute(
+            text(
+                """
+                SELECT DISTINCT ON (path) path, blob_sha, summary, created_at
+                FROM file_explanations
+                WHERE repo_key = :repo_key
+                ORDER BY path, created_at DESC
+                """
+            ),
+            {"repo_key": repo_key},
+        ).mappings().all()
+    return [dict(row) for row in rows]
+
+
+def save_explanation(repo_key: str, path: str, blob_sha: str, summary: str, model: str) -> None:
+    with engine.begin() as connection:
+        connection.execute(
+            text(
+                """
+                INSERT INTO file_explanations (repo_key, path, blob_sha, summary, model)
+                VALUES (:repo_key, :path, :blob_sha, :summary, :model)
+                ON CONFLICT (repo_key, path, blob_sha) DO UPDATE SET
+                    summary = EXCLUDED.summary,
+                    model = EXCLUDED.model,
+                    created_at = NOW()
+                """
+            ),
+            {
+                "repo_key": repo_key,
+                "path": path,
+                "blob_sha": blob_sha,
+                "summary": summary,
+                "model": model,
+            },
+        )
@@ -0,0 +1,47 @@
+from sqlalchemy import text
+
+from app.db.engine import engine
+
+
+def get_cached_response(cache_key: str) -> tuple[str, bytes] | None:
+    """Return `(etag, body)` for a cache key, if stored."""
+    with engine.begin() as connection:
+        row = connection.execute(
+            text("SELECT etag, body FROM github_response_cache WHERE cache_key = :cache_key"),
+            {"cache_key": cache_key},
+        ).fetchone()
+    if not row:
+        return None
+    return row[0], bytes(row[1])
+
+
+def save_cached_response(cache_key: str, etag: str, body: bytes) -> None:
+    with engine.begin() as connection:
+        connection.execute(
+            text(
+                """
+                INSERT INTO github_response_cache (cache_key, etag, body, updated_at)
+                VALUES (:cache_key, :etag, :body, NOW())
+                ON CONFLICT (cache_key) DO UPDATE SET
+                    etag = EXCLUDED.etag,
+                    body = EXCLUDED.body,
+                    updated_at = NOW()
+                """
+            ),
+            {"cache_key": cache_key, "etag": etag, "body": body},
+        )
+
+
+def prune_github_cache(max_age_seconds: int) -> int:
+    """Delete entries that have not been refreshed within `max_age_seconds`."""
+    with engine.begin() as connection:
+        result = connection.execute(
+            text(
+                """
+                DELETE FROM github_response_cache
+                WHERE updated_at < NOW() - (:max_age_seconds * INTERVAL '1 second')
+                """
+            ),
+            {"max_age_seconds": max_age_seconds},
+        )
+    return result.rowcount or 0
@@ -0,0 +1,137 @@
+"""
+Pre-serialized, gzip-compressed `/tree` responses stored next to `nodes`/`edges`.
+
+A snapshot is the complete JSON response for one stored graph, as of the
+commit it was written for, and records the tree it was encoded from. Serving
+it skips the relational rebuild, Pydantic validation and JSON encoding; gzip
+clients get the stored bytes unchanged.
+"""
+import gzip
+import json
+
+from sqlalchemy import text
+
+from app.core.config import settings
+from app.db.engine import engine
+from app.schemas.node import GraphPayload
+
+SNAPSHOT_ENCODING = "json+gzip"
+
+
+def _response_head(repo_id: int, ref: str, commit_sha: str) -> str:
+    """The response fields that precede `nodes`, without the closing brace."""
+    return json.dumps({"repo_id": repo_id, "ref": ref, "commit_sha": commit_sha}, separators=(",", ":"))[:-1]
+
+
+def _compress(payload: str) -> bytes:
+    return gzip.compress(payload.encode(), compresslevel=settings.GRAPH_SNAPSHOT_COMPRESSION_LEVEL)
+
+
+def encode_graph(graph: GraphPayload, repo_id: int, ref: str, commit_sha: str) -> bytes:
+    """Serialize a `/tree` response to a snapshot, matching the JSON FastAPI would emit for it."""
+    nodes = [
+        {"id": node.id, "name": node.name, "path": node.path, "file_type": node.file_type, "sha": node.sha}
+        for node in graph.nodes
+    ]
+    edges = [
+        {"source": edge.source, "target": edge.target, "type": edge.type, "label": edge.label}
+        for edge in graph.edges
+    ]
+    return _compress(
+        _response_head(repo_id, ref, commit_sha)
+        + ',"nodes":'
+        + json.dumps(nodes, separators=(",", ":"))
+        + ',"edges":'
+        + json.dumps(edges, separators=(",", ":"))
+        + "}"
+    )
+
+
+def rebase_snapshot(body: bytes, repo_id: int, ref: str, old_commit_sha: str, new_commit_sha: str) -> bytes | None:
+    """Rewrite a snapshot for a newer commit with the same tree; None if it does not start as expected."""
+    payload = gzip.decompress(body).decode()
+    old_head = _response_head(repo_id, ref, old_commit_sha)
+    if not payload.startswith(old_head):
+        return None
+    return _compress(_response_head(repo_id, ref, new_commit_sha) + payload[len(old_head) :])
+
+
+def save_graph_snapshot(graph_id: int, commit_sha: str, tree_sha: str, body: bytes, connection) -> None:
+    """Store the snapshot of a graph being saved, inside the transaction that writes the graph."""
+    connection.execute(
+        text(
+            """
+            INSERT INTO graph_snapshots (graph_id, commit_sha, tree_sha, encoding, body, created_at)
+            VALUES (:graph_id, :commit_sha, :tree_sha, :encoding, :body, NOW())
+            ON CONFLICT (graph_id) DO UPDATE SET
+                commit_sha = EXCLUDED.commit_sha,
+                tree_sha = EXCLUDED.tree_sha,
+                encoding = EXCLUDED.encoding,
+                body = EXCLUDED.body,
+                created_at = NOW()
+            """
+        ),
+        {
+            "graph_id": graph_id,
+            "commit_sha": commit_sha,
+            "tree_sha": tree_sha,
+            "encoding": SNAPSHOT_ENCODING,
+            "body": body,
+        },
+    )
+
+
+def refresh_graph_snapshot(graph_id: int, commit_sha: str, tree_sha: str, body: bytes) -> bool:
+    """
+    Store a snapshot encoded or rebased by a reader; returns False if it was discarded.
+
+    The write only applies while the stored graph is still `tree_sha`, and
+    never replaces a snapshot of another tree, so a slow reader cannot put an
+    older graph back over one saved meanwhile.
+    """
+    with engine.begin() as connection:
+        row = connection.execute(
+            text(
+                """
+                INSERT INTO graph_snapshots (graph_id, commit_sha, tree_sha, encoding, body, created_at)
+                SELECT id, :commit_sha, :tree_sha, :encoding, :body, NOW()
+                FROM repo_graphs
+                WHERE id = :graph_id AND tree_sha = :tree_sha
+                ON CONFLICT (graph_id) DO UPDATE SET
+                    commit_sha = EXCLUDED.commit_sha,
+                    tree_sha = EXCLUDED.tree_sha,
+                    encoding = EXCLUDED.encoding,
+                    body = EXCLUDED.body,
+                    created_at = NOW()
+                WHERE graph_snapshots.tree_sha IS NULL OR graph_snapshots.tree_sha = EXCLUDED.tree_sha
+                RETURNING graph_id
+                """
+            ),
+            {
+                "graph_id": graph_id,
+                "commit_sha": commit_sha,
+                "tree_sha": tree_sha,
+                "encoding": SNAPSHOT_ENCODING,
+                "body": body,
+            },
+        ).fetchone()
+    return row is not None
+
+
+def delete_graph_snapshot(graph_id: int, connection) -> None:
+    connection.execute(
+        text("DELETE FROM graph_snapshots WHERE graph_id = :graph_id"),
+        {"graph_id": graph_id},
+    )
+
+
+def get_graph_snapshot(graph_id: int, tree_sha: str) -> tuple[str, bytes] | None:
+    """Return `(commit_sha, body)` of a graph's snapshot if it was encoded from `tree_sha`."""
+    with engine.begin() as connection:
+        row = connection.execute(
+            text("SELECT commit_sha, tree_sha, encoding, body FROM graph_snapshots WHERE graph_id = :graph_id"),
+            {"graph_id": graph_id},
+        ).fetchone()
+    if not row or row[1] != tree_sha or row[2] != SNAPSHOT_ENCODING:
+        return None
+    return row[0], bytes(row[3])
@@ -0,0 +1,205 @@
+import uuid
+
+from sqlalchemy import text
+
+from app.db.engine import engine
+
+
+# queued -> running -> succeeded | failed | cancelled, with cancelling in between
+# when a cancel is requested while the job runs.
+ACTIVE_STATUSES = ("queued", "running", "cancelling")
+JOB_COLUMNS = """
+    id, kind, repo_key, status, files_total, files_done, chunks_embedded,
+    errors, message, submitted_by, created_at, updated_at, finished_at
+"""
+
+
+def fail_stale_jobs(stale_seconds: int, kind: str | None = None, repo_key: str | None = None) -> int:
+    """
+    Mark active jobs without a recent heartbeat as failed.
+
+    Running jobs, and queued jobs waiting for a worker, have `updated_at`
+    refreshed periodically by the process that owns them, so a stale active
+    row belongs to a process that died or restarted.
+    """
+    filters = ""
+    params: dict = {"stale_seconds": stale_seconds}
+    if kind is not None and repo_key is not None:
+        filters = "AND kind = :kind AND repo_key = :repo_key"
+        params.update({"kind": kind, "repo_key": repo_key})
+
+    with engine.begin() as connection:
+        result = connection.execute(
+            text(
+                f"""
+                UPDATE background_jobs
+                SET status = 'failed',
+                    message = 'Job stopped reporting progress.',
+                    updated_at = NOW(),
+                    finished_at = NOW()
+                WHERE status IN ('queued', 'running', 'cancelling')
+                  AND updated_at < NOW() - (:stale_seconds * INTERVAL '1 second')
+                  {filters}
+                """
+            ),
+            params,
+        )
+    return result.rowcount or 0
+
+
+def touch_queued_jobs(job_ids: list[str]) -> None:
+    """Heartbeat queued jobs that are still waiting for a worker."""
+    if not job_ids:
+        return
+    with engine.begin() as connection:
+        connection.execute(
+            text(
+                """
+                UPDATE background_jobs
+                SET updated_at = NOW()
+                WHERE id = ANY(:ids) AND status = 'queued'
+                """
+            ),
+            {"ids": job_ids},
+        )
+
+
+def create_job(kind: str, repo_key: str, submitted_by: str | None = None) -> tuple[dict, bool]:
+    """
+    Create a queued job, or return the job already active for `kind` and `repo_key`.
+
+    The second element is True when a new job was created.
+    """
+    with engine.begin() as connection:
+        row = connection.execute(
+            text(
+                f"""
+                INSERT INTO background_jobs (id, kind, repo_key, status, submitted_by)
+                VALUES (:id, :kind, :repo_key, 'queued', :submitted_by)
+                ON CONFLICT (kind, repo_key) WHERE status IN ('queued', 'running', 'cancelling')
+                DO NOTHING
+                RETURNING {JOB_COLUMNS}
+                """
+            ),
+            {"id": uuid.uuid4().hex, "kind": kind, "repo_key": repo_key, "submitted_by": submitted_by},
+        ).mappings().fetchone()
+        if row is not None:
+            return dict(row), True
+
+        row = connection.execute(
+            text(
+                f"""
+                SELECT {JOB_COLUMNS}
+                FROM background_jobs
+                WHERE kind = :kind AND repo_key = :repo_key
+                  AND status IN ('queued', 'running', 'cancelling')
+                LIMIT 1
+                """
+            ),
+            {"kind": kind, "repo_key": repo_key},
+        ).mappings().fetchone()
+
+    if row is None:
+        # The active job finished between the two statements; try again.
+        return create_job(kind, repo_key, submitted_by)
+    return dict(row), False
+
+
+def get_job(job_id: str) -> dict | None:
+    with engine.begin() as connection:
+        row = connection.execute(
+            text(f"SELECT {JOB_COLUMNS} FROM background_jobs WHERE id = :id"),
+            {"id": job_id},
+        ).mappings().fetchone()
+    return dict(row) if row else None
+
+
+def start_job(job_id: str) -> bool:
+    """Move a queued job to running. Returns False if it was cancelled meanwhile."""
+    with engine.begin() as connection:
+        row = connection.execute(
+            text(
+                """
+                UPDATE background_jobs
+                SET status = 'running', updated_at = NOW()
+                WHERE id = :id AND status = 'queued'
+                RETURNING id
+                """
+            ),
+            {"id": job_id},
+        ).fetchone()
+    return row is not None
+
+
+def record_job_progress(
+    job_id: str,
+    files_total: int,
+    files_done: int,
+    chunks_embedded: int,
+    errors: int,
+) -> str | None:
+    """Persist progress counters as a heartbeat and return the job's current status."""
+    with engine.begin() as connection:
+        row = connection.execute(
+            text(
+                """
+                UPDATE background_jobs
+                SET files_total = :files_total,
+                    files_done = :files_done,
+                    chunks_embedded = :chunks_embedded,
+                    errors = :errors,
+                    updated_at = NOW()
+                WHERE id = :id
+                RETURNING status
+                """
+            ),
+            {
+                "id": job_id,
+                "files_total": files_total,
+                "files_done": files_done,
+                "chunks_embedded": chunks_embedded,
+                "errors": errors,
+            },
+        ).fetchone()
+    return row[0] if row else None
+
+
+def finish_job(job_id: str, status: str, message: str | None = None) -> None:
+    with engine.begin() as connection:
+        connection.execute(
+            text(
+                """
+                UPDATE background_jobs
+                SET status = :status,
+                    message = :message,
+                    updated_at = NOW(),
+                    finished_at = NOW()
+                WHERE id = :id
+                """
+            ),
+            {"id": job_id, "status": status, "message": message},
+        )
+
+
+def request_job_cancel(job_id: str) -> dict | None:
+    """
+    Cancel a job. Queued jobs are cancelled immediately; running jobs move to
+    `cancelling` and stop at their next progress heartbeat.
+    """
+    with engine.begin() as connection:
+        row = connection.execute(
+            text(
+                f"""
+                UPDATE background_jobs
+                SET status = CASE WHEN status = 'queued' THEN 'cancelled' ELSE 'cancelling' END,
+                    finished_at = CASE WHEN status = 'queued' THEN NOW() ELSE finished_at END,
+                    updated_at = NOW()
+                WHERE id = :id AND status IN ('queued', 'running')
+                RETURNING {JOB_COLUMNS}
+                """
+            ),
+            {"id": job_id},
+        ).mappings().fetchone()
+    if row is None:
+        return get_job(job_id)
+    return dict(row)
@@ -0,0 +1,115 @@
+"""
+Versioned schema migrations.
+
+Every `app/db/migrations/NNN_name.sql` file is applied once, in order, and
+recorded in `schema_migrations`. The runner holds a Postgres advisory lock, so
+several workers starting together apply each migration exactly once; the
+others wait and then find nothing left to do. Migrations run at startup
+(`DB_MIGRATE_ON_STARTUP`) or by hand:
+
+    python -m app.db.migrate
+    python -m app.db.migrate --status
+
+Migration files must be safe to re-run: databases set up with `psql -f`
+before the runner existed have no `schema_migrations` rows, so their first
+run replays every file.
+"""
+import argparse
+import logging
+from pathlib import Path
+
+from sqlalchemy import text
+
+from app.db.engine import engine
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_DIR = Path(__file__).parent / "migrations"
+# Arbitrary constant shared by every process running migrations against this database.
+MIGRATION_LOCK_ID = 727_101_022
+
+
+def _migration_files() -> list[Path]:
+    return sorted(path for path in MIGRATIONS_DIR.glob("*.sql") if path.stem.split("_", 1)[0].isdigit())
+
+
+def _version(path: Path) -> str:
+    return path.stem.split("_", 1)[0]
+
+
+def _applied_versions(connection) -> set[str]:
+    return {row[0] for row in connection.execute(text("SELECT version FROM schema_migrations"))}
+
+
+def _ensure_migrations_table(connection) -> None:
+    connection.execute(
+        text(
+            """
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version TEXT PRIMARY KEY,
+                name TEXT NOT NULL,
+                applied_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+            )
+            """
+        )
+    )
+
+
+def pending_migrations() -> list[str]:
+    """Return the file names of migrations not yet applied."""
+    with engine.begin() as connection:
+        _ensure_migrations_table(connection)
+        applied = _applied_versions(connection)
+    return [path.name for path in _migration_files() if _version(path) not in applied]
+
+
+def run_migrations() -> list[str]:
+    """Apply pending migrations under the advisory lock; returns the applied file names."""
+    applied_now: list[str] = []
+    with engine.connect() as connection:
+        connection.execute(text("SELECT pg_advisory_lock(:lock_id)"), {"lock_id": MIGRATION_LOCK_ID})
+        connection.commit()
+        try:
+            with connection.begin():
+                _ensure_migrations_table(connection)
+                applied = _applied_versions(connection)
+
+            for path in _migration_files():
+                version = _version(path)
+                if version in applied:
+                    continue
+                # One transaction per file: a failing migration leaves earlier ones recorded.
+                with connection.begin():
+                    connection.exec_driver_sql(path.read_text(), execution_options={"no_parameters": True})
+                    connection.execute(
+                        text("INSERT INTO schema_migrations (version, name) VALUES (:version, :name)"),
+                        {"version": version, "name": path.name},
+                    )
+                logger.info("Applied migration %s", path.name)
+                applied_now.append(path.name)
+        finally:
+            connection.execute(text("SELECT pg_advisory_unlock(:lock_id)"), {"lock_id": MIGRATION_LOCK_ID})
+            connection.commit()
+    return applied_now
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Apply database migrations.")
+    parser.add_argument("--status", action="store_true", help="List pending migrations without applying them.")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    if args.status:
+        pending = pending_migrations()
+        for name in pending:
+            logger.info("pending: %s", name)
+        if not pending:
+            logger.info("Database is up to date.")
+        return
+
+    if not run_migrations():
+        logger.info("Database is up to date.")
+
+
+if __name__ == "__main__":
+    main()
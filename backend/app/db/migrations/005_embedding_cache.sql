@@ -0,0 +1,10 @@
+CREATE TABLE IF NOT EXISTS embedding_cache (
+    model TEXT NOT NULL,
+    content_hash TEXT NOT NULL,
+    embedding REAL[] NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    last_used_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (model, content_hash)
+);
+
+CREATE INDEX IF NOT EXISTS embedding_cache_last_used_at_idx ON embedding_cache (last_used_at);
@@ -0,0 +1 @@
+ALTER TABLE nodes ADD COLUMN IF NOT EXISTS sha TEXT;
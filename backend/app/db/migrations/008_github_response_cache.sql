@@ -0,0 +1,6 @@
+CREATE TABLE IF NOT EXISTS github_response_cache (
+    cache_key TEXT PRIMARY KEY,
+    etag TEXT NOT NULL,
+    body BYTEA NOT NULL,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
@@ -0,0 +1,29 @@
+CREATE TABLE IF NOT EXISTS repo_graphs (
+    id BIGSERIAL PRIMARY KEY,
+    repo_id BIGINT NOT NULL REFERENCES repos(id) ON DELETE CASCADE,
+    ref TEXT NOT NULL,
+    commit_sha TEXT NOT NULL,
+    tree_sha TEXT NOT NULL,
+    built_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    checked_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    UNIQUE (repo_id, ref)
+);
+
+ALTER TABLE nodes ADD COLUMN IF NOT EXISTS graph_id BIGINT REFERENCES repo_graphs(id) ON DELETE CASCADE;
+ALTER TABLE edges ADD COLUMN IF NOT EXISTS graph_id BIGINT REFERENCES repo_graphs(id) ON DELETE CASCADE;
+
+-- Graphs stored before refs were tracked are a cache; drop them and re-key by graph.
+DELETE FROM edges WHERE graph_id IS NULL;
+DELETE FROM nodes WHERE graph_id IS NULL;
+ALTER TABLE edges DROP CONSTRAINT IF EXISTS edges_from_node_fkey;
+ALTER TABLE edges DROP CONSTRAINT IF EXISTS edges_to_node_fkey;
+ALTER TABLE edges DROP CONSTRAINT IF EXISTS edges_pkey;
+ALTER TABLE nodes DROP CONSTRAINT IF EXISTS nodes_pkey;
+ALTER TABLE nodes ALTER COLUMN graph_id SET NOT NULL;
+ALTER TABLE edges ALTER COLUMN graph_id SET NOT NULL;
+ALTER TABLE nodes ADD PRIMARY KEY (graph_id, id);
+ALTER TABLE edges ADD PRIMARY KEY (graph_id, to_node, from_node);
+ALTER TABLE edges ADD CONSTRAINT edges_from_node_fkey
+    FOREIGN KEY (graph_id, from_node) REFERENCES nodes(graph_id, id) ON DELETE CASCADE;
+ALTER TABLE edges ADD CONSTRAINT edges_to_node_fkey
+    FOREIGN KEY (graph_id, to_node) REFERENCES nodes(graph_id, id) ON DELETE CASCADE;
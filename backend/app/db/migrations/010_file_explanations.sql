@@ -0,0 +1,9 @@
+CREATE TABLE IF NOT EXISTS file_explanations (
+    repo_key TEXT NOT NULL,
+    path TEXT NOT NULL,
+    blob_sha TEXT NOT NULL,
+    summary TEXT NOT NULL,
+    model TEXT NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (repo_key, path, blob_sha)
+);
@@ -0,0 +1,22 @@
+-- Early deployments created nodes.id, edges.from_node and edges.to_node as UUID.
+-- Node ids are paths now; convert in place and restore the graph-scoped keys.
+DO $$
+BEGIN
+    IF EXISTS (
+        SELECT 1
+        FROM information_schema.columns
+        WHERE table_name IN ('nodes', 'edges')
+          AND column_name IN ('id', 'from_node', 'to_node')
+          AND data_type = 'uuid'
+    ) THEN
+        ALTER TABLE edges DROP CONSTRAINT IF EXISTS edges_from_node_fkey;
+        ALTER TABLE edges DROP CONSTRAINT IF EXISTS edges_to_node_fkey;
+        ALTER TABLE nodes ALTER COLUMN id TYPE TEXT USING id::text;
+        ALTER TABLE edges ALTER COLUMN from_node TYPE TEXT USING from_node::text;
+        ALTER TABLE edges ALTER COLUMN to_node TYPE TEXT USING to_node::text;
+        ALTER TABLE edges ADD CONSTRAINT edges_from_node_fkey
+            FOREIGN KEY (graph_id, from_node) REFERENCES nodes(graph_id, id) ON DELETE CASCADE;
+        ALTER TABLE edges ADD CONSTRAINT edges_to_node_fkey
+            FOREIGN KEY (graph_id, to_node) REFERENCES nodes(graph_id, id) ON DELETE CASCADE;
+    END IF;
+END $$;
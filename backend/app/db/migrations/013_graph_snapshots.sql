@@ -0,0 +1,7 @@
+CREATE TABLE IF NOT EXISTS graph_snapshots (
+    graph_id BIGINT PRIMARY KEY REFERENCES repo_graphs(id) ON DELETE CASCADE,
+    commit_sha TEXT NOT NULL,
+    encoding TEXT NOT NULL,
+    body BYTEA NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
@@ -0,0 +1,9 @@
+-- Nodes and edges are keyed by graph (migration 009), and a graph belongs to one
+-- repo and ref, so identical paths in different repos no longer collide. These
+-- indexes cover the lookups the keys do not:
+--   * ON DELETE CASCADE from repos scans nodes/edges by repo_id;
+--   * deleting a node checks edges by (graph_id, from_node), while the primary
+--     key (graph_id, to_node, from_node) only serves the to_node side.
+CREATE INDEX IF NOT EXISTS nodes_repo_id_idx ON nodes (repo_id);
+CREATE INDEX IF NOT EXISTS edges_repo_id_idx ON edges (repo_id);
+CREATE INDEX IF NOT EXISTS edges_graph_from_node_idx ON edges (graph_id, from_node);
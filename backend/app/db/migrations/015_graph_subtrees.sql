@@ -0,0 +1,29 @@
+-- Parent, depth and child count per node, for paginated subtree reads.
+ALTER TABLE nodes ADD COLUMN IF NOT EXISTS parent_path TEXT;
+ALTER TABLE nodes ADD COLUMN IF NOT EXISTS depth INTEGER;
+ALTER TABLE nodes ADD COLUMN IF NOT EXISTS child_count INTEGER NOT NULL DEFAULT 0;
+
+UPDATE nodes
+SET
+    parent_path = CASE
+        WHEN path = '' THEN NULL
+        WHEN position('/' IN path) = 0 THEN ''
+        ELSE regexp_replace(path, '/[^/]*$', '')
+    END,
+    depth = CASE WHEN path = '' THEN 0 ELSE array_length(string_to_array(path, '/'), 1) END
+WHERE depth IS NULL;
+
+UPDATE nodes AS parent
+SET child_count = counts.children
+FROM (
+    SELECT graph_id, parent_path, COUNT(*) AS children
+    FROM nodes
+    WHERE parent_path IS NOT NULL
+    GROUP BY graph_id, parent_path
+) AS counts
+WHERE parent.graph_id = counts.graph_id
+  AND parent.path = counts.parent_path;
+
+-- Byte-order collation so range scans and ORDER BY path share one index.
+CREATE INDEX IF NOT EXISTS nodes_graph_parent_path_idx ON nodes (graph_id, parent_path, path COLLATE "C");
+CREATE INDEX IF NOT EXISTS nodes_graph_path_idx ON nodes (graph_id, path COLLATE "C");
@@ -0,0 +1,2 @@
+-- Hash of the GitHub token that submitted a job; job status and cancel are scoped to it.
+ALTER TABLE background_jobs ADD COLUMN IF NOT EXISTS submitted_by TEXT;
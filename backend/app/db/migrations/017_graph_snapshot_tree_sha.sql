@@ -0,0 +1,2 @@
+-- The tree a snapshot was encoded from; snapshots of another tree than the stored graph's are ignored.
+ALTER TABLE graph_snapshots ADD COLUMN IF NOT EXISTS tree_sha TEXT;
@@ -0,0 +1,8 @@
+-- Files that were ingested but produced no chunks (empty or binary), by the blob sha they were read at.
+-- Incremental runs treat them as unchanged, as they do files with stored chunks.
+CREATE TABLE IF NOT EXISTS collection_empty_blobs (
+    collection_name TEXT NOT NULL,
+    path TEXT NOT NULL,
+    blob_sha TEXT NOT NULL,
+    PRIMARY KEY (collection_name, path)
+);
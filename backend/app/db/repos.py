@@ -1,145 +1,72 @@
-import os
+from collections import Counter
 
-from sqlalchemy import create_engine, text
-from sqlalchemy.engine import Engine
+from sqlalchemy import text
 
-from app.core.config import settings
+from app.db.engine import engine
+from app.db.graph_snapshots import delete_graph_snapshot, save_graph_snapshot
 from app.schemas.node import Edge, GraphPayload, Node
 
-DATABASE_URL = getattr(settings, "DATABASE_URL", None) or os.getenv("DATABASE_URL")
-if not DATABASE_URL:
-    raise RuntimeError("DATABASE_URL is not set")
+GRAPH_INSERT_BATCH_SIZE = 5000
 
-engine: Engine = create_engine(DATABASE_URL, pool_pre_ping=True)
 
+def _batches(items: list, size: int):
+    for start in range(0, len(items), size):
+        yield items[start : start + size]
 
-def _column_type(table_name: str, column_name: str) -> str | None:
-    with engine.begin() as connection:
-        result = connection.execute(
-            text(
-                """
-                SELECT data_type
-                FROM information_schema.columns
-                WHERE table_name = :table_name AND column_name = :column_name
-                """
-            ),
-            {"table_name": table_name, "column_name": column_name},
-        )
-        return result.scalar_one_or_none()
 
+def _parent_path(path: str) -> str | None:
+    if path == "":
+        return None
+    return path.rsplit("/", 1)[0] if "/" in path else ""
 
-def ensure_repo() -> None:
-    with engine.begin() as connection:
-        connection.execute(
-            text(
-                """
-                CREATE TABLE IF NOT EXISTS repos (
-                    id BIGINT PRIMARY KEY,
-                    name TEXT NOT NULL,
-                    owner TEXT NOT NULL,
-                    created_at TIMESTAMPTZ DEFAULT NOW(),
-                    last_updated TIMESTAMPTZ DEFAULT NOW()
-                );
-                """
-            )
-        )
+
+def _depth(path: str) -> int:
+    return 0 if path == "" else path.count("/") + 1
 
 
-def ensure_nodes() -> None:
+def get_graph_ref(repo_id: int, ref: str) -> dict | None:
+    """Return the stored graph header (id, commit and tree sha) for one ref."""
     with engine.begin() as connection:
-        connection.execute(
+        row = connection.execute(
             text(
                 """
-                CREATE TABLE IF NOT EXISTS nodes (
-                    id TEXT PRIMARY KEY,
-                    name TEXT NOT NULL,
-                    path TEXT NOT NULL,
-                    file_type TEXT NOT NULL,
-                    repo_id BIGINT NOT NULL REFERENCES repos(id) ON DELETE CASCADE,
-                    updated_at TIMESTAMPTZ DEFAULT NOW()
-                );
+                SELECT id, repo_id, ref, commit_sha, tree_sha, built_at
+                FROM repo_graphs
+                WHERE repo_id = :repo_id AND ref = :ref
                 """
-            )
-        )
-
-    if _column_type("nodes", "id") == "uuid":
-        with engine.begin() as connection:
-            connection.execute(
-                text(
-                    """
-                    ALTER TABLE edges DROP CONSTRAINT IF EXISTS edges_from_node_fkey;
-                    ALTER TABLE edges DROP CONSTRAINT IF EXISTS edges_to_node_fkey;
-                    ALTER TABLE nodes ALTER COLUMN id TYPE TEXT USING id::text;
-                    """
-                )
-            )
+            ),
+            {"repo_id": repo_id, "ref": ref},
+        ).mappings().fetchone()
+    return dict(row) if row else None
 
 
-def ensure_edges() -> None:
+def touch_graph_ref(graph_id: int, commit_sha: str) -> None:
+    """Record that a stored graph is still current for a newer commit with the same tree."""
     with engine.begin() as connection:
         connection.execute(
             text(
                 """
-                CREATE TABLE IF NOT EXISTS edges (
-                    from_node TEXT NOT NULL,
-                    to_node TEXT NOT NULL,
-                    relationship TEXT,
-                    repo_id BIGINT NOT NULL REFERENCES repos(id) ON DELETE CASCADE,
-                    PRIMARY KEY(to_node, from_node),
-                    FOREIGN KEY (from_node) REFERENCES nodes(id) ON DELETE CASCADE,
-                    FOREIGN KEY (to_node) REFERENCES nodes(id) ON DELETE CASCADE
-                );
+                UPDATE repo_graphs
+                SET commit_sha = :commit_sha, checked_at = NOW()
+                WHERE id = :graph_id
                 """
-            )
+            ),
+            {"graph_id": graph_id, "commit_sha": commit_sha},
         )
 
-    if _column_type("edges", "from_node") == "uuid" or _column_type("edges", "to_node") == "uuid":
-        with engine.begin() as connection:
-            connection.execute(
-                text(
-                    """
-                    ALTER TABLE edges DROP CONSTRAINT IF EXISTS edges_pkey;
-                    ALTER TABLE edges ALTER COLUMN from_node TYPE TEXT USING from_node::text;
-                    ALTER TABLE edges ALTER COLUMN to_node TYPE TEXT USING to_node::text;
-                    ALTER TABLE edges ADD PRIMARY KEY(to_node, from_node);
-                    ALTER TABLE edges DROP CONSTRAINT IF EXISTS edges_from_node_fkey;
-                    ALTER TABLE edges DROP CONSTRAINT IF EXISTS edges_to_node_fkey;
-                    ALTER TABLE edges ADD CONSTRAINT edges_from_node_fkey
-                        FOREIGN KEY (from_node) REFERENCES nodes(id) ON DELETE CASCADE;
-                    ALTER TABLE edges ADD CONSTRAINT edges_to_node_fkey
-                        FOREIGN KEY (to_node) REFERENCES nodes(id) ON DELETE CASCADE;
-                    """
-                )
-            )
-
-
-def ensure_graph_tables() -> None:
-    ensure_repo()
-    ensure_nodes()
-    ensure_edges()
-
-
-def get_repo_graph(repo_id: int) -> GraphPayload | None:
-    ensure_graph_tables()
 
+def get_repo_graph(graph_id: int) -> GraphPayload | None:
     with engine.begin() as connection:
-        repo_exists = connection.execute(
-            text("SELECT 1 FROM repos WHERE id = :repo_id"),
-            {"repo_id": repo_id},
-        ).scalar_one_or_none()
-        if repo_exists is None:
-            return None
-
         node_rows = connection.execute(
             text(
                 """
-                SELECT id, name, path, file_type
+                SELECT id, name, path, file_type, sha
                 FROM nodes
-                WHERE repo_id = :repo_id
+                WHERE graph_id = :graph_id
                 ORDER BY path
                 """
             ),
-            {"repo_id": repo_id},
+            {"graph_id": graph_id},
         ).mappings().all()
 
         if not node_rows:
@@ -150,11 +77,11 @@ def get_repo_graph(repo_id: int) -> GraphPayload | None:
                 """
                 SELECT from_node, to_node, relationship
                 FROM edges
-                WHERE repo_id = :repo_id
+                WHERE graph_id = :graph_id
                 ORDER BY from_node, to_node
                 """
             ),
-            {"repo_id": repo_id},
+            {"graph_id": graph_id},
         ).mappings().all()
 
     nodes = [
@@ -163,6 +90,7 @@ def get_repo_graph(repo_id: int) -> GraphPayload | None:
             name=row["name"],
             path=row["path"],
             file_type=row["file_type"],
+            sha=row["sha"],
         )
         for row in node_rows
     ]
@@ -177,9 +105,22 @@ def get_repo_graph(repo_id: int) -> GraphPayload | None:
     return GraphPayload(nodes=nodes, edges=edges)
 
 
-def save_repo_graph(repo_id: int, owner: str, repo_name: str, graph: GraphPayload) -> None:
-    ensure_graph_tables()
+def save_repo_graph(
+    repo_id: int,
+    owner: str,
+    repo_name: str,
+    ref: str,
+    commit_sha: str,
+    tree_sha: str,
+    graph: GraphPayload,
+    snapshot: bytes | None = None,
+) -> int:
+    """
+    Store the graph built for `ref` at `commit_sha`, replacing that ref's previous graph.
 
+    `snapshot` is the graph's pre-serialized body (see `encode_graph`); it is
+    written in the same transaction so it never describes an older graph.
+    """
     with engine.begin() as connection:
         connection.execute(
             text(
@@ -195,47 +136,230 @@ def save_repo_graph(repo_id: int, owner: str, repo_name: str, graph: GraphPayloa
             {"id": repo_id, "name": repo_name, "owner": owner},
         )
 
+        graph_id = connection.execute(
+            text(
+                """
+                INSERT INTO repo_graphs (repo_id, ref, commit_sha, tree_sha, built_at, checked_at)
+                VALUES (:repo_id, :ref, :commit_sha, :tree_sha, NOW(), NOW())
+                ON CONFLICT (repo_id, ref) DO UPDATE SET
+                    commit_sha = EXCLUDED.commit_sha,
+                    tree_sha = EXCLUDED.tree_sha,
+                    built_at = NOW(),
+                    checked_at = NOW()
+                RETURNING id
+                """
+            ),
+            {"repo_id": repo_id, "ref": ref, "commit_sha": commit_sha, "tree_sha": tree_sha},
+        ).scalar_one()
+
         connection.execute(
-            text("DELETE FROM edges WHERE repo_id = :repo_id"),
-            {"repo_id": repo_id},
+            text("DELETE FROM edges WHERE graph_id = :graph_id"),
+            {"graph_id": graph_id},
         )
         connection.execute(
-            text("DELETE FROM nodes WHERE repo_id = :repo_id"),
-            {"repo_id": repo_id},
+            text("DELETE FROM nodes WHERE graph_id = :graph_id"),
+            {"graph_id": graph_id},
         )
 
-        for node in graph.nodes:
+        # Parent, depth and child count back the paginated subtree reads (see `get_subtree`).
+        child_counts = Counter(_parent_path(node.path) for node in graph.nodes)
+
+        # One set-based INSERT per batch instead of one statement per row.
+        for batch in _batches(graph.nodes, GRAPH_INSERT_BATCH_SIZE):
             connection.execute(
                 text(
                     """
-                    INSERT INTO nodes (id, name, path, file_type, repo_id, updated_at)
-                    VALUES (:id, :name, :path, :file_type, :repo_id, NOW())
+                    INSERT INTO nodes (
+                        id, name, path, file_type, repo_id, graph_id, sha,
+                        parent_path, depth, child_count, updated_at
+                    )
+                    SELECT
+                        id, name, path, file_type, :repo_id, :graph_id, sha,
+                        parent_path, depth, child_count, NOW()
+                    FROM unnest(
+                        CAST(:ids AS TEXT[]),
+                        CAST(:names AS TEXT[]),
+                        CAST(:paths AS TEXT[]),
+                        CAST(:file_types AS TEXT[]),
+                        CAST(:shas AS TEXT[]),
+                        CAST(:parent_paths AS TEXT[]),
+                        CAST(:depths AS INTEGER[]),
+                        CAST(:child_counts AS INTEGER[])
+                    ) AS batch(id, name, path, file_type, sha, parent_path, depth, child_count)
                     """
                 ),
                 {
-                    "id": node.id,
-                    "name": node.name,
-                    "path": node.path,
-                    "file_type": node.file_type,
+                    "ids": [node.id for node in batch],
+                    "names": [node.name for node in batch],
+                    "paths": [node.path for node in batch],
+                    "file_types": [node.file_type for node in batch],
+                    "shas": [node.sha for node in batch],
+                    "parent_paths": [_parent_path(node.path) for node in batch],
+                    "depths": [_depth(node.path) for node in batch],
+                    "child_counts": [child_counts.get(node.path, 0) for node in batch],
                     "repo_id": repo_id,
+                    "graph_id": graph_id,
                 },
             )
 
-        for edge in graph.edges:
+        # ON CONFLICT cannot touch the same row twice within one statement.
+        unique_edges = list({(edge.target, edge.source): edge for edge in graph.edges}.values())
+        for batch in _batches(unique_edges, GRAPH_INSERT_BATCH_SIZE):
             connection.execute(
                 text(
                     """
-                    INSERT INTO edges (from_node, to_node, relationship, repo_id)
-                    VALUES (:from_node, :to_node, :relationship, :repo_id)
-                    ON CONFLICT (to_node, from_node) DO UPDATE SET
-                        relationship = EXCLUDED.relationship,
-                        repo_id = EXCLUDED.repo_id
+                    INSERT INTO edges (from_node, to_node, relationship, repo_id, graph_id)
+                    SELECT from_node, to_node, relationship, :repo_id, :graph_id
+                    FROM unnest(
+                        CAST(:from_nodes AS TEXT[]),
+                        CAST(:to_nodes AS TEXT[]),
+                        CAST(:relationships AS TEXT[])
+                    ) AS batch(from_node, to_node, relationship)
+                    ON CONFLICT (graph_id, to_node, from_node) DO UPDATE SET
+                        relationship = EXCLUDED.relationship
                     """
                 ),
                 {
-                    "from_node": edge.source,
-                    "to_node": edge.target,
-                    "relationship": edge.type,
+                    "from_nodes": [edge.source for edge in batch],
+                    "to_nodes": [edge.target for edge in batch],
+                    "relationships": [edge.type for edge in batch],
                     "repo_id": repo_id,
+                    "graph_id": graph_id,
                 },
             )
+
+        if snapshot is not None:
+            save_graph_snapshot(graph_id, commit_sha, tree_sha, snapshot, connection=connection)
+        else:
+            delete_graph_snapshot(graph_id, connection=connection)
+
+    return graph_id
+
+
+SUBTREE_COLUMNS = "id, name, path, file_type, sha, parent_path, child_count"
+
+
+def _subtree_node(row) -> dict:
+    return {
+        "id": row["id"],
+        "name": row["name"],
+        "path": row["path"],
+        "file_type": row["file_type"],
+        "sha": row["sha"],
+        "child_count": row["child_count"],
+    }
+
+
+def get_subtree(graph_id: int, path: str, depth: int, limit: int, after: str | None = None) -> dict | None:
+    """
+    Return one page of the nodes below `path`, down to `depth` levels.
+
+    Pages are ordered by path (byte order) and continue after the path
+    `after`. One level is read from the (graph_id, parent_path, path) index,
+    so a page costs the same in any repository size; deeper reads walk the
+    (graph_id, path) prefix range of the subtree. Returns None when `path`
+    is not in the graph.
+    """
+    with engine.begin() as connection:
+        node = connection.execute(
+            text(f"SELECT {SUBTREE_COLUMNS} FROM nodes WHERE graph_id = :graph_id AND path = :path"),
+            {"graph_id": graph_id, "path": path},
+        ).mappings().fetchone()
+        if node is None:
+            return None
+
+        if depth == 1:
+            rows = connection.execute(
+                text(
+                    f"""
+                    SELECT {SUBTREE_COLUMNS}
+                    FROM nodes
+                    WHERE graph_id = :graph_id
+                      AND parent_path = :path
+                      AND path COLLATE "C" > :after
+                    ORDER BY path COLLATE "C"
+                    LIMIT :limit
+                    """
+                ),
+                {"graph_id": graph_id, "path": path, "after": after or "", "limit": limit + 1},
+            ).mappings().all()
+        else:
+            # Descendants of `path` are exactly the paths in ['path/', 'path0'); '0' follows '/'.
+            lower = f"{path}/" if path else ""
+            if after is not None and after > lower:
+                lower = after
+            upper_clause = 'AND path COLLATE "C" < :upper' if path else ""
+            rows = connection.execute(
+                text(
+                    f"""
+                    SELECT {SUBTREE_COLUMNS}
+                    FROM nodes
+                    WHERE graph_id = :graph_id
+                      AND path COLLATE "C" > :lower
+                      {upper_clause}
+                      AND depth <= :max_depth
+                    ORDER BY path COLLATE "C"
+                    LIMIT :limit
+                    """
+                ),
+                {
+                    "graph_id": graph_id,
+                    "lower": lower,
+                    "upper": f"{path}0",
+                    "max_depth": _depth(path) + depth,
+                    "limit": limit + 1,
+                },
+            ).mappings().all()
+
+    return _subtree_page(node, rows, limit)
+
+
+def graph_subtree(graph: GraphPayload, path: str, depth: int, limit: int, after: str | None = None) -> dict | None:
+    """`get_subtree` over a graph that is not stored yet; returns the same pages."""
+    child_counts = Counter(_parent_path(node.path) for node in graph.nodes)
+
+    def row(node: Node) -> dict:
+        return {
+            "id": node.id,
+            "name": node.name,
+            "path": node.path,
+            "file_type": node.file_type,
+            "sha": node.sha,
+            "parent_path": _parent_path(node.path),
+            "child_count": child_counts.get(node.path, 0),
+        }
+
+    node = next((node for node in graph.nodes if node.path == path), None)
+    if node is None:
+        return None
+
+    # Python compares str by code point, which matches the byte order of the "C" collation for UTF-8.
+    prefix = f"{path}/" if path else ""
+    max_depth = _depth(path) + depth
+    rows = sorted(
+        (
+            row(candidate)
+            for candidate in graph.nodes
+            if candidate.path != path
+            and candidate.path.startswith(prefix)
+            and _depth(candidate.path) <= max_depth
+            and (after is None or candidate.path > after)
+        ),
+        key=lambda item: item["path"],
+    )
+    return _subtree_page(row(node), rows[: limit + 1], limit)
+
+
+def _subtree_page(node, rows, limit: int) -> dict:
+    """Shape up to `limit + 1` rows into one page; the extra row only signals that more follow."""
+    next_after = rows[limit - 1]["path"] if len(rows) > limit else None
+    rows = rows[:limit]
+    return {
+        "node": _subtree_node(node),
+        "nodes": [_subtree_node(row) for row in rows],
+        "edges": [
+            {"source": row["parent_path"] or "root", "target": row["id"], "type": "contains", "label": None}
+            for row in rows
+        ],
+        "next_after": next_after,
+    }
@@ -1,17 +1,77 @@
-import os
 import secrets
 import hashlib
-from sqlalchemy import create_engine, text
-from sqlalchemy.engine import Engine
+import threading
+import time
+from collections import OrderedDict
+from sqlalchemy import text
+from app.core.config import settings
 from app.services.fernet import encrypt_token
 from app.services.fernet import decrypt_token
-from app.core.config import settings
+from app.db.engine import engine
+
+
+class SessionTokenCache:
+    """
+    Thread-safe LRU of session hash -> (username, decrypted token).
+
+    An entry lives until the session's `expires_at` or `ttl_seconds` after it
+    was loaded, whichever comes first. Writes in this process invalidate the
+    affected entries; other workers pick up token changes and logouts once
+    `ttl_seconds` has passed, which is why the default TTL is short. A
+    logged-out session stays usable on those workers until then.
+    """
+
+    def __init__(self, ttl_seconds: int, max_entries: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, tuple[str, str, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session_hash: str) -> str | None:
+        with self._lock:
+            entry = self._entries.get(session_hash)
+            if entry is None:
+                return None
+            if entry[2] <= time.time():
+                del self._entries[session_hash]
+                return None
+            self._entries.move_to_end(session_hash)
+            return entry[1]
+
+    def put(self, session_hash: str, username: str, token: str, expires_at: float) -> None:
+        if self.ttl_seconds <= 0 or self.max_entries <= 0:
+            return
+        valid_until = min(expires_at, time.time() + self.ttl_seconds)
+        with self._lock:
+            self._entries[session_hash] = (username, token, valid_until)
+            self._entries.move_to_end(session_hash)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
 
-DATABASE_URL = getattr(settings, "DATABASE_URL", None) or os.getenv("DATABASE_URL")
-if not DATABASE_URL:
-    raise RuntimeError("DATABASE_URL is not set")
+    def invalidate(self, session_hash: str) -> None:
+        with self._lock:
+            self._entries.pop(session_hash, None)
+
+    def invalidate_user(self, username: str) -> None:
+        with self._lock:
+            stale = [key for key, entry in self._entries.items() if entry[0] == username]
+            for key in stale:
+                del self._entries[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+session_cache = SessionTokenCache(
+    ttl_seconds=settings.SESSION_CACHE_TTL_SECONDS,
+    max_entries=settings.SESSION_CACHE_MAX_ENTRIES,
+)
+
+
+def _session_hash(session_id: str) -> str:
+    return hashlib.sha256(session_id.encode()).hexdigest()
 
-engine: Engine = create_engine(DATABASE_URL, pool_pre_ping=True)
 
 def create_user_with_token(username: str, token: str):
     token = encrypt_token(token)
@@ -39,7 +99,8 @@ def create_user_with_token(username: str, token: str):
             """),
             {"username": username, "token": token}
         )
-  
+    session_cache.invalidate_user(username)
+
 
 
 def add_user(username: str) -> None:
@@ -82,7 +143,9 @@ def add_access_token(username: str, access_token: str) -> None:
             ),
             {"username": username, "token": token},
         )
-    
+    session_cache.invalidate_user(username)
+
+
 def delete_user(username: str) -> None:
     """Delete a user"""
     with engine.begin() as connection:
@@ -95,6 +158,8 @@ def delete_user(username: str) -> None:
             ),
             {"username": username}
         )
+    session_cache.invalidate_user(username)
+
 
 def delete_token(encrypted_token: str) -> None:
     """Delete access token"""
@@ -108,6 +173,8 @@ def delete_token(encrypted_token: str) -> None:
             ),
             {"token": encrypted_token}
         )
+    # The owner of an encrypted token is unknown here; drop every cached session.
+    session_cache.clear()
 
 
 def get_decrypted_token_for_username(username: str) -> str | None:
@@ -132,27 +199,10 @@ def get_decrypted_token_for_username(username: str) -> str | None:
     return decrypt_token(row[0])
 
 
-def _ensure_sessions_table() -> None:
-    with engine.begin() as connection:
-        connection.execute(
-            text(
-                """
-                CREATE TABLE IF NOT EXISTS user_sessions (
-                    session_hash TEXT PRIMARY KEY,
-                    user_id UUID NOT NULL REFERENCES users(id) ON DELETE CASCADE,
-                    expires_at TIMESTAMPTZ NOT NULL,
-                    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
-                )
-                """
-            )
-        )
-
-
 def create_session_for_username(username: str, ttl_seconds: int = 60 * 60 * 24 * 7) -> str | None:
     """Create an opaque session for a username and return the raw session id."""
-    _ensure_sessions_table()
     session_id = secrets.token_urlsafe(32)
-    session_hash = hashlib.sha256(session_id.encode()).hexdigest()
+    session_hash = _session_hash(session_id)
 
     with engine.begin() as connection:
         row = connection.execute(
@@ -181,14 +231,17 @@ def create_session_for_username(username: str, ttl_seconds: int = 60 * 60 * 24 *
 
 
 def get_decrypted_token_for_session(session_id: str) -> str | None:
-    """Resolve a session id to the user's decrypted GitHub token."""
-    _ensure_sessions_table()
-    session_hash = hashlib.sha256(session_id.encode()).hexdigest()
+    """Resolve a session id to the user's decrypted GitHub token, from the session cache when possible."""
+    session_hash = _session_hash(session_id)
+    token = session_cache.get(session_hash)
+    if token is not None:
+        return token
+
     with engine.begin() as connection:
         row = connection.execute(
             text(
                 """
-                SELECT access_tokens.token
+                SELECT access_tokens.token, users.username, EXTRACT(EPOCH FROM user_sessions.expires_at)
                 FROM user_sessions
                 JOIN users ON users.id = user_sessions.user_id
                 JOIN access_tokens ON access_tokens.user_id = users.id
@@ -203,13 +256,15 @@ def get_decrypted_token_for_session(session_id: str) -> str | None:
     if not row or not row[0]:
         return None
 
-    return decrypt_token(row[0])
+    token = decrypt_token(row[0])
+    session_cache.put(session_hash, username=row[1], token=token, expires_at=float(row[2]))
+    return token
 
 
 def delete_session(session_id: str) -> None:
     """Invalidate a session by id."""
-    _ensure_sessions_table()
-    session_hash = hashlib.sha256(session_id.encode()).hexdigest()
+    session_hash = _session_hash(session_id)
+    session_cache.invalidate(session_hash)
     with engine.begin() as connection:
         connection.execute(
             text("DELETE FROM user_sessions WHERE session_hash = :session_hash"),
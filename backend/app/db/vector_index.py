@@ -0,0 +1,281 @@
+"""
+Index management and indexed similarity search for PGVector collections.
+
+`langchain_pg_embedding` is shared by every repository and its `embedding`
+column has no fixed dimensionality, so a single table-wide ANN index is not
+possible. Each collection instead gets its own partial index over
+`embedding::vector(dims)` (or `halfvec(dims)` above pgvector's 2000-dimension
+limit for `vector` indexes). Searches must use the same cast and a literal
+collection id for the planner to pick that index, which is what
+`asearch_collection` does.
+
+Build indexes after bulk ingestion rather than during it:
+
+    python -m app.db.vector_index                      # every collection
+    python -m app.db.vector_index --collection owner/repo --method ivfflat
+"""
+import argparse
+import logging
+import threading
+
+from langchain_core.documents import Document
+from sqlalchemy import text
+
+from app.core.config import settings
+from app.db.engine import async_engine, engine
+
+logger = logging.getLogger(__name__)
+
+ANN_METHODS = ("hnsw", "ivfflat")
+# pgvector can index `vector` up to 2000 dimensions and `halfvec` up to 4000.
+MAX_VECTOR_INDEX_DIMENSIONS = 2000
+COLLECTION_INDEXES = {
+    "ix_langchain_pg_embedding_collection_id": "(collection_id)",
+    "ix_langchain_pg_embedding_collection_path": "(collection_id, (cmetadata->>'node_path'))",
+    # Lexical side of hybrid retrieval (see app/db/chunk_search.py); trigram needs pg_trgm.
+    "ix_langchain_pg_embedding_document_fts": "USING gin (to_tsvector('simple', document))",
+    "ix_langchain_pg_embedding_path_trgm": "USING gin ((cmetadata->>'node_path') gin_trgm_ops)",
+}
+
+_collection_ids: dict[str, str] = {}
+_collection_ids_lock = threading.Lock()
+
+
+def _vector_type(dimensions: int) -> str:
+    return "vector" if dimensions <= MAX_VECTOR_INDEX_DIMENSIONS else "halfvec"
+
+
+def _index_prefix(collection_id: str) -> str:
+    return f"ix_lpe_ann_{collection_id.replace('-', '')}"
+
+
+def _index_name(collection_id: str, method: str, dimensions: int) -> str:
+    return f"{_index_prefix(collection_id)}_{method}_{dimensions}"
+
+
+def _vector_literal(embedding: list[float]) -> str:
+    return "[" + ",".join(repr(float(value)) for value in embedding) + "]"
+
+
+def rows_to_documents(rows) -> list[Document]:
+    """Turn `(id, document, cmetadata)` rows into Documents that keep their chunk id."""
+    return [Document(id=row[0], page_content=row[1] or "", metadata=row[2] or {}) for row in rows]
+
+
+def get_collection_id(collection_name: str) -> str | None:
+    with _collection_ids_lock:
+        collection_id = _collection_ids.get(collection_name)
+    if collection_id is not None:
+        return collection_id
+
+    with engine.begin() as connection:
+        collection_id = connection.execute(
+            text("SELECT CAST(uuid AS TEXT) FROM langchain_pg_collection WHERE name = :name"),
+            {"name": collection_name},
+        ).scalar_one_or_none()
+    if collection_id is not None:
+        with _collection_ids_lock:
+            _collection_ids[collection_name] = collection_id
+    return collection_id
+
+
+async def aget_collection_id(collection_name: str) -> str | None:
+    with _collection_ids_lock:
+        collection_id = _collection_ids.get(collection_name)
+    if collection_id is not None:
+        return collection_id
+
+    async with async_engine.begin() as connection:
+        result = await connection.execute(
+            text("SELECT CAST(uuid AS TEXT) FROM langchain_pg_collection WHERE name = :name"),
+            {"name": collection_name},
+        )
+        collection_id = result.scalar_one_or_none()
+    if collection_id is not None:
+        with _collection_ids_lock:
+            _collection_ids[collection_name] = collection_id
+    return collection_id
+
+
+def ensure_collection_indexes() -> None:
+    """Create the indexes shared by every collection: collection scoping and lexical search."""
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        for name, columns in COLLECTION_INDEXES.items():
+            connection.execute(
+                text(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON langchain_pg_embedding {columns}")
+            )
+
+
+def list_collections() -> list[dict]:
+    with engine.begin() as connection:
+        rows = connection.execute(
+            text(
+                """
+                SELECT c.name, CAST(c.uuid AS TEXT) AS uuid, COUNT(e.id) AS rows
+                FROM langchain_pg_collection AS c
+                LEFT JOIN langchain_pg_embedding AS e
+                  ON e.collection_id = c.uuid
+                GROUP BY c.name, c.uuid
+                ORDER BY c.name
+                """
+            )
+        ).mappings().all()
+    return [dict(row) for row in rows]
+
+
+def collection_dimensions(collection_id: str) -> int | None:
+    with engine.begin() as connection:
+        return connection.execute(
+            text(
+                """
+                SELECT vector_dims(embedding)
+                FROM langchain_pg_embedding
+                WHERE collection_id = CAST(:collection_id AS UUID)
+                LIMIT 1
+                """
+            ),
+            {"collection_id": collection_id},
+        ).scalar_one_or_none()
+
+
+def _row_count(collection_id: str) -> int:
+    with engine.begin() as connection:
+        return connection.execute(
+            text("SELECT COUNT(*) FROM langchain_pg_embedding WHERE collection_id = CAST(:collection_id AS UUID)"),
+            {"collection_id": collection_id},
+        ).scalar_one()
+
+
+def _existing_ann_indexes(collection_id: str) -> list[str]:
+    with engine.begin() as connection:
+        rows = connection.execute(
+            text(
+                """
+                SELECT indexname
+                FROM pg_indexes
+                WHERE tablename = 'langchain_pg_embedding'
+                  AND indexname LIKE :prefix
+                """
+            ),
+            {"prefix": _index_prefix(collection_id) + "%"},
+        ).fetchall()
+    return [row[0] for row in rows]
+
+
+def drop_ann_indexes(collection_id: str, keep: str | None = None) -> int:
+    """Drop a collection's ANN indexes (except `keep`); returns how many were dropped."""
+    dropped = 0
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        for name in _existing_ann_indexes(collection_id):
+            if name == keep:
+                continue
+            connection.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+            dropped += 1
+    return dropped
+
+
+def build_ann_index(collection_name: str, method: str | None = None) -> str | None:
+    """
+    Build the ANN index for one collection without blocking writes.
+
+    Returns the index name, or None when the collection is missing or empty.
+    Indexes for an outdated method or dimensionality are dropped once the new
+    one is in place.
+    """
+    method = method or settings.VECTOR_INDEX_METHOD
+    if method not in ANN_METHODS:
+        raise ValueError(f"Unknown ANN index method: {method}")
+
+    collection_id = get_collection_id(collection_name)
+    if collection_id is None:
+        logger.warning("Collection %s does not exist.", collection_name)
+        return None
+    dimensions = collection_dimensions(collection_id)
+    if dimensions is None:
+        logger.info("Collection %s is empty; skipping.", collection_name)
+        return None
+
+    vector_type = _vector_type(dimensions)
+    name = _index_name(collection_id, method, dimensions)
+    if method == "hnsw":
+        options = f"m = {settings.VECTOR_HNSW_M}, ef_construction = {settings.VECTOR_HNSW_EF_CONSTRUCTION}"
+    else:
+        lists = settings.VECTOR_IVFFLAT_LISTS or max(1, _row_count(collection_id) // 1000)
+        options = f"lists = {lists}"
+
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        connection.execute(
+            text(
+                f"""
+                CREATE INDEX CONCURRENTLY IF NOT EXISTS {name}
+                ON langchain_pg_embedding
+                USING {method} ((embedding::{vector_type}({dimensions})) {vector_type}_cosine_ops)
+                WITH ({options})
+                WHERE collection_id = '{collection_id}'
+                """
+            )
+        )
+    drop_ann_indexes(collection_id, keep=name)
+    return name
+
+
+def _search_statements(collection_id: str, embedding: list[float], k: int):
+    """Return the recall setting and the search query; both are literals the planner can match."""
+    dimensions = len(embedding)
+    vector_type = _vector_type(dimensions)
+    if settings.VECTOR_INDEX_METHOD == "ivfflat":
+        recall = text(f"SET LOCAL ivfflat.probes = {int(settings.VECTOR_IVFFLAT_PROBES)}")
+    else:
+        recall = text(f"SET LOCAL hnsw.ef_search = {max(int(settings.VECTOR_HNSW_EF_SEARCH), k)}")
+    search = text(
+        f"""
+        SELECT id, document, cmetadata
+        FROM langchain_pg_embedding
+        WHERE collection_id = '{collection_id}'
+        ORDER BY embedding::{vector_type}({dimensions}) <=> CAST(:embedding AS {vector_type}({dimensions}))
+        LIMIT :k
+        """
+    )
+    return recall, search, {"embedding": _vector_literal(embedding), "k": k}
+
+
+async def asearch_collection(collection_name: str, embedding: list[float], k: int = 10) -> list[Document]:
+    collection_id = await aget_collection_id(collection_name)
+    if collection_id is None:
+        return []
+    recall, search, params = _search_statements(collection_id, embedding, k)
+    async with async_engine.begin() as connection:
+        await connection.execute(recall)
+        rows = (await connection.execute(search, params)).fetchall()
+    return rows_to_documents(rows)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Build vector indexes for PGVector collections.")
+    parser.add_argument("--collection", action="append", help="owner/repo to index; repeatable. Defaults to all.")
+    parser.add_argument("--method", choices=ANN_METHODS, default=settings.VECTOR_INDEX_METHOD)
+    parser.add_argument("--drop", action="store_true", help="Drop the ANN indexes instead of building them.")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    ensure_collection_indexes()
+    collections = list_collections()
+    if args.collection:
+        wanted = set(args.collection)
+        collections = [collection for collection in collections if collection["name"] in wanted]
+
+    for collection in collections:
+        if args.drop:
+            dropped = drop_ann_indexes(collection["uuid"])
+            logger.info("%s: dropped %d indexes", collection["name"], dropped)
+            continue
+        name = build_ann_index(collection["name"], method=args.method)
+        if name is not None:
+            logger.info("%s: %s (%d rows)", collection["name"], name, collection["rows"])
+
+    with engine.begin() as connection:
+        connection.execute(text("ANALYZE langchain_pg_embedding"))
+
+
+if __name__ == "__main__":
+    main()
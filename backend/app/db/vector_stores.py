@@ -0,0 +1,157 @@
+"""
+Shared PGVector handles, one per collection.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from langchain_openai import OpenAIEmbeddings
+from langchain_postgres import PGVector
+
+from app.codeIngestion.helpers.metadata import CollectionMetadata
+from app.core.config import settings
+from app.db.collections import aget_collection_metadata, get_collection_metadata
+from app.db.engine import async_engine, engine
+
+
+class VectorStoreRegistry:
+    """
+    Bounded LRU of `PGVector` stores keyed by collection name and sync/async mode.
+
+    Every store shares the process-wide engine and one embeddings client, so
+    after the first request for a collection, retrieval only pays for the
+    similarity query itself. Stores look their collection up per query, so a
+    cached handle stays valid when the collection is re-ingested.
+
+    The registry also remembers which embedding model and dimensions each
+    collection was ingested with (from its `CollectionMetadata`), so queries
+    are embedded to match, and the collection's content version (its
+    `last_updated`, bumped by every ingestion). The ingesting process calls
+    `evict`; other processes re-read the metadata once `config_ttl_seconds`
+    have passed, or when asked to `refresh`.
+    """
+
+    def __init__(self, max_entries: int, config_ttl_seconds: float):
+        self.max_entries = max_entries
+        self.config_ttl_seconds = config_ttl_seconds
+        self._stores: OrderedDict[tuple[str, bool], PGVector] = OrderedDict()
+        self._embeddings: dict[tuple[str, int | None], OpenAIEmbeddings] = {}
+        # collection name -> ((model, dimensions), content version, monotonic time it was read)
+        self._configs: OrderedDict[str, tuple[tuple[str, int | None], str, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def embeddings(self) -> OpenAIEmbeddings:
+        """Client for the configured model and dimensions, used for new ingestions."""
+        return self.embeddings_for(settings.EMBEDDING_MODEL, settings.EMBEDDING_DIMENSIONS)
+
+    def embeddings_for(self, model: str, dimensions: int | None = None) -> OpenAIEmbeddings:
+        key = (model, dimensions)
+        with self._lock:
+            client = self._embeddings.get(key)
+            if client is None:
+                openai_api_key = settings.OPENAI_API_KEY
+                if not openai_api_key:
+                    raise ValueError("OPENAI_API_KEY must be set")
+                client = OpenAIEmbeddings(
+                    model=model,
+                    dimensions=dimensions,
+                    api_key=openai_api_key,
+                )
+                self._embeddings[key] = client
+            return client
+
+    def _remember_config(
+        self,
+        collection_name: str,
+        metadata: dict | None,
+    ) -> tuple[tuple[str, int | None], str]:
+        collection = CollectionMetadata.from_dict(metadata)
+        # Collections ingested before metadata was recorded used the full-size default model.
+        if collection is None or collection.embedding_model is None:
+            config = (settings.EMBEDDING_MODEL, None)
+        else:
+            config = (collection.embedding_model, collection.embedding_dimensions)
+        version = collection.last_updated if collection is not None else ""
+        with self._lock:
+            self._configs[collection_name] = (config, version, time.monotonic())
+            self._configs.move_to_end(collection_name)
+            while len(self._configs) > self.max_entries:
+                self._configs.popitem(last=False)
+        return config, version
+
+    def _cached_config(self, collection_name: str) -> tuple[tuple[str, int | None], str] | None:
+        with self._lock:
+            entry = self._configs.get(collection_name)
+            if entry is None:
+                return None
+            config, version, read_at = entry
+            if time.monotonic() - read_at >= self.config_ttl_seconds:
+                del self._configs[collection_name]
+                return None
+            self._configs.move_to_end(collection_name)
+            return config, version
+
+    def embedding_config(self, collection_name: str, refresh: bool = False) -> tuple[str, int | None]:
+        """Return the `(model, dimensions)` a collection was embedded with."""
+        cached = None if refresh else self._cached_config(collection_name)
+        if cached is None:
+            cached = self._remember_config(collection_name, get_collection_metadata(collection_name))
+        return cached[0]
+
+    async def acollection_state(
+        self,
+        collection_name: str,
+        refresh: bool = False,
+    ) -> tuple[tuple[str, int | None], str]:
+        """Return a collection's `(model, dimensions)` and content version."""
+        cached = None if refresh else self._cached_config(collection_name)
+        if cached is None:
+            cached = self._remember_config(collection_name, await aget_collection_metadata(collection_name))
+        return cached
+
+    def get(self, collection_name: str) -> PGVector:
+        return self._get(collection_name, async_mode=False)
+
+    def get_async(self, collection_name: str) -> PGVector:
+        """Return a store on the async engine; only its `a*` methods may be used."""
+        return self._get(collection_name, async_mode=True)
+
+    def _get(self, collection_name: str, async_mode: bool) -> PGVector:
+        key = (collection_name, async_mode)
+        with self._lock:
+            store = self._stores.get(key)
+            if store is not None:
+                self._stores.move_to_end(key)
+                return store
+
+        # Sync construction creates the collection row if needed; keep it outside the lock.
+        # Async stores defer that to their first query.
+        store = PGVector(
+            collection_name=collection_name,
+            connection=async_engine if async_mode else engine,
+            embeddings=self.embeddings,
+            use_jsonb=True,
+            create_extension=False,
+            async_mode=async_mode,
+        )
+        with self._lock:
+            existing = self._stores.get(key)
+            if existing is not None:
+                self._stores.move_to_end(key)
+                return existing
+            self._stores[key] = store
+            while len(self._stores) > self.max_entries:
+                self._stores.popitem(last=False)
+        return store
+
+    def evict(self, collection_name: str) -> None:
+        with self._lock:
+            self._stores.pop((collection_name, False), None)
+            self._stores.pop((collection_name, True), None)
+            self._configs.pop(collection_name, None)
+
+vector_stores = VectorStoreRegistry(
+    max_entries=settings.VECTOR_STORE_CACHE_MAX_ENTRIES,
+    config_ttl_seconds=settings.VECTOR_STORE_CONFIG_TTL_SECONDS,
+)
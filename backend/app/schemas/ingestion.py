@@ -1,11 +1,20 @@
-from pydantic import BaseModel
+from datetime import datetime
+
+from pydantic import BaseModel, Field
 from app.schemas.node import GraphPayload
 
 class IngestionRequest(BaseModel):
     """ Request model """
     owner: str
     repo: str
-    graph: GraphPayload
+    # Omitted, the graph stored for `ref` is used; `commit_sha` is the commit the client loaded it at.
+    graph: GraphPayload | None = None
+    ref: str | None = None
+    commit_sha: str | None = None
+    incremental: bool = True
+    # Shortened text-embedding-3 vectors for this repo; omitted keeps the repo's current size,
+    # and a different value re-embeds the repo.
+    embedding_dimensions: int | None = Field(default=None, gt=0)
 
 
 class IngestionResponse(BaseModel):
@@ -13,6 +22,35 @@ class IngestionResponse(BaseModel):
     status: str
     thread_id: str
     chunks_processed: int = 0
+    job_id: str | None = None
+
 
+class IngestionJob(BaseModel):
+    """ Background ingestion job state """
+    job_id: str
+    thread_id: str
+    status: str
+    files_total: int = 0
+    files_done: int = 0
+    chunks_embedded: int = 0
+    errors: int = 0
+    message: str | None = None
+    created_at: datetime
+    updated_at: datetime
+    finished_at: datetime | None = None
 
-    
\ No newline at end of file
+    @classmethod
+    def from_row(cls, row: dict) -> "IngestionJob":
+        return cls(
+            job_id=row["id"],
+            thread_id=row["repo_key"],
+            status=row["status"],
+            files_total=row["files_total"],
+            files_done=row["files_done"],
+            chunks_embedded=row["chunks_embedded"],
+            errors=row["errors"],
+            message=row["message"],
+            created_at=row["created_at"],
+            updated_at=row["updated_at"],
+            finished_at=row["finished_at"],
+        )
@@ -6,6 +6,7 @@ class Node(BaseModel):
     name: str
     path: str
     file_type: str
+    sha: str | None = None
 
 
 class Edge(BaseModel):
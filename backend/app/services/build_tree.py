@@ -92,21 +92,26 @@ def build_tree(tree_data: list[dict]) -> GraphPayload:
     root = Node(id="root", name="root", path="", file_type="tree")
     nodes_by_path[""] = root
 
-    def ensure_node(path: str, file_type: str) -> Node:
+    def ensure_node(path: str, file_type: str, sha: str | None = None) -> Node:
         existing = nodes_by_path.get(path)
         if existing:
             # Preserve directories if we first discovered path as "tree".
             if existing.file_type != "tree" and file_type == "tree":
-                nodes_by_path[path] = Node(
+                existing = Node(
                     id=existing.id,
                     name=existing.name,
                     path=existing.path,
                     file_type="tree",
+                    sha=existing.sha,
                 )
-            return nodes_by_path[path]
+            # Directories created as intermediate parents learn their sha later.
+            if sha and existing.sha is None:
+                existing = existing.model_copy(update={"sha": sha})
+            nodes_by_path[path] = existing
+            return existing
 
         name = "root" if path == "" else path.split("/")[-1]
-        node = Node(id=path or "root", name=name, path=path, file_type=file_type)
+        node = Node(id=path or "root", name=name, path=path, file_type=file_type, sha=sha)
         nodes_by_path[path] = node
         return node
 
@@ -133,7 +138,8 @@ def build_tree(tree_data: list[dict]) -> GraphPayload:
             is_leaf = idx == len(parts) - 1
             current_type = leaf_type if is_leaf else "tree"
 
-            child_node = ensure_node(current_path, current_type)
+            child_sha = item.get("sha") if is_leaf else None
+            child_node = ensure_node(current_path, current_type, child_sha)
             add_edge(parent_node, child_node)
             parent_node = child_node
 
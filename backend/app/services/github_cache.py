@@ -0,0 +1,104 @@
+"""
+ETag cache for GitHub REST responses.
+"""
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from app.db.github_cache import (
+    get_cached_response,
+    prune_github_cache,
+    save_cached_response,
+)
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class CachedResponse:
+    etag: str
+    body: bytes
+
+
+class GitHubResponseCache:
+    """
+    Stores the ETag and body of GitHub responses per token and URL.
+
+    Keys are a SHA-256 of token plus URL, so one user's responses are never
+    served to another and raw tokens are never stored. Entries live in an
+    in-memory LRU bounded by both entry count and total body bytes; with
+    `persist` enabled they are also written to Postgres so they survive
+    restarts and are shared between worker processes.
+    """
+
+    def __init__(self, max_entries: int, max_body_bytes: int, max_memory_bytes: int, persist: bool = False):
+        self.max_entries = max_entries
+        self.max_body_bytes = max_body_bytes
+        self.max_memory_bytes = max_memory_bytes
+        self.persist = persist
+        self._entries: OrderedDict[str, CachedResponse] = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(token: str, url: str) -> str:
+        return hashlib.sha256(f"{token}\n{url}".encode()).hexdigest()
+
+    def start(self, max_age_seconds: int) -> None:
+        if not self.persist:
+            return
+        pruned = prune_github_cache(max_age_seconds)
+        if pruned:
+            logger.info("Pruned %d expired GitHub cache entries.", pruned)
+
+    def get_local(self, key: str) -> CachedResponse | None:
+        """Look up the in-memory tier only."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def get(self, key: str) -> CachedResponse | None:
+        """Look up memory, then Postgres when persistence is enabled."""
+        entry = self.get_local(key)
+        if entry is not None or not self.persist:
+            return entry
+
+        try:
+            stored = get_cached_response(key)
+        except Exception as exc:
+            logger.warning("GitHub cache lookup failed: %s", exc)
+            return None
+        if stored is None:
+            return None
+
+        entry = CachedResponse(etag=stored[0], body=stored[1])
+        self._remember(key, entry)
+        return entry
+
+    def put(self, key: str, etag: str, body: bytes) -> None:
+        if len(body) > self.max_body_bytes:
+            return
+
+        self._remember(key, CachedResponse(etag=etag, body=body))
+        if self.persist:
+            try:
+                save_cached_response(key, etag, body)
+            except Exception as exc:
+                logger.warning("GitHub cache write failed: %s", exc)
+
+    def _remember(self, key: str, entry: CachedResponse) -> None:
+        if len(entry.body) > self.max_memory_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._memory_bytes -= len(previous.body)
+            self._entries[key] = entry
+            self._memory_bytes += len(entry.body)
+            while len(self._entries) > self.max_entries or self._memory_bytes > self.max_memory_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._memory_bytes -= len(evicted.body)
@@ -0,0 +1,123 @@
+"""
+Shared, pooled HTTP clients for the GitHub API.
+
+Request handlers use the async client so GitHub round trips never block the
+event loop; ingestion worker threads use the sync client. Both keep
+connections alive across requests and follow redirects, which GitHub answers
+renamed or transferred repositories with.
+"""
+import threading
+
+import httpx
+from fastapi.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.services.github_cache import GitHubResponseCache
+
+GITHUB_API_URL = "https://api.github.com"
+
+_async_client: httpx.AsyncClient | None = None
+_sync_client: httpx.Client | None = None
+_sync_lock = threading.Lock()
+
+response_cache = GitHubResponseCache(
+    max_entries=settings.GITHUB_CACHE_MAX_ENTRIES,
+    max_body_bytes=settings.GITHUB_CACHE_MAX_BODY_BYTES,
+    max_memory_bytes=settings.GITHUB_CACHE_MAX_MEMORY_BYTES,
+    persist=settings.GITHUB_CACHE_PERSIST,
+)
+
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=settings.GITHUB_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.GITHUB_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=settings.GITHUB_KEEPALIVE_EXPIRY_SECONDS,
+    )
+
+
+def _timeout() -> httpx.Timeout:
+    return httpx.Timeout(
+        settings.GITHUB_TIMEOUT_SECONDS,
+        connect=settings.GITHUB_CONNECT_TIMEOUT_SECONDS,
+    )
+
+
+def github_headers(token: str) -> dict[str, str]:
+    return {
+        "Authorization": f"Bearer {token}",
+        "Accept": "application/vnd.github+json",
+    }
+
+
+def get_async_client() -> httpx.AsyncClient:
+    """Return the process-wide async client, creating it on first use."""
+    global _async_client
+    if _async_client is None or _async_client.is_closed:
+        _async_client = httpx.AsyncClient(limits=_limits(), timeout=_timeout(), follow_redirects=True)
+    return _async_client
+
+
+def get_sync_client() -> httpx.Client:
+    """Return the process-wide sync client used from worker threads."""
+    global _sync_client
+    with _sync_lock:
+        if _sync_client is None or _sync_client.is_closed:
+            _sync_client = httpx.Client(limits=_limits(), timeout=_timeout(), follow_redirects=True)
+        return _sync_client
+
+
+async def cached_get(
+    url: str,
+    headers: dict[str, str],
+    params: dict[str, str] | None = None,
+) -> httpx.Response:
+    """
+    GET a GitHub URL with `If-None-Match` revalidation.
+
+    A 304 is answered from the cached body and returned as a 200, so callers
+    handle both cases the same way; GitHub does not count 304s against the
+    rate limit.
+    """
+    request_url = str(httpx.URL(url, params=params))
+    cache_key = response_cache.key(
+        f"{headers.get('Authorization', '')}\n{headers.get('Accept', '')}",
+        request_url,
+    )
+
+    cached = response_cache.get_local(cache_key)
+    if cached is None and response_cache.persist:
+        cached = await run_in_threadpool(response_cache.get, cache_key)
+
+    request_headers = dict(headers)
+    if cached is not None:
+        request_headers["If-None-Match"] = cached.etag
+
+    res = await get_async_client().get(request_url, headers=request_headers)
+
+    if res.status_code == 304 and cached is not None:
+        return httpx.Response(
+            200,
+            content=cached.body,
+            headers={"Content-Type": "application/json", "ETag": cached.etag},
+            request=res.request,
+        )
+
+    etag = res.headers.get("etag")
+    if res.status_code == 200 and etag:
+        if response_cache.persist:
+            await run_in_threadpool(response_cache.put, cache_key, etag, res.content)
+        else:
+            response_cache.put(cache_key, etag, res.content)
+    return res
+
+
+async def aclose_clients() -> None:
+    global _async_client, _sync_client
+    if _async_client is not None:
+        await _async_client.aclose()
+        _async_client = None
+    with _sync_lock:
+        if _sync_client is not None:
+            _sync_client.close()
+            _sync_client = None
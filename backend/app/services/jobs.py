@@ -0,0 +1,198 @@
+"""
+In-process background job runner with job state persisted in Postgres.
+"""
+import logging
+import threading
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+
+from app.core.config import settings
+from app.db.jobs import (
+    create_job,
+    fail_stale_jobs,
+    finish_job,
+    record_job_progress,
+    request_job_cancel,
+    start_job,
+    touch_queued_jobs,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class JobCancelled(Exception):
+    """Raised inside a job runner once cancellation has been requested."""
+
+
+class JobProgress:
+    """Thread-safe progress counters for one running job."""
+
+    def __init__(self, job_id: str):
+        self.job_id = job_id
+        self.files_total = 0
+        self.files_done = 0
+        self.chunks_embedded = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+        self._cancelled = threading.Event()
+
+    def set_total(self, files_total: int) -> None:
+        with self._lock:
+            self.files_total = files_total
+
+    def file_done(self, error: bool = False) -> None:
+        with self._lock:
+            self.files_done += 1
+            if error:
+                self.errors += 1
+
+    def chunks_stored(self, count: int) -> None:
+        with self._lock:
+            self.chunks_embedded += count
+
+    def snapshot(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "files_total": self.files_total,
+                "files_done": self.files_done,
+                "chunks_embedded": self.chunks_embedded,
+                "errors": self.errors,
+            }
+
+    def cancel(self) -> None:
+        self._cancelled.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def raise_if_cancelled(self) -> None:
+        if self.cancelled:
+            raise JobCancelled(self.job_id)
+
+
+JobRunner = Callable[[JobProgress], str | None]
+
+
+class JobManager:
+    """
+    Runs jobs on a local thread pool and mirrors their state into `background_jobs`.
+
+    Only one job per `(kind, repo_key)` can be active; duplicate submissions
+    return the active job instead of starting another one. Running jobs write
+    their counters every `heartbeat_seconds`, which is also how cancellation
+    requested from another worker process reaches them; jobs still waiting
+    for a free worker are heartbeated too, so they are not mistaken for stale.
+    """
+
+    def __init__(self, max_workers: int, heartbeat_seconds: float, stale_seconds: int):
+        self.max_workers = max_workers
+        self.heartbeat_seconds = heartbeat_seconds
+        self.stale_seconds = stale_seconds
+        self._executor: ThreadPoolExecutor | None = None
+        self._running: dict[str, JobProgress] = {}
+        self._queued: set[str] = set()
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._heartbeat_thread: threading.Thread | None = None
+
+    def start(self) -> None:
+        failed = fail_stale_jobs(self.stale_seconds)
+        if failed:
+            logger.warning("Marked %d stale background jobs as failed.", failed)
+
+        self._stopped.clear()
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="jobs")
+        self._heartbeat_thread = threading.Thread(target=self._heartbeat_loop, name="jobs-heartbeat", daemon=True)
+        self._heartbeat_thread.start()
+
+    def shutdown(self) -> None:
+        self._stopped.set()
+        with self._lock:
+            for progress in self._running.values():
+                progress.cancel()
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+    def submit(
+        self,
+        kind: str,
+        repo_key: str,
+        runner: JobRunner,
+        submitted_by: str | None = None,
+    ) -> tuple[dict, bool]:
+        """Queue `runner` unless a job is already active for this repo; returns `(job, created)`."""
+        if self._executor is None:
+            raise RuntimeError("JobManager has not been started.")
+
+        fail_stale_jobs(self.stale_seconds, kind=kind, repo_key=repo_key)
+        job, created = create_job(kind, repo_key, submitted_by)
+        if created:
+            with self._lock:
+                self._queued.add(job["id"])
+            self._executor.submit(self._run, job["id"], runner)
+        return job, created
+
+    def cancel(self, job_id: str) -> dict | None:
+        job = request_job_cancel(job_id)
+        with self._lock:
+            progress = self._running.get(job_id)
+        if progress is not None:
+            progress.cancel()
+        return job
+
+    def _run(self, job_id: str, runner: JobRunner) -> None:
+        with self._lock:
+            self._queued.discard(job_id)
+        if not start_job(job_id):
+            return
+
+        progress = JobProgress(job_id)
+        with self._lock:
+            self._running[job_id] = progress
+
+        status = "succeeded"
+        message: str | None = None
+        try:
+            message = runner(progress)
+            if progress.cancelled:
+                status = "cancelled"
+        except JobCancelled:
+            status, message = "cancelled", "Cancelled."
+        except Exception as exc:
+            logger.exception("Background job %s failed", job_id)
+            status, message = "failed", str(exc)
+        finally:
+            with self._lock:
+                self._running.pop(job_id, None)
+            try:
+                record_job_progress(job_id, **progress.snapshot())
+                finish_job(job_id, status, message)
+            except Exception:
+                logger.exception("Failed to record final state for job %s", job_id)
+
+    def _heartbeat_loop(self) -> None:
+        while not self._stopped.wait(self.heartbeat_seconds):
+            with self._lock:
+                running = list(self._running.values())
+                queued = list(self._queued)
+            try:
+                touch_queued_jobs(queued)
+            except Exception as exc:
+                logger.warning("Failed to record heartbeat for queued jobs: %s", exc)
+            for progress in running:
+                try:
+                    status = record_job_progress(progress.job_id, **progress.snapshot())
+                except Exception as exc:
+                    logger.warning("Failed to record progress for job %s: %s", progress.job_id, exc)
+                    continue
+                if status == "cancelling":
+                    progress.cancel()
+
+
+job_manager = JobManager(
+    max_workers=settings.JOB_WORKERS,
+    heartbeat_seconds=settings.JOB_HEARTBEAT_SECONDS,
+    stale_seconds=settings.JOB_STALE_SECONDS,
+)
@@ -0,0 +1,69 @@
+"""
+In-process latency metrics.
+"""
+import threading
+import time
+from collections import deque
+from collections.abc import Iterator
+from contextlib import contextmanager
+
+
+class LatencyMetrics:
+    """
+    Keeps the most recent samples per metric name and reports percentiles.
+
+    Samples are milliseconds. Only the last `window` samples of each metric are
+    kept, so the numbers describe recent behaviour and memory stays bounded.
+    """
+
+    def __init__(self, window: int = 1000):
+        self.window = window
+        self._samples: dict[str, deque[float]] = {}
+        self._counts: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def record(self, name: str, milliseconds: float) -> None:
+        with self._lock:
+            samples = self._samples.get(name)
+            if samples is None:
+                samples = deque(maxlen=self.window)
+                self._samples[name] = samples
+            samples.append(milliseconds)
+            self._counts[name] = self._counts.get(name, 0) + 1
+
+    def increment(self, name: str) -> None:
+        with self._lock:
+            self._counts[name] = self._counts.get(name, 0) + 1
+
+    @contextmanager
+    def timer(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, (time.perf_counter() - started) * 1000)
+
+    @staticmethod
+    def _percentile(ordered: list[float], fraction: float) -> float:
+        index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+        return ordered[index]
+
+    def snapshot(self) -> dict[str, dict[str, float]]:
+        with self._lock:
+            samples = {name: sorted(values) for name, values in self._samples.items()}
+            counts = dict(self._counts)
+
+        report: dict[str, dict[str, float]] = {}
+        for name, count in counts.items():
+            ordered = samples.get(name)
+            if not ordered:
+                report[name] = {"count": count}
+                continue
+            report[name] = {
+                "count": count,
+                "avg_ms": round(sum(ordered) / len(ordered), 2),
+                "p50_ms": round(self._percentile(ordered, 0.5), 2),
+                "p95_ms": round(self._percentile(ordered, 0.95), 2),
+                "max_ms": round(ordered[-1], 2),
+            }
+        return report
@@ -0,0 +1,134 @@
+"""
+Semantic cache of chat answers per repository collection.
+"""
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from app.core.config import settings
+
+# The `(model, dimensions)` a collection's vectors were embedded with.
+EmbeddingConfig = tuple[str, int | None]
+
+
+@dataclass
+class _CollectionAnswers:
+    embeddings: list[np.ndarray] = field(default_factory=list)
+    answers: list[str] = field(default_factory=list)
+    created_at: list[float] = field(default_factory=list)
+    matrix: np.ndarray | None = None
+
+
+class SemanticAnswerCache:
+    """
+    Stores finished answers next to the normalized embedding of their query.
+
+    A new query is answered from the cache when the cosine similarity of its
+    embedding to a stored one reaches `threshold` and the stored answer is
+    younger than `ttl_seconds`. Answers are kept per collection, content
+    version and `(model, dimensions)` embedding config, so a collection
+    re-embedded at another size never compares vectors of different lengths,
+    and once an ingestion bumps the collection's version (see
+    `CollectionMetadata.last_updated`) every worker stops serving answers
+    built from the old chunks. Each keeps its newest `max_entries` answers,
+    and only the `max_collections` most recently used are kept. The
+    ingesting process also calls `invalidate` to free them right away.
+    """
+
+    def __init__(self, threshold: float, ttl_seconds: int, max_entries: int, max_collections: int):
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_collections = max_collections
+        self._collections: OrderedDict[tuple[str, str, EmbeddingConfig], _CollectionAnswers] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _normalize(embedding: list[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = float(np.linalg.norm(vector))
+        return vector / norm if norm else vector
+
+    def _expire(self, entry: _CollectionAnswers, now: float) -> None:
+        cutoff = now - self.ttl_seconds
+        keep = next((idx for idx, created in enumerate(entry.created_at) if created >= cutoff), len(entry.created_at))
+        if keep:
+            del entry.embeddings[:keep]
+            del entry.answers[:keep]
+            del entry.created_at[:keep]
+            entry.matrix = None
+
+    def get(
+        self,
+        collection_name: str,
+        version: str,
+        embedding_config: EmbeddingConfig,
+        embedding: list[float],
+    ) -> str | None:
+        query = self._normalize(embedding)
+        key = (collection_name, version, embedding_config)
+        with self._lock:
+            entry = self._collections.get(key)
+            if entry is None:
+                return None
+            self._collections.move_to_end(key)
+            self._expire(entry, time.monotonic())
+            if not entry.answers:
+                return None
+            if entry.matrix is None:
+                entry.matrix = np.vstack(entry.embeddings)
+            scores = entry.matrix @ query
+            best = int(np.argmax(scores))
+            if float(scores[best]) < self.threshold:
+                return None
+            return entry.answers[best]
+
+    def put(
+        self,
+        collection_name: str,
+        version: str,
+        embedding_config: EmbeddingConfig,
+        embedding: list[float],
+        answer: str,
+    ) -> None:
+        if not answer.strip():
+            return
+        vector = self._normalize(embedding)
+        key = (collection_name, version, embedding_config)
+        with self._lock:
+            entry = self._collections.get(key)
+            if entry is None:
+                # Answers of other versions of this collection can no longer be served.
+                for stale in [other for other in self._collections if other[0] == collection_name and other[1] != version]:
+                    del self._collections[stale]
+                entry = _CollectionAnswers()
+                self._collections[key] = entry
+            self._collections.move_to_end(key)
+
+            entry.embeddings.append(vector)
+            entry.answers.append(answer)
+            entry.created_at.append(time.monotonic())
+            if len(entry.answers) > self.max_entries:
+                del entry.embeddings[0]
+                del entry.answers[0]
+                del entry.created_at[0]
+            entry.matrix = None
+
+            while len(self._collections) > self.max_collections:
+                self._collections.popitem(last=False)
+
+    def invalidate(self, collection_name: str) -> None:
+        with self._lock:
+            for key in [key for key in self._collections if key[0] == collection_name]:
+                del self._collections[key]
+
+
+answer_cache = SemanticAnswerCache(
+    threshold=settings.ANSWER_CACHE_SIMILARITY_THRESHOLD,
+    ttl_seconds=settings.ANSWER_CACHE_TTL_SECONDS,
+    max_entries=settings.ANSWER_CACHE_MAX_ENTRIES_PER_REPO,
+    max_collections=settings.ANSWER_CACHE_MAX_REPOS,
+)
@@ -0,0 +1,164 @@
+"""
+Turns retrieved chunks into a deduplicated, token-budgeted prompt context.
+"""
+import re
+from collections.abc import Callable
+from dataclasses import dataclass
+from functools import lru_cache
+
+import tiktoken
+from langchain_core.documents import Document
+
+# Longest overlap searched when stitching neighbouring chunks; NodeProcessor uses 320 characters.
+MAX_STITCH_OVERLAP = 1000
+# Shorter boundary matches (a closing brace, a blank line) are coincidence, not splitter overlap.
+MIN_STITCH_OVERLAP = 32
+SHINGLE_WORDS = 5
+# A block whose shingles are mostly contained in an already packed block adds nothing.
+DUPLICATE_CONTAINMENT = 0.9
+# Below this many remaining tokens a truncated block is not worth including.
+MIN_TRUNCATED_TOKENS = 128
+
+_WORD = re.compile(r"\S+")
+
+
+@lru_cache(maxsize=8)
+def _encoding(model: str) -> tiktoken.Encoding:
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("o200k_base")
+
+
+@dataclass
+class ContextBlock:
+    """A contiguous run of chunks from one file."""
+
+    node_path: str
+    file_type: str
+    first_chunk: int
+    last_chunk: int
+    content: str
+    tokens: int = 0
+    truncated: bool = False
+
+
+def _chunk_index(doc: Document) -> int:
+    try:
+        return int((doc.metadata or {}).get("chunk_index", 0))
+    except (TypeError, ValueError):
+        return 0
+
+
+def _stitch(left: str, right: str) -> str:
+    """Join consecutive chunks, dropping the text the splitter repeated at the boundary."""
+    for size in range(min(len(left), len(right), MAX_STITCH_OVERLAP), MIN_STITCH_OVERLAP - 1, -1):
+        if left.endswith(right[:size]):
+            return left + right[size:]
+    return left + "\n" + right
+
+
+def _shingles(text: str) -> set[tuple[str, ...]]:
+    words = _WORD.findall(text)
+    if len(words) < SHINGLE_WORDS:
+        return {tuple(words)} if words else set()
+    return {tuple(words[idx : idx + SHINGLE_WORDS]) for idx in range(len(words) - SHINGLE_WORDS + 1)}
+
+
+class ContextAssembler:
+    """
+    Merges, deduplicates and packs retrieved chunks into `max_tokens`.
+
+    Chunks come in relevance order. Chunks of the same `node_path` with
+    consecutive `chunk_index` values are stitched into one block without the
+    splitter's overlap; a block ranks by its most relevant chunk. Blocks that
+    are near-duplicates of a better-ranked block (identical files vendored
+    twice, generated copies) are dropped. Blocks are then packed best first
+    until the budget is spent; the first block that does not fit is cut to
+    the remaining budget, and later blocks that still fit are kept.
+    """
+
+    def __init__(self, max_tokens: int, model: str | None = None, count_tokens: Callable[[str], int] | None = None):
+        self.max_tokens = max_tokens
+        self.model = model or "gpt-4o-mini"
+        self._count_tokens = count_tokens
+
+    def count_tokens(self, text: str) -> int:
+        if self._count_tokens is not None:
+            return self._count_tokens(text)
+        return len(_encoding(self.model).encode_ordinary(text))
+
+    def _truncate(self, text: str, max_tokens: int) -> str:
+        if self._count_tokens is not None:
+            # Proportional cut when a custom counter is used, shortened until it fits.
+            cut = len(text)
+            tokens = self.count_tokens(text)
+            while cut > 0 and tokens > max_tokens:
+                cut = max(0, cut * max_tokens // max(1, tokens))
+                tokens = self.count_tokens(text[:cut])
+            return text[:cut]
+        encoding = _encoding(self.model)
+        return encoding.decode(encoding.encode_ordinary(text)[:max_tokens])
+
+    def merge(self, docs: list[Document]) -> list[ContextBlock]:
+        """Group chunks into contiguous per-file blocks, ordered by their best chunk's rank."""
+        by_path: dict[str, list[tuple[int, int, Document]]] = {}
+        for rank, doc in enumerate(docs):
+            path = (doc.metadata or {}).get("node_path", "unknown")
+            by_path.setdefault(path, []).append((_chunk_index(doc), rank, doc))
+
+        ranked_blocks: list[tuple[int, ContextBlock]] = []
+        for path, chunks in by_path.items():
+            chunks.sort(key=lambda item: item[0])
+            block: ContextBlock | None = None
+            best_rank = 0
+            for chunk_index, rank, doc in chunks:
+                if block is not None and chunk_index == block.last_chunk:
+                    best_rank = min(best_rank, rank)
+                    continue
+                if block is not None and chunk_index == block.last_chunk + 1:
+                    block.content = _stitch(block.content, doc.page_content)
+                    block.last_chunk = chunk_index
+                    best_rank = min(best_rank, rank)
+                    continue
+                if block is not None:
+                    ranked_blocks.append((best_rank, block))
+                block = ContextBlock(
+                    node_path=path,
+                    file_type=(doc.metadata or {}).get("file_type", "unknown"),
+                    first_chunk=chunk_index,
+                    last_chunk=chunk_index,
+                    content=doc.page_content,
+                )
+                best_rank = rank
+            if block is not None:
+                ranked_blocks.append((best_rank, block))
+
+        ranked_blocks.sort(key=lambda item: item[0])
+        return [block for _, block in ranked_blocks]
+
+    def assemble(self, docs: list[Document]) -> list[ContextBlock]:
+        """Return the blocks to put in the prompt, best first, within `max_tokens`."""
+        packed: list[ContextBlock] = []
+        packed_shingles: list[set[tuple[str, ...]]] = []
+        remaining = self.max_tokens
+        for block in self.merge(docs):
+            if remaining < MIN_TRUNCATED_TOKENS:
+                break
+            shingles = _shingles(block.content)
+            if not shingles:
+                continue
+            if any(len(shingles & seen) >= DUPLICATE_CONTAINMENT * len(shingles) for seen in packed_shingles):
+                continue
+
+            block.tokens = self.count_tokens(block.content)
+            if block.tokens > remaining:
+                if any(item.truncated for item in packed):
+                    continue
+                block.content = self._truncate(block.content, remaining)
+                block.tokens = self.count_tokens(block.content)
+                block.truncated = True
+            packed.append(block)
+            packed_shingles.append(shingles)
+            remaining -= block.tokens
+        return packed
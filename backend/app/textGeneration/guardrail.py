@@ -0,0 +1,85 @@
+"""
+Cheap guardrail checks that run before, or instead of, the LLM classifier.
+"""
+import re
+import threading
+from collections import OrderedDict
+
+from pydantic import BaseModel, Field
+
+
+class ModelGuardrail(BaseModel):
+    safe: bool = Field(
+        description="True if the query is safe and in-scope for a codebase assistant."
+    )
+    reason: str = Field(
+        default="",
+        description="Short explanation for why the query is safe or unsafe.",
+    )
+    category: str = Field(
+        default="in_scope",
+        description="Classification label such as in_scope, out_of_scope, or prompt_injection.",
+    )
+
+
+INJECTION_PATTERNS = [
+    re.compile(r"\b(ignore|disregard|forget)\b.{0,40}\b(previous|prior|above|all|your)\b.{0,20}\b(instructions|rules|prompts?)\b"),
+    re.compile(r"\b(reveal|print|show|repeat|leak)\b.{0,40}\b(system prompt|hidden prompt|instructions)\b"),
+    re.compile(r"\byou are no longer\b|\bact as (?:an? )?(?:unrestricted|jailbroken)\b|\bdeveloper mode\b"),
+]
+
+SECRET_PATTERNS = [
+    re.compile(
+        r"\b(give|send|show|print|reveal|dump|exfiltrate|leak)\b.{0,40}"
+        r"(?:\b(?:api keys?|access tokens?|secret keys?|passwords?|credentials|private keys?)\b|\.env\b)"
+    ),
+]
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_query(query: str) -> str:
+    return _WHITESPACE.sub(" ", query).strip().lower()
+
+
+def prefilter(query: str) -> ModelGuardrail | None:
+    """
+    Block obvious queries locally.
+
+    Returns an unsafe verdict for known injection and secret-exfiltration
+    phrasings and `None` otherwise; only the LLM classifier marks a query
+    safe.
+    """
+    normalized = normalize_query(query)
+    if any(pattern.search(normalized) for pattern in INJECTION_PATTERNS):
+        return ModelGuardrail(safe=False, reason="Matched a prompt-injection rule.", category="prompt_injection")
+    if any(pattern.search(normalized) for pattern in SECRET_PATTERNS):
+        return ModelGuardrail(safe=False, reason="Matched a credential-exfiltration rule.", category="credential_exfiltration")
+    return None
+
+
+class GuardrailCache:
+    """Thread-safe LRU of guardrail verdicts keyed by normalized query."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, ModelGuardrail] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, query: str) -> ModelGuardrail | None:
+        key = normalize_query(query)
+        with self._lock:
+            verdict = self._entries.get(key)
+            if verdict is not None:
+                self._entries.move_to_end(key)
+            return verdict
+
+    def put(self, query: str, verdict: ModelGuardrail) -> None:
+        if self.max_entries <= 0:
+            return
+        key = normalize_query(query)
+        with self._lock:
+            self._entries[key] = verdict
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
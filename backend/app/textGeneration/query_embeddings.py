@@ -0,0 +1,51 @@
+"""
+In-process LRU of chat query embeddings.
+"""
+import threading
+from collections import OrderedDict
+
+from app.db.vector_stores import vector_stores
+
+
+class QueryEmbeddingCache:
+    """
+    Memoizes query embeddings keyed by `(model, dimensions, text)`.
+
+    Repeated and retried questions skip the embeddings API entirely. The key
+    includes the model and dimensions because collections may be embedded
+    with different settings, and vectors from one cannot query another.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[tuple[str, int | None, str], list[float]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _get(self, key: tuple[str, int | None, str]) -> list[float] | None:
+        with self._lock:
+            embedding = self._entries.get(key)
+            if embedding is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return embedding
+
+    def _put(self, key: tuple[str, int | None, str], embedding: list[float]) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = embedding
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    async def aembed_query(self, text: str, model: str, dimensions: int | None = None) -> list[float]:
+        key = (model, dimensions, text)
+        embedding = self._get(key)
+        if embedding is None:
+            embedding = await vector_stores.embeddings_for(model, dimensions).aembed_query(text)
+            self._put(key, embedding)
+        return embedding
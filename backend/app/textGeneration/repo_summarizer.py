@@ -0,0 +1,309 @@
+"""
+Bottom-up summarization of a repository graph.
+"""
+import hashlib
+import logging
+from collections import defaultdict
+from concurrent.futures import Future
+from typing import Any
+
+from app.codeIngestion.helpers import BoundedExecutor, NodeProcessor
+from app.core.config import settings
+from app.db.explanations import get_explanations_by_sha, save_explanation
+from app.services.jobs import JobCancelled, JobProgress
+from app.textGeneration.llm_service import explain_file, explanation_model, summarize_directory
+
+logger = logging.getLogger(__name__)
+
+
+class RepositorySummarizer:
+    """
+    Summarizes every node of a `/tree` graph payload, leaves first.
+
+    Files are summarized from their source; directories only from the stored
+    summaries of their direct children, so every prompt stays small and the
+    total token cost grows linearly with the number of nodes.
+
+    Summaries live in `file_explanations` keyed by content: the blob sha for
+    files and a digest of the children's keys for directories. Re-running on an
+    unchanged subtree therefore costs no LLM calls, and a changed file only
+    re-summarizes the directories on its path to the root.
+    """
+
+    def __init__(self, session: str, max_workers: int | None = None):
+        self.processor = NodeProcessor(session=session)
+        self.max_workers = max_workers or settings.SUMMARY_WORKERS
+        self.model = explanation_model()
+
+    @staticmethod
+    def _graph(tree_payload: dict[str, Any]) -> tuple[dict[str, dict], dict[str, list[str]]]:
+        """Return nodes by id and child ids by parent id."""
+        nodes = {node["id"]: node for node in tree_payload.get("nodes", []) if node.get("id")}
+        children: dict[str, list[str]] = defaultdict(list)
+        for edge in tree_payload.get("edges", []):
+            if edge.get("source") in nodes and edge.get("target") in nodes:
+                children[edge["source"]].append(edge["target"])
+        return nodes, children
+
+    @staticmethod
+    def _depth(node: dict) -> int:
+        path = node.get("path") or ""
+        return path.count("/") + 1 if path else 0
+
+    @classmethod
+    def _content_keys(cls, nodes: dict[str, dict], children: dict[str, list[str]]) -> dict[str, str]:
+        """Key blobs by sha and directories by a digest over their children's names and keys."""
+        keys: dict[str, str] = {}
+        for node_id, node in nodes.items():
+            if node.get("file_type") == "blob" and node.get("sha"):
+                keys[node_id] = node["sha"]
+
+        trees = [node_id for node_id, node in nodes.items() if node.get("file_type") == "tree"]
+        for node_id in sorted(trees, key=lambda node_id: cls._depth(nodes[node_id]), reverse=True):
+            entries = sorted(
+                f"{nodes[child_id].get('name', '')}\0{keys[child_id]}"
+                for child_id in children.get(node_id, [])
+                if child_id in keys
+            )
+            if entries:
+                digest = hashlib.sha1("\n".join(entries).encode("utf-8")).hexdigest()
+                keys[node_id] = f"tree:{digest}"
+        return keys
+
+    def _summarize_file(
+        self,
+        owner: str,
+        repo: str,
+        path: str,
+        blob_sha: str,
+        content: str | None = None,
+        progress: JobProgress | None = None,
+        ref: str | None = None,
+    ) -> tuple[str, str | None]:
+        """
+        Summarize one file and store the result; returns `(blob_sha, summary or None)`.
+
+        Without `content` the file is fetched at `ref` through the contents API.
+        """
+        try:
+            if progress is not None:
+                progress.raise_if_cancelled()
+            if content is None:
+                content = self.processor.fetch_contents(owner, repo, path, ref=ref)
+            summary = explain_file(path=path, content=content)
+            save_explanation(f"{owner}/{repo}", path, blob_sha, summary, self.model)
+        except JobCancelled:
+            return blob_sha, None
+        except Exception as exc:
+            logger.warning("Failed to summarize %s/%s:%s: %s", owner, repo, path, exc)
+            if progress is not None:
+                progress.file_done(error=True)
+            return blob_sha, None
+
+        if progress is not None:
+            progress.file_done()
+        return blob_sha, summary
+
+    def _summarize_directory(
+        self,
+        owner: str,
+        repo: str,
+        path: str,
+        key: str,
+        entries: list[tuple[str, str, str]],
+        complete: bool,
+        progress: JobProgress | None = None,
+    ) -> tuple[str, str | None, bool]:
+        """
+        Summarize one directory from its children's summaries.
+
+        Incomplete directories (a child could not be summarized) are returned but
+        not stored, so the next run retries them instead of serving a partial view.
+        """
+        try:
+            summary = summarize_directory(path=path, entries=entries)
+            if complete:
+                save_explanation(f"{owner}/{repo}", path, key, summary, self.model)
+        except Exception as exc:
+            logger.warning("Failed to summarize directory %s/%s:%s: %s", owner, repo, path or "/", exc)
+            if progress is not None:
+                progress.file_done(error=True)
+            return key, None, False
+
+        if progress is not None:
+            progress.file_done()
+        return key, summary, complete
+
+    def _summarize_files(
+        self,
+        owner: str,
+        repo: str,
+        blobs: dict[str, str],
+        ref: str | None,
+        progress: JobProgress | None,
+    ) -> tuple[dict[str, str], set[str]]:
+        """
+        Summarize `{path: blob_sha}` on a bounded pool.
+
+        Returns summaries by blob sha plus the shas of binary files that were skipped.
+        """
+        futures: list[Future] = []
+        fetched: set[str] = set()
+        skipped: set[str] = set()
+
+        with BoundedExecutor(
+            max_workers=self.max_workers,
+            max_pending=settings.INGESTION_MAX_PENDING,
+            thread_name_prefix="summary",
+        ) as executor:
+
+            def submit_per_file(paths: dict[str, str]) -> None:
+                for path, blob_sha in paths.items():
+                    if progress is not None:
+                        progress.raise_if_cancelled()
+                    futures.append(
+                        executor.submit(self._summarize_file, owner, repo, path, blob_sha, None, progress, ref)
+                    )
+
+            try:
+                if len(blobs) <= settings.INCREMENTAL_PER_FILE_THRESHOLD:
+                    submit_per_file(blobs)
+                else:
+                    try:
+                        for path, content in self.processor.fetch_archive(
+                            owner, repo, ref=ref, include=blobs.__contains__
+                        ):
+                            if progress is not None:
+                                progress.raise_if_cancelled()
+                            fetched.add(path)
+                            futures.append(
+                                executor.submit(
+                                    self._summarize_file, owner, repo, path, blobs[path], content, progress
+                                )
+                            )
+                    except JobCancelled:
+                        raise
+                    except Exception as exc:
+                        logger.warning(
+                            "Archive fetch failed for %s/%s after %d files; falling back to per-file fetch (%s)",
+                            owner,
+                            repo,
+                            len(fetched),
+                            exc,
+                        )
+                        submit_per_file({path: sha for path, sha in blobs.items() if path not in fetched})
+                    else:
+                        # The archive skips files that are not UTF-8 text; they have nothing to summarize.
+                        skipped.update(sha for path, sha in blobs.items() if path not in fetched)
+            except JobCancelled:
+                logger.info("Summarization for %s/%s cancelled after %d files.", owner, repo, len(futures))
+
+        summaries: dict[str, str] = {}
+        for future in futures:
+            blob_sha, summary = future.result()
+            if summary is not None:
+                summaries[blob_sha] = summary
+        return summaries, skipped
+
+    def summarize_repo_tree(
+        self,
+        owner: str,
+        repo: str,
+        tree_payload: dict[str, Any],
+        ref: str | None = None,
+        progress: JobProgress | None = None,
+    ) -> int:
+        """
+        Summarize every file and directory in the graph that has no stored summary.
+
+        Files with the same blob sha are summarized once. Directories are
+        processed one depth level at a time, deepest first, with each level
+        fanned out on the worker pool. Returns the number of new summaries.
+        """
+        repo_key = f"{owner}/{repo}"
+        nodes, children = self._graph(tree_payload)
+        keys = self._content_keys(nodes, children)
+        summaries = get_explanations_by_sha(repo_key, sorted(set(keys.values())))
+
+        blobs: dict[str, str] = {}
+        blob_keys: set[str] = set()
+        for node_id, node in nodes.items():
+            key = keys.get(node_id)
+            if node.get("file_type") == "blob" and key and key not in summaries and key not in blob_keys:
+                blob_keys.add(key)
+                blobs[node["path"]] = key
+
+        levels: dict[int, list[str]] = defaultdict(list)
+        pending_keys: set[str] = set()
+        for node_id, node in nodes.items():
+            key = keys.get(node_id)
+            if node.get("file_type") == "tree" and key and key not in summaries and key not in pending_keys:
+                pending_keys.add(key)
+                levels[self._depth(node)].append(node_id)
+
+        if progress is not None:
+            progress.set_total(len(blobs) + len(pending_keys))
+        if not blobs and not pending_keys:
+            logger.info("All nodes of %s are already summarized.", repo_key)
+            return 0
+
+        created = 0
+        skipped: set[str] = set()
+        if blobs:
+            new_summaries, skipped = self._summarize_files(owner, repo, blobs, ref, progress)
+            summaries.update(new_summaries)
+            created += len(new_summaries)
+
+        child_max_chars = settings.SUMMARY_CHILD_MAX_CHARS
+        # Directories summarized from an incomplete set of children are never stored.
+        partial: set[str] = set()
+        with BoundedExecutor(
+            max_workers=self.max_workers,
+            max_pending=settings.INGESTION_MAX_PENDING,
+            thread_name_prefix="summary",
+        ) as executor:
+            for depth in sorted(levels, reverse=True):
+                if progress is not None:
+                    progress.raise_if_cancelled()
+
+                futures: list[Future] = []
+                for node_id in levels[depth]:
+                    node = nodes[node_id]
+                    entries: list[tuple[str, str, str]] = []
+                    complete = True
+                    child_ids = sorted(children.get(node_id, []), key=lambda child_id: nodes[child_id].get("name", ""))
+                    for child_id in child_ids:
+                        child = nodes[child_id]
+                        key = keys.get(child_id)
+                        summary = summaries.get(key) if key else None
+                        if summary is None or key in partial:
+                            complete = complete and (key is None or key in skipped)
+                        if summary is not None:
+                            entries.append((child.get("name", ""), child.get("file_type", "blob"), summary[:child_max_chars]))
+
+                    if not entries:
+                        if progress is not None:
+                            progress.file_done(error=True)
+                        continue
+                    futures.append(
+                        executor.submit(
+                            self._summarize_directory,
+                            owner,
+                            repo,
+                            node.get("path") or "",
+                            keys[node_id],
+                            entries,
+                            complete,
+                            progress,
+                        )
+                    )
+
+                for future in futures:
+                    key, summary, complete = future.result()
+                    if summary is not None:
+                        summaries[key] = summary
+                        created += 1
+                    if not complete:
+                        partial.add(key)
+
+        return created
@@ -0,0 +1,144 @@
+"""
+Hybrid chunk retrieval: vector, full-text and path search fused by rank.
+
+Each retriever returns its own ranked candidate list. The lists are merged
+with reciprocal rank fusion (`1 / (RETRIEVAL_RRF_K + rank)` summed over the
+lists a chunk appears in), so no score calibration between pgvector, ts_rank
+and trigram similarity is needed. Chunks whose file is adjacent, in the
+`build_tree` graph, to one of the best fused files then get a boost, which
+pulls in the siblings and neighbours of the code the query is about.
+"""
+import asyncio
+import re
+
+from langchain_core.documents import Document
+
+from app.core.config import settings
+from app.db.chunk_search import apath_search_collection, atext_search_collection
+from app.db.vector_index import asearch_collection
+
+STOPWORDS = {
+    "a", "about", "all", "an", "and", "any", "are", "as", "at", "be", "by", "can", "code", "codebase",
+    "do", "does", "explain", "file", "files", "for", "from", "get", "how", "i", "in", "into", "is", "it",
+    "its", "me", "of", "on", "or", "repo", "repository", "show", "tell", "that", "the", "their", "there",
+    "this", "to", "used", "uses", "using", "what", "when", "where", "which", "who", "why", "with", "work",
+    "works", "you",
+}
+MAX_TEXT_TERMS = 12
+MAX_PATH_TERMS = 6
+# Content words shorter than this match too many paths to be useful as path terms.
+MIN_PATH_TERM_LENGTH = 4
+SEED_FILES = 3
+
+_IDENTIFIER = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+_PATH_LIKE = re.compile(r"[\w.-]*[/.][\w./-]+")
+_CAMEL_BOUNDARY = re.compile(r"(?<=[a-z0-9])(?=[A-Z])")
+
+
+def _split_identifier(identifier: str) -> list[str]:
+    words = []
+    for part in identifier.split("_"):
+        words.extend(_CAMEL_BOUNDARY.split(part))
+    return [word.lower() for word in words if word]
+
+
+def query_terms(query: str) -> tuple[list[str], list[str]]:
+    """
+    Extract `(text_terms, path_terms)` from a chat query.
+
+    Text terms are lowercased identifiers plus their snake/camel-case parts,
+    safe to join into a `to_tsquery` expression. Path terms are path-like
+    tokens (`app/db`, `users.py`) and the longer content words.
+    """
+    text_terms: list[str] = []
+    path_terms: list[str] = []
+
+    def add(terms: list[str], term: str) -> None:
+        if term not in terms:
+            terms.append(term)
+
+    for match in _PATH_LIKE.finditer(query):
+        token = match.group(0).strip("./-")
+        if token:
+            add(path_terms, token.lower())
+
+    for identifier in _IDENTIFIER.findall(query):
+        lowered = identifier.lower()
+        if lowered in STOPWORDS:
+            continue
+        add(text_terms, lowered)
+        parts = _split_identifier(identifier)
+        if len(parts) > 1:
+            for part in parts:
+                if part not in STOPWORDS:
+                    add(text_terms, part)
+        if len(lowered) >= MIN_PATH_TERM_LENGTH:
+            add(path_terms, lowered)
+
+    return text_terms[:MAX_TEXT_TERMS], path_terms[:MAX_PATH_TERMS]
+
+
+def _chunk_key(doc: Document) -> str:
+    if doc.id:
+        return str(doc.id)
+    metadata = doc.metadata or {}
+    return f"{metadata.get('node_path')}#{metadata.get('chunk_index')}"
+
+
+def _node_path(doc: Document) -> str:
+    return (doc.metadata or {}).get("node_path") or ""
+
+
+def _parent(path: str) -> str:
+    return path.rsplit("/", 1)[0] if "/" in path else ""
+
+
+def _adjacent(path: str, seed: str) -> bool:
+    """True when `path` is the seed file itself or one edge away in the directory tree."""
+    if not path or not seed:
+        return False
+    return path == seed or _parent(path) == _parent(seed) or _parent(path) == seed or _parent(seed) == path
+
+
+def fuse(ranked_lists: list[list[Document]], k: int) -> list[Document]:
+    """Reciprocal rank fusion with a graph-adjacency boost; returns the best `k` chunks."""
+    rrf_k = settings.RETRIEVAL_RRF_K
+    scores: dict[str, float] = {}
+    documents: dict[str, Document] = {}
+    for ranked in ranked_lists:
+        for rank, doc in enumerate(ranked, start=1):
+            key = _chunk_key(doc)
+            documents.setdefault(key, doc)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (rrf_k + rank)
+
+    ordered = sorted(scores, key=scores.get, reverse=True)
+    seeds: list[str] = []
+    for key in ordered:
+        path = _node_path(documents[key])
+        if path and path not in seeds:
+            seeds.append(path)
+        if len(seeds) == SEED_FILES:
+            break
+
+    # A boost worth one extra first-place vote in another list, scaled by RETRIEVAL_GRAPH_BOOST.
+    boost = settings.RETRIEVAL_GRAPH_BOOST / (rrf_k + 1)
+    if boost:
+        for key in ordered:
+            path = _node_path(documents[key])
+            if any(_adjacent(path, seed) for seed in seeds):
+                scores[key] += boost
+        ordered.sort(key=scores.get, reverse=True)
+
+    return [documents[key] for key in ordered[:k]]
+
+
+async def aretrieve(collection_name: str, query: str, embedding: list[float]) -> list[Document]:
+    """Return the top RETRIEVAL_TOP_K chunks for a query from vector, full-text and path search, run concurrently."""
+    candidates = settings.RETRIEVAL_CANDIDATES
+    text_terms, path_terms = query_terms(query)
+    ranked_lists = await asyncio.gather(
+        asearch_collection(collection_name, embedding, k=candidates),
+        atext_search_collection(collection_name, text_terms, k=candidates),
+        apath_search_collection(collection_name, path_terms, k=candidates),
+    )
+    return fuse(list(ranked_lists), k=settings.RETRIEVAL_TOP_K)
@@ -1,7 +1,26 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.config import settings
 from app.api.routes import api_router
+from app.db.engine import async_engine
+from app.db.migrate import run_migrations
+from app.services.github_client import aclose_clients, response_cache
+from app.services.jobs import job_manager
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start and stop process-wide workers."""
+    if settings.DB_MIGRATE_ON_STARTUP:
+        run_migrations()
+    job_manager.start()
+    response_cache.start(max_age_seconds=settings.GITHUB_CACHE_MAX_AGE_SECONDS)
+    yield
+    job_manager.shutdown()
+    await aclose_clients()
+    await async_engine.dispose()
 
 
 # Create FastAPI application
@@ -9,6 +28,7 @@ app = FastAPI(
     title="GitGraph",
     description="Backend API for GitGraph",
     version="0.1.0",
+    lifespan=lifespan,
 )
 
 app.add_middleware(
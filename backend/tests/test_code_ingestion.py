@@ -0,0 +1,39 @@
+from app.codeIngestion.code_ingestion import RepositoryIngestionOrchestrator
+
+diff_blobs = RepositoryIngestionOrchestrator._diff_blobs
+
+
+def test_diff_blobs_new_changed_and_unchanged():
+    stored = {"same.py": "aaa", "edited.py": "bbb"}
+    current = {"same.py": "aaa", "edited.py": "ccc", "new.py": "ddd"}
+
+    changed, removed = diff_blobs(stored, current)
+
+    assert changed == {"edited.py": "ccc", "new.py": "ddd"}
+    assert removed == []
+
+
+def test_diff_blobs_reports_removed_paths():
+    changed, removed = diff_blobs({"kept.py": "aaa", "gone.py": "bbb", "old/x.py": None}, {"kept.py": "aaa"})
+
+    assert changed == {}
+    assert removed == ["gone.py", "old/x.py"]
+
+
+def test_diff_blobs_without_current_sha_only_ingests_unknown_paths():
+    changed, removed = diff_blobs({"stored.py": "aaa"}, {"stored.py": None, "unknown.py": None})
+
+    assert changed == {"unknown.py": None}
+    assert removed == []
+
+
+def test_diff_blobs_reingests_files_stored_without_sha():
+    changed, _ = diff_blobs({"legacy.py": None}, {"legacy.py": "aaa"})
+
+    assert changed == {"legacy.py": "aaa"}
+
+
+def test_diff_blobs_empty_stored_ingests_everything():
+    current = {"a.py": "aaa", "b.py": None}
+
+    assert diff_blobs({}, current) == (current, [])
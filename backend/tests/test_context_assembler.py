@@ -0,0 +1,127 @@
+from langchain_core.documents import Document
+
+from app.textGeneration.context_assembler import MIN_STITCH_OVERLAP, ContextAssembler, _stitch
+
+
+def words(prefix: str, count: int) -> str:
+    return " ".join(f"{prefix}{idx}" for idx in range(count))
+
+
+def chunk(path: str, index: int, content: str) -> Document:
+    return Document(page_content=content, metadata={"node_path": path, "chunk_index": index, "file_type": "py"})
+
+
+def assembler(max_tokens: int) -> ContextAssembler:
+    return ContextAssembler(max_tokens, count_tokens=lambda text: len(text.split()))
+
+
+def test_stitch_drops_splitter_overlap():
+    overlap = "x" * MIN_STITCH_OVERLAP
+
+    assert _stitch("left " + overlap, overlap + " right") == "left " + overlap + " right"
+
+
+def test_stitch_ignores_overlap_shorter_than_minimum():
+    overlap = "x" * (MIN_STITCH_OVERLAP - 1)
+
+    assert _stitch("left " + overlap, overlap + " right") == "left " + overlap + "\n" + overlap + " right"
+
+
+def test_stitch_ignores_coincidental_closing_brace():
+    assert _stitch("def a():\n    return {}\n", "}\nb = 1") == "def a():\n    return {}\n\n}\nb = 1"
+
+
+def test_merge_stitches_consecutive_chunks_and_ranks_by_best_chunk():
+    overlap = "o" * MIN_STITCH_OVERLAP
+    docs = [
+        chunk("b.py", 0, "beta"),
+        chunk("a.py", 1, overlap + " tail"),
+        chunk("a.py", 0, "head " + overlap),
+        chunk("a.py", 1, "duplicate of chunk one"),
+        chunk("a.py", 3, "after a gap"),
+    ]
+
+    blocks = assembler(1000).merge(docs)
+
+    assert [(block.node_path, block.first_chunk, block.last_chunk) for block in blocks] == [
+        ("b.py", 0, 0),
+        ("a.py", 0, 1),
+        ("a.py", 3, 3),
+    ]
+    assert blocks[1].content == "head " + overlap + " tail"
+
+
+def test_assemble_drops_near_duplicate_blocks():
+    body = words("w", 200)
+    docs = [
+        chunk("src/util.py", 0, body),
+        chunk("vendor/util.py", 0, body + " extra"),
+        chunk("src/other.py", 0, words("z", 50)),
+    ]
+
+    blocks = assembler(1000).assemble(docs)
+
+    assert [block.node_path for block in blocks] == ["src/util.py", "src/other.py"]
+
+
+def test_assemble_keeps_blocks_with_little_overlap():
+    shared = words("s", 10)
+    docs = [chunk("a.py", 0, shared + " " + words("a", 50)), chunk("b.py", 0, shared + " " + words("b", 50))]
+
+    assert len(assembler(1000).assemble(docs)) == 2
+
+
+def test_assemble_truncates_first_block_that_does_not_fit():
+    docs = [
+        chunk("a.py", 0, words("a", 300)),
+        chunk("b.py", 0, words("b", 400)),
+        chunk("c.py", 0, words("c", 100)),
+        chunk("d.py", 0, words("d", 300)),
+    ]
+
+    blocks = assembler(600).assemble(docs)
+
+    assert [(block.node_path, block.truncated) for block in blocks] == [
+        ("a.py", False),
+        ("b.py", True),
+    ]
+    assert sum(block.tokens for block in blocks) <= 600
+
+
+def test_assemble_truncates_only_one_block():
+    docs = [
+        chunk("a.py", 0, words("a", 200)),
+        chunk("b.py", 0, words("b", 250)),
+        chunk("c.py", 0, words("c", 700)),
+        chunk("d.py", 0, words("d", 20)),
+    ]
+
+    blocks = assembler(1000).assemble(docs)
+
+    # c.py is cut to the remaining budget, which leaves too little for d.py.
+    assert [(block.node_path, block.truncated) for block in blocks] == [
+        ("a.py", False),
+        ("b.py", False),
+        ("c.py", True),
+    ]
+    assert sum(block.tokens for block in blocks) <= 1000
+
+
+def test_assemble_keeps_smaller_blocks_ranked_before_the_truncated_one():
+    docs = [chunk("a.py", 0, words("a", 200)), chunk("d.py", 0, words("d", 20)), chunk("c.py", 0, words("c", 1000))]
+
+    blocks = assembler(1000).assemble(docs)
+
+    assert [(block.node_path, block.truncated) for block in blocks] == [
+        ("a.py", False),
+        ("d.py", False),
+        ("c.py", True),
+    ]
+
+
+def test_assemble_stops_when_budget_is_nearly_spent():
+    docs = [chunk("a.py", 0, words("a", 450)), chunk("b.py", 0, words("b", 400))]
+
+    blocks = assembler(500).assemble(docs)
+
+    assert [block.node_path for block in blocks] == ["a.py"]
@@ -0,0 +1,74 @@
+from langchain_core.documents import Document
+
+from app.core.config import settings
+from app.textGeneration.retrieval import fuse, query_terms
+
+
+def chunk(path: str, index: int = 0) -> Document:
+    return Document(page_content=f"{path}:{index}", metadata={"node_path": path, "chunk_index": index})
+
+
+def paths(docs: list[Document]) -> list[str]:
+    return [doc.metadata["node_path"] for doc in docs]
+
+
+def test_query_terms_split_identifiers_and_keep_paths():
+    text_terms, path_terms = query_terms("How does getUserToken work in app/db/users.py?")
+
+    assert text_terms[:4] == ["getusertoken", "user", "token", "app"]
+    assert "how" not in text_terms and "get" not in text_terms
+    assert path_terms[0] == "app/db/users.py"
+    assert "getusertoken" in path_terms and "users" in path_terms
+    # Short content words match too many paths.
+    assert "app" not in path_terms
+
+
+def test_query_terms_only_stopwords():
+    assert query_terms("what does this repo do?") == ([], [])
+
+
+def test_fuse_prefers_chunks_found_by_several_retrievers(monkeypatch):
+    monkeypatch.setattr(settings, "RETRIEVAL_GRAPH_BOOST", 0.0)
+    both, vector_only, text_only = chunk("a/both.py"), chunk("b/vector.py"), chunk("c/text.py")
+
+    fused = fuse([[vector_only, both], [text_only, both]], k=3)
+
+    # 2 / (k + 2) beats 1 / (k + 1).
+    assert paths(fused) == ["a/both.py", "b/vector.py", "c/text.py"]
+
+
+def test_fuse_merges_the_same_chunk_across_lists_and_truncates(monkeypatch):
+    monkeypatch.setattr(settings, "RETRIEVAL_GRAPH_BOOST", 0.0)
+    first = [chunk("x.py", 0), chunk("x.py", 1), chunk("y.py", 0)]
+    second = [chunk("x.py", 1)]
+
+    fused = fuse([first, second], k=2)
+
+    assert [(doc.metadata["node_path"], doc.metadata["chunk_index"]) for doc in fused] == [("x.py", 1), ("x.py", 0)]
+
+
+def ranked_for_boost() -> list[list[Document]]:
+    # Seeds are the best three files; far/e.py outranks src/d.py, which sits next to seed src/a.py.
+    return [[chunk("src/a.py"), chunk("x/b.py"), chunk("y/c.py"), chunk("far/e.py"), chunk("src/d.py")]]
+
+
+def test_fuse_without_boost_keeps_rank_order(monkeypatch):
+    monkeypatch.setattr(settings, "RETRIEVAL_GRAPH_BOOST", 0.0)
+
+    assert paths(fuse(ranked_for_boost(), k=5)) == ["src/a.py", "x/b.py", "y/c.py", "far/e.py", "src/d.py"]
+
+
+def test_fuse_boosts_files_adjacent_to_the_best_files(monkeypatch):
+    monkeypatch.setattr(settings, "RETRIEVAL_GRAPH_BOOST", 0.5)
+
+    fused = paths(fuse(ranked_for_boost(), k=5))
+
+    assert fused.index("src/d.py") < fused.index("far/e.py")
+    assert fused[-1] == "far/e.py"
+
+
+def test_fuse_boosts_files_inside_a_seed_directory(monkeypatch):
+    monkeypatch.setattr(settings, "RETRIEVAL_GRAPH_BOOST", 0.5)
+    ranked = [[chunk("pkg"), chunk("x/b.py"), chunk("y/c.py"), chunk("far/e.py"), chunk("pkg/inner.py")]]
+
+    assert paths(fuse(ranked, k=5))[-1] == "far/e.py"
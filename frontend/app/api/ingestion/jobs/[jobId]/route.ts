@@ -0,0 +1,28 @@
+import { NextRequest, NextResponse } from "next/server";
+
+const BASE_URL = process.env.SERVER_BASE_URL!;
+const SESSION_COOKIE = "gitgraph_session";
+
+export async function GET(
+  req: NextRequest,
+  context: { params: Promise<{ jobId: string }> },
+) {
+  try {
+    const { jobId } = await context.params;
+    const sessionId = req.cookies.get(SESSION_COOKIE)?.value;
+    if (!sessionId) {
+      return NextResponse.json({ error: "Not authenticated" }, { status: 401 });
+    }
+
+    const res = await fetch(`${BASE_URL}/ingestion/jobs/${encodeURIComponent(jobId)}`, {
+      headers: { "x-session-id": sessionId },
+      cache: "no-store",
+    });
+
+    const data = await res.json();
+    return NextResponse.json(data, { status: res.status });
+  } catch (error) {
+    console.error("Error fetching ingestion job:", error);
+    return NextResponse.json({ error: "Failed to fetch ingestion job" }, { status: 500 });
+  }
+}
@@ -10,6 +10,7 @@ export async function GET(
   try {
     const { owner, repoName } = await context.params;
     const path = req.nextUrl.searchParams.get("path") ?? "";
+    const sha = req.nextUrl.searchParams.get("sha");
     const sessionId = req.cookies.get(SESSION_COOKIE)?.value;
 
     if (!sessionId) {
@@ -22,6 +23,9 @@ export async function GET(
 
     const target = new URL(`${BASE_URL}/repos/${owner}/${repoName}/explain`);
     target.searchParams.set("path", path);
+    if (sha) {
+      target.searchParams.set("sha", sha);
+    }
 
     const res = await fetch(target.toString(), {
       headers: { "x-session-id": sessionId },
@@ -0,0 +1,42 @@
+import { NextRequest, NextResponse } from "next/server";
+
+const BASE_URL = process.env.SERVER_BASE_URL!;
+const SESSION_COOKIE = "gitgraph_session";
+const FORWARDED_PARAMS = ["path", "depth", "limit", "cursor", "ref"];
+
+export async function GET(
+  req: NextRequest,
+  context: { params: Promise<{ owner: string; repoName: string }> },
+) {
+  try {
+    const { owner, repoName } = await context.params;
+    const sessionId = req.cookies.get(SESSION_COOKIE)?.value;
+
+    if (!sessionId) {
+      return NextResponse.json({ error: "Not authenticated" }, { status: 401 });
+    }
+
+    const query = new URLSearchParams();
+    for (const name of FORWARDED_PARAMS) {
+      const value = req.nextUrl.searchParams.get(name);
+      if (value !== null) {
+        query.set(name, value);
+      }
+    }
+
+    const res = await fetch(`${BASE_URL}/repos/${owner}/${repoName}/subtree?${query.toString()}`, {
+      headers: { "x-session-id": sessionId },
+    });
+
+    if (!res.ok) {
+      console.error(`Failed to fetch repository subtree: ${res.status} ${res.statusText}`);
+      return NextResponse.json({ error: "Failed to fetch repository subtree" }, { status: res.status });
+    }
+
+    const data = await res.json();
+    return NextResponse.json(data);
+  } catch (error) {
+    console.error("Error fetching repository subtree:", error);
+    return NextResponse.json({ error: "Failed to fetch repository subtree" }, { status: 500 });
+  }
+}
@@ -21,6 +21,9 @@ import type { GraphEdge, GraphNode } from "./types";
 type ProjectGraphProps = {
   nodes: GraphNode[];
   edges: GraphEdge[];
+  // Folders whose children are not loaded yet (child_count > 0, no edges) are expanded through `onExpand`.
+  expandingNodeIds: Set<string>;
+  onExpand: (nodeId: string) => void;
   onNodeClick: (nodeId: string) => void;
 };
 
@@ -29,6 +32,7 @@ type CustomData = {
   kind: "folder" | "file";
   hasChildren: boolean;
   collapsed: boolean;
+  loading: boolean;
   onToggle: () => void;
 };
 
@@ -57,10 +61,11 @@ function CustomNode({ data }: { data: CustomData }) {
               data.onToggle();
             }}
             className="ml-1 rounded bg-blue-900/40 px-1.5 py-0.5 text-[10px] font-semibold text-blue-200 hover:bg-blue-800/50"
+            disabled={data.loading}
             aria-label={data.collapsed ? "Expand folder" : "Collapse folder"}
             title={data.collapsed ? "Expand folder" : "Collapse folder"}
           >
-            {data.collapsed ? "+" : "-"}
+            {data.loading ? "…" : data.collapsed ? "+" : "-"}
           </button>
         )}
       </div>
@@ -106,7 +111,7 @@ function rankByDepth(nodes: GraphNode[], edges: GraphEdge[]): Map<string, number
   return depth;
 }
 
-export function ProjectGraph({ nodes, edges, onNodeClick }: ProjectGraphProps) {
+export function ProjectGraph({ nodes, edges, expandingNodeIds, onExpand, onNodeClick }: ProjectGraphProps) {
   const childrenBySource = useMemo(() => {
     const map = new Map<string, string[]>();
     for (const edge of edges) {
@@ -117,9 +122,20 @@ export function ProjectGraph({ nodes, edges, onNodeClick }: ProjectGraphProps) {
     return map;
   }, [edges]);
 
+  const childCountById = useMemo(
+    () => new Map(nodes.map((node) => [node.id, node.child_count ?? 0])),
+    [nodes],
+  );
+
+  const isUnloaded = useCallback(
+    (nodeId: string): boolean =>
+      (childCountById.get(nodeId) ?? 0) > 0 && (childrenBySource.get(nodeId) ?? []).length === 0,
+    [childCountById, childrenBySource],
+  );
+
   const hasChildren = useCallback(
-    (nodeId: string): boolean => (childrenBySource.get(nodeId) ?? []).length > 0,
-    [childrenBySource],
+    (nodeId: string): boolean => (childrenBySource.get(nodeId) ?? []).length > 0 || isUnloaded(nodeId),
+    [childrenBySource, isUnloaded],
   );
 
   const depthByNodeId = useMemo(() => rankByDepth(nodes, edges), [nodes, edges]);
@@ -141,17 +157,35 @@ export function ProjectGraph({ nodes, edges, onNodeClick }: ProjectGraphProps) {
     () => new Set(initialCollapsedNodeIds),
   );
 
-  const toggleCollapsed = useCallback((nodeId: string) => {
-    setCollapsedNodeIds((prev) => {
-      const next = new Set(prev);
-      if (next.has(nodeId)) {
-        next.delete(nodeId);
-      } else {
-        next.add(nodeId);
+  const isCollapsed = useCallback(
+    (nodeId: string): boolean => collapsedNodeIds.has(nodeId) || isUnloaded(nodeId),
+    [collapsedNodeIds, isUnloaded],
+  );
+
+  const toggleCollapsed = useCallback(
+    (nodeId: string) => {
+      if (isUnloaded(nodeId)) {
+        // Fetch the children; the folder opens once they arrive.
+        setCollapsedNodeIds((prev) => {
+          const next = new Set(prev);
+          next.delete(nodeId);
+          return next;
+        });
+        onExpand(nodeId);
+        return;
       }
-      return next;
-    });
-  }, []);
+      setCollapsedNodeIds((prev) => {
+        const next = new Set(prev);
+        if (next.has(nodeId)) {
+          next.delete(nodeId);
+        } else {
+          next.add(nodeId);
+        }
+        return next;
+      });
+    },
+    [isUnloaded, onExpand],
+  );
 
   const initialFlowNodes = useMemo<FlowNode<CustomData>[]>(() => {
     const depth = rankByDepth(nodes, edges);
@@ -186,6 +220,7 @@ export function ProjectGraph({ nodes, edges, onNodeClick }: ProjectGraphProps) {
             kind: node.file_type === "tree" ? "folder" : "file",
             hasChildren: hasChildren(node.id),
             collapsed: false,
+            loading: false,
             onToggle: () => toggleCollapsed(node.id),
           },
         });
@@ -232,7 +267,7 @@ export function ProjectGraph({ nodes, edges, onNodeClick }: ProjectGraphProps) {
       if (visible.has(current)) continue;
       visible.add(current);
 
-      if (collapsedNodeIds.has(current)) {
+      if (isCollapsed(current)) {
         continue;
       }
 
@@ -241,7 +276,7 @@ export function ProjectGraph({ nodes, edges, onNodeClick }: ProjectGraphProps) {
     }
 
     return visible;
-  }, [childrenBySource, collapsedNodeIds]);
+  }, [childrenBySource, isCollapsed]);
 
   useEffect(() => {
     setFlowNodes((current) =>
@@ -250,7 +285,8 @@ export function ProjectGraph({ nodes, edges, onNodeClick }: ProjectGraphProps) {
         hidden: !visibleNodeIds.has(node.id),
         data: {
           ...node.data,
-          collapsed: collapsedNodeIds.has(node.id),
+          collapsed: isCollapsed(node.id),
+          loading: expandingNodeIds.has(node.id),
         },
       })),
     );
@@ -260,7 +296,7 @@ export function ProjectGraph({ nodes, edges, onNodeClick }: ProjectGraphProps) {
         hidden: !visibleNodeIds.has(edge.source) || !visibleNodeIds.has(edge.target),
       })),
     );
-  }, [collapsedNodeIds, visibleNodeIds, setFlowNodes, setFlowEdges]);
+  }, [initialFlowNodes, initialFlowEdges, isCollapsed, expandingNodeIds, visibleNodeIds, setFlowNodes, setFlowEdges]);
 
   const handleNodeClick = useCallback(
     (_: React.MouseEvent, node: FlowNode<CustomData>) => {
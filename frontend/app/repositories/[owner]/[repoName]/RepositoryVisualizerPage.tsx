@@ -1,12 +1,88 @@
 "use client";
 
-import { useEffect, useRef, useState } from "react";
+import { useCallback, useEffect, useRef, useState } from "react";
 import { useRouter } from "next/navigation";
 import { VisualizerView } from "./VisualizerView";
-import type { GraphPayload } from "./types";
+import type { GraphPayload, SubtreePage } from "./types";
 
 type IngestionStatus = "idle" | "running" | "success" | "error";
 
+type IngestionJob = {
+  job_id: string;
+  status: "queued" | "running" | "cancelling" | "succeeded" | "failed" | "cancelled";
+  files_total: number;
+  files_done: number;
+};
+
+const JOB_POLL_INTERVAL_MS = 1000;
+// Top-level folders open, their subfolders collapsed until expanded.
+const INITIAL_SUBTREE_DEPTH = 2;
+
+function sleep(ms: number) {
+  return new Promise((resolve) => setTimeout(resolve, ms));
+}
+
+class GraphRequestError extends Error {
+  constructor(
+    readonly status: number,
+    message: string,
+  ) {
+    super(message);
+  }
+}
+
+async function fetchSubtreePage(
+  owner: string,
+  repoName: string,
+  params: URLSearchParams,
+): Promise<SubtreePage> {
+  const res = await fetch(
+    `/api/repo/${encodeURIComponent(owner)}/${encodeURIComponent(repoName)}/subtree?${params.toString()}`,
+  );
+  if (!res.ok) {
+    throw new GraphRequestError(res.status, `Failed to fetch repository graph: ${res.status} ${res.statusText}`);
+  }
+
+  const page = (await res.json()) as SubtreePage;
+  if (!Array.isArray(page.nodes) || !Array.isArray(page.edges)) {
+    throw new GraphRequestError(res.status, "Invalid graph payload returned by server.");
+  }
+  return page;
+}
+
+// Loads every page of `path`'s subtree; folders at the depth limit come back with only their child_count.
+async function fetchSubtree(
+  owner: string,
+  repoName: string,
+  path: string,
+  depth: number,
+  ref?: string,
+): Promise<SubtreePage> {
+  const params = new URLSearchParams({ path, depth: String(depth) });
+  if (ref) params.set("ref", ref);
+
+  const result = await fetchSubtreePage(owner, repoName, params);
+  let cursor = result.next_cursor;
+  while (cursor) {
+    params.set("cursor", cursor);
+    const page = await fetchSubtreePage(owner, repoName, params);
+    result.nodes.push(...page.nodes);
+    result.edges.push(...page.edges);
+    cursor = page.next_cursor;
+  }
+  return result;
+}
+
+function mergeSubtree(graph: GraphPayload, page: SubtreePage): GraphPayload {
+  const nodeIds = new Set(graph.nodes.map((node) => node.id));
+  const edgeKeys = new Set(graph.edges.map((edge) => `${edge.source}\n${edge.target}`));
+  return {
+    ...graph,
+    nodes: [...graph.nodes, ...page.nodes.filter((node) => !nodeIds.has(node.id))],
+    edges: [...graph.edges, ...page.edges.filter((edge) => !edgeKeys.has(`${edge.source}\n${edge.target}`))],
+  };
+}
+
 type RepositoryVisualizerPageProps = {
   owner: string;
   repoName: string;
@@ -18,6 +94,7 @@ export default function RepositoryVisualizerPage({
 }: RepositoryVisualizerPageProps) {
   const router = useRouter();
   const [graph, setGraph] = useState<GraphPayload | null>(null);
+  const [expandingNodeIds, setExpandingNodeIds] = useState<Set<string>>(() => new Set());
   const [isLoading, setIsLoading] = useState(true);
   const [error, setError] = useState<string | null>(null);
   const [ingestionTriggered, setIngestionTriggered] = useState(false);
@@ -38,8 +115,8 @@ export default function RepositoryVisualizerPage({
     }
 
     const timer = setInterval(() => {
-      setIngestionProgress((prev) => Math.min(prev + 8, 92));
-    }, 350);
+      setIngestionProgress((prev) => Math.min(prev + 1, 92));
+    }, 1500);
 
     return () => clearInterval(timer);
   }, [ingestionStatus]);
@@ -49,31 +126,22 @@ export default function RepositoryVisualizerPage({
       try {
         setIsLoading(true);
         setError(null);
+        setExpandingNodeIds(new Set());
 
-        const res = await fetch(
-          `/api/repo/${encodeURIComponent(owner)}/${encodeURIComponent(repoName)}`,
-        );
-
-        if (res.status === 401) {
+        const page = await fetchSubtree(owner, repoName, "", INITIAL_SUBTREE_DEPTH);
+        setGraph({
+          ref: page.ref,
+          commit_sha: page.commit_sha,
+          nodes: [page.node, ...page.nodes],
+          edges: page.edges,
+        });
+      } catch (fetchError) {
+        if (fetchError instanceof GraphRequestError && fetchError.status === 401) {
           router.replace("/login");
           return;
         }
-
-        if (!res.ok) {
-          setError(`Failed to fetch repository graph: ${res.status} ${res.statusText}`);
-          return;
-        }
-
-        const data = (await res.json()) as GraphPayload;
-        if (!Array.isArray(data.nodes) || !Array.isArray(data.edges)) {
-          setError("Invalid graph payload returned by server.");
-          return;
-        }
-
-        setGraph(data);
-      } catch (fetchError) {
         console.error(fetchError);
-        setError("Failed to load repository graph.");
+        setError(fetchError instanceof GraphRequestError ? fetchError.message : "Failed to load repository graph.");
       } finally {
         setIsLoading(false);
       }
@@ -82,10 +150,35 @@ export default function RepositoryVisualizerPage({
     loadRepoGraph();
   }, [owner, repoName, router]);
 
+  const expandNode = useCallback(
+    async (nodeId: string) => {
+      const node = graph?.nodes.find((candidate) => candidate.id === nodeId);
+      if (!graph || !node || expandingNodeIds.has(nodeId)) {
+        return;
+      }
+
+      setExpandingNodeIds((prev) => new Set(prev).add(nodeId));
+      try {
+        const page = await fetchSubtree(owner, repoName, node.path, 1, graph.ref);
+        setGraph((current) => (current ? mergeSubtree(current, page) : current));
+      } catch (expandError) {
+        console.error("Failed to expand folder:", expandError);
+      } finally {
+        setExpandingNodeIds((prev) => {
+          const next = new Set(prev);
+          next.delete(nodeId);
+          return next;
+        });
+      }
+    },
+    [graph, expandingNodeIds, owner, repoName],
+  );
+
   useEffect(() => {
     if (!graph || ingestionTriggered) {
       return;
     }
+    const { ref, commit_sha: commitSha } = graph;
 
     async function triggerIngestion() {
       const ingestionKey = `${owner}/${repoName}`;
@@ -97,13 +190,15 @@ export default function RepositoryVisualizerPage({
       setIngestionProgress(12);
 
       try {
+        // The view only holds the expanded folders; the backend ingests the graph it stored for this commit.
         const res = await fetch("/api/ingestion/repo", {
           method: "POST",
           headers: { "Content-Type": "application/json" },
           body: JSON.stringify({
             owner,
             repo: repoName,
-            graph,
+            ref,
+            commit_sha: commitSha,
           }),
         });
 
@@ -115,6 +210,26 @@ export default function RepositoryVisualizerPage({
           return;
         }
 
+        const { job_id: jobId } = (await res.json()) as { job_id?: string };
+        while (jobId && ingestionKeyRef.current === ingestionKey) {
+          const jobRes = await fetch(`/api/ingestion/jobs/${encodeURIComponent(jobId)}`);
+          if (!jobRes.ok) {
+            throw new Error(`Failed to poll ingestion job: ${jobRes.status} ${jobRes.statusText}`);
+          }
+
+          const job = (await jobRes.json()) as IngestionJob;
+          if (job.files_total > 0) {
+            setIngestionProgress(Math.max(12, Math.min(99, Math.round((job.files_done / job.files_total) * 100))));
+          }
+          if (job.status === "succeeded") {
+            break;
+          }
+          if (job.status === "failed" || job.status === "cancelled") {
+            throw new Error(`Ingestion job ${job.status}.`);
+          }
+          await sleep(JOB_POLL_INTERVAL_MS);
+        }
+
         setIngestionStatus("success");
         setIngestionProgress(100);
         setIngestionTriggered(true);
@@ -157,6 +272,8 @@ export default function RepositoryVisualizerPage({
       owner={owner}
       repoName={repoName}
       graph={graph}
+      expandingNodeIds={expandingNodeIds}
+      onExpandNode={expandNode}
       ingestionStatus={ingestionStatus}
       ingestionProgress={ingestionProgress}
       onBack={() => router.push("/")}
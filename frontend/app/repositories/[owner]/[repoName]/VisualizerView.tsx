@@ -11,6 +11,8 @@ type VisualizerViewProps = {
   owner: string;
   repoName: string;
   graph: GraphPayload;
+  expandingNodeIds: Set<string>;
+  onExpandNode: (nodeId: string) => void;
   ingestionStatus: "idle" | "running" | "success" | "error";
   ingestionProgress: number;
   onBack: () => void;
@@ -24,6 +26,8 @@ export function VisualizerView({
   owner,
   repoName,
   graph,
+  expandingNodeIds,
+  onExpandNode,
   ingestionStatus,
   ingestionProgress,
   onBack,
@@ -74,7 +78,7 @@ export function VisualizerView({
         ?? (isCurrentNodeLoading
           ? ""
           : kind === "folder"
-            ? `This directory groups ${children.length} direct item(s) and organizes related source files under ${node.path || "/"} .`
+            ? `This directory groups ${node.child_count ?? children.length} direct item(s) and organizes related source files under ${node.path || "/"} .`
             : `This file appears at ${node.path}. Select it to inspect structure context and run deeper analysis.`),
     };
   }, [selectedNodeId, nodeById, childrenById, nodeExplanations, nodeExplanationLoadingId]);
@@ -305,6 +309,8 @@ export function VisualizerView({
         <ProjectGraph
           nodes={graph.nodes}
           edges={graph.edges}
+          expandingNodeIds={expandingNodeIds}
+          onExpand={onExpandNode}
           onNodeClick={(nodeId) => {
             setSelectedNodeId(nodeId);
             void fetchNodeExplanation(nodeId);
@@ -3,6 +3,9 @@ export type GraphNode = {
   name: string;
   path: string;
   file_type: string;
+  sha?: string | null;
+  // Direct children in the full tree; set on nodes loaded through `/subtree`.
+  child_count?: number;
 };
 
 export type GraphEdge = {
@@ -13,10 +16,18 @@ export type GraphEdge = {
 };
 
 export type GraphPayload = {
+  ref?: string;
+  commit_sha?: string;
   nodes: GraphNode[];
   edges: GraphEdge[];
 };
 
+export type SubtreePage = GraphPayload & {
+  path: string;
+  node: GraphNode;
+  next_cursor: string | null;
+};
+
 export type DetailChild = {
   id: string;
   name: string;